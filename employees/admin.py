@@ -1,5 +1,112 @@
-from django.contrib import admin
-from .models import Employee, Attendance, Leave, Payroll
+from datetime import timedelta
+
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Case, DurationField, ExpressionWrapper, F, Max, Min, Value, When
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import Employee, Attendance, DepartmentShift, EarningsYTD, Leave, Payroll, PayrollAdjustment, PayrollRecompute, PayrollRule, PunchReceipt, SalaryHistory, Shift, SlowQuery
+from .payroll import TRANSITIONS, leave_to_payroll_keys, mark_payroll_dirty, transition_payroll
+from .versioning import bump_versions
+
+
+# Changelists of big tables count at most this many rows, 100 pages
+COUNT_LIMIT = 10000
+
+
+def estimated_rows(model, using):
+    """Row count from the planner statistics, None when the database has none"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'sqlite':
+            # Filled in by ANALYZE; the first number of an index's stat is the row count
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 for tables never analyzed
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Changelist paginator whose count doesn't grow with the table. The
+    unfiltered list uses the planner's row estimate when there is one;
+    otherwise counting stops at COUNT_LIMIT rows, so only the first pages
+    are reachable and filters narrow down the rest.
+    """
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > COUNT_LIMIT:
+                return estimate
+        return queryset.order_by().values('pk')[:COUNT_LIMIT].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables with millions of rows"""
+    list_select_related = ['employee']
+    paginator = EstimatedCountPaginator
+    # Skips the second, unfiltered COUNT(*) of the "N total" link
+    show_full_result_count = False
+    raw_id_fields = ['employee']
+
+
+class MonthFilter(admin.SimpleListFilter):
+    """Fixed choices, a field filter would run SELECT DISTINCT over the table"""
+    title = 'month'
+    parameter_name = 'month'
+    
+    def lookups(self, request, model_admin):
+        return [(str(month), str(month)) for month in range(1, 13)]
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(month=self.value())
+        return queryset
+
+
+class YearFilter(admin.SimpleListFilter):
+    """Years between the first and last on file, two index lookups"""
+    title = 'year'
+    parameter_name = 'year'
+    
+    def lookups(self, request, model_admin):
+        bounds = model_admin.model.objects.aggregate(first=Min('year'), last=Max('year'))
+        if bounds['first'] is None:
+            return []
+        return [(str(year), str(year)) for year in range(bounds['last'], bounds['first'] - 1, -1)]
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(year=self.value())
+        return queryset
+
+
+def working_hours_expression():
+    """Attendance.working_hours in SQL, as a duration"""
+    shift = ExpressionWrapper(F('clock_out') - F('clock_in'), output_field=DurationField())
+    return Case(
+        # Overnight shift
+        When(clock_out__lt=F('clock_in'), then=ExpressionWrapper(
+            shift + Value(timedelta(days=1)), output_field=DurationField()
+        )),
+        default=shift,
+        output_field=DurationField(),
+    )
 
 
 @admin.register(Employee)
@@ -15,7 +122,7 @@ class EmployeeAdmin(admin.ModelAdmin):
             'fields': ('first_name', 'last_name', 'email')
         }),
         ('Employment Details', {
-            'fields': ('department', 'position', 'salary', 'join_date', 'status')
+            'fields': ('department', 'position', 'salary', 'join_date', 'status', 'shift')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -27,12 +134,13 @@ class EmployeeAdmin(admin.ModelAdmin):
 
 
 @admin.register(Attendance)
-class AttendanceAdmin(admin.ModelAdmin):
+class AttendanceAdmin(LargeTableAdmin):
     list_display = ['id', 'employee', 'date', 'status', 'clock_in', 'clock_out', 'working_hours']
+    # Date ranges and choices only, both served by indexes without scanning
     list_filter = ['status', 'date']
     search_fields = ['employee__first_name', 'employee__last_name']
-    ordering = ['-date', '-created_at']
-    date_hierarchy = 'date'
+    # Walks the date index backwards, no sort of the whole table
+    ordering = ['-date', '-id']
     
     fieldsets = (
         ('Employee & Date', {
@@ -48,15 +156,24 @@ class AttendanceAdmin(admin.ModelAdmin):
     )
     
     readonly_fields = ['created_at', 'updated_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(worked=working_hours_expression())
+    
+    @admin.display(description='Working hours', ordering='worked')
+    def working_hours(self, obj):
+        if obj.worked is None:
+            return 0
+        return round(obj.worked.total_seconds() / 3600, 2)
 
 
 @admin.register(Leave)
-class LeaveAdmin(admin.ModelAdmin):
+class LeaveAdmin(LargeTableAdmin):
     list_display = ['id', 'employee', 'leave_type', 'start_date', 'end_date', 'days', 'status']
     list_filter = ['status', 'leave_type', 'start_date']
     search_fields = ['employee__first_name', 'employee__last_name']
-    ordering = ['-created_at']
-    date_hierarchy = 'start_date'
+    # Creation order on the primary key, created_at has no index
+    ordering = ['-id']
     
     fieldsets = (
         ('Employee', {
@@ -79,22 +196,33 @@ class LeaveAdmin(admin.ModelAdmin):
     actions = ['approve_leaves', 'reject_leaves']
     
     def approve_leaves(self, request, queryset):
-        updated = queryset.update(status='Approved')
+        self._mark_payroll_dirty(queryset)
+        updated = queryset.update(status='Approved', updated_at=timezone.now())
+        bump_versions(Leave)
         self.message_user(request, f'{updated} leave request(s) approved.')
     approve_leaves.short_description = 'Approve selected leave requests'
     
     def reject_leaves(self, request, queryset):
-        updated = queryset.update(status='Rejected')
+        self._mark_payroll_dirty(queryset.filter(status='Approved'))
+        updated = queryset.update(status='Rejected', updated_at=timezone.now())
+        bump_versions(Leave)
         self.message_user(request, f'{updated} leave request(s) rejected.')
     reject_leaves.short_description = 'Reject selected leave requests'
+    
+    def _mark_payroll_dirty(self, queryset):
+        """queryset.update() skips signals, queue affected payroll explicitly"""
+        keys = set()
+        for employee_id, start_date, end_date in queryset.values_list('employee_id', 'start_date', 'end_date'):
+            keys |= leave_to_payroll_keys(employee_id, start_date, end_date)
+        mark_payroll_dirty(keys, reason='Leave changed')
 
 
 @admin.register(Payroll)
-class PayrollAdmin(admin.ModelAdmin):
+class PayrollAdmin(LargeTableAdmin):
     list_display = ['id', 'employee', 'month', 'year', 'basic_salary', 'net_salary', 'status', 'processed_date']
-    list_filter = ['status', 'month', 'year']
+    list_filter = ['status', MonthFilter, YearFilter]
     search_fields = ['employee__first_name', 'employee__last_name']
-    ordering = ['-year', '-month', '-created_at']
+    ordering = ['-year', '-month', '-id']
     
     fieldsets = (
         ('Employee & Period', {
@@ -117,11 +245,139 @@ class PayrollAdmin(admin.ModelAdmin):
     actions = ['mark_as_processed', 'mark_as_paid']
     
     def mark_as_processed(self, request, queryset):
-        updated = queryset.update(status='Processed')
-        self.message_user(request, f'{updated} payroll record(s) marked as processed.')
+        self._transition(request, queryset, 'Processed')
     mark_as_processed.short_description = 'Mark selected as Processed'
     
     def mark_as_paid(self, request, queryset):
-        updated = queryset.update(status='Paid')
-        self.message_user(request, f'{updated} payroll record(s) marked as paid.')
+        self._transition(request, queryset, 'Paid')
     mark_as_paid.short_description = 'Mark selected as Paid'
+    
+    def _transition(self, request, queryset, status):
+        """One UPDATE for the whole selection, rows in the wrong status are skipped"""
+        moved, skipped = transition_payroll(queryset, status)
+        self.message_user(request, f'{moved} payroll record(s) marked as {status.lower()}.')
+        if skipped:
+            details = ', '.join(f'{rows} {current}' for current, rows in sorted(skipped.items()))
+            self.message_user(
+                request,
+                f'Skipped {details}: only {TRANSITIONS[status]} payroll can be marked as {status.lower()}.',
+                level=messages.WARNING,
+            )
+
+
+@admin.register(PayrollAdjustment)
+class PayrollAdjustmentAdmin(admin.ModelAdmin):
+    list_display = ['id', 'payroll', 'basic_salary', 'allowances', 'overtime', 'deductions', 'net_amount', 'status', 'created_at']
+    list_filter = ['status']
+    search_fields = ['payroll__employee__first_name', 'payroll__employee__last_name']
+    ordering = ['-created_at']
+    list_select_related = ['payroll__employee']
+    readonly_fields = ['payroll', 'basic_salary', 'allowances', 'overtime', 'deductions', 'net_amount', 'created_at', 'updated_at']
+
+
+@admin.register(PayrollRecompute)
+class PayrollRecomputeAdmin(admin.ModelAdmin):
+    list_display = ['id', 'employee', 'month', 'year', 'reason', 'marked_at']
+    list_filter = ['month', 'year']
+    ordering = ['marked_at']
+    list_select_related = ['employee']
+
+
+@admin.register(PayrollRule)
+class PayrollRuleAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'kind', 'basis', 'amount', 'department', 'position', 'is_active']
+    list_filter = ['kind', 'basis', 'department', 'is_active']
+    search_fields = ['name', 'position']
+    ordering = ['kind', 'name']
+    
+    fieldsets = (
+        ('Rule', {
+            'fields': ('name', 'kind', 'basis', 'amount', 'is_active')
+        }),
+        ('Scope', {
+            'fields': ('department', 'position')
+        }),
+        ('Timestamps', {
+            'fields': ('created_at', 'updated_at'),
+            'classes': ('collapse',)
+        }),
+    )
+    
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ['short_shape', 'count', 'total_ms', 'average_ms', 'max_ms', 'view', 'last_seen']
+    list_filter = ['view']
+    search_fields = ['shape', 'view']
+    ordering = ['-total_ms']
+    readonly_fields = [
+        'fingerprint', 'shape', 'sample_sql', 'explain', 'view', 'last_view',
+        'count', 'total_ms', 'max_ms', 'first_seen', 'last_seen',
+    ]
+    
+    def short_shape(self, obj):
+        return obj.shape[:120]
+    short_shape.short_description = 'Query'
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(PunchReceipt)
+class PunchReceiptAdmin(admin.ModelAdmin):
+    list_display = ['key', 'employee_id', 'clock_type', 'punched_at', 'outcome', 'error', 'device', 'received_at']
+    list_filter = ['outcome', 'clock_type', 'received_at']
+    search_fields = ['=key', 'device']
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    readonly_fields = [
+        'key', 'employee_id', 'clock_type', 'punched_at', 'outcome', 'error', 'device', 'received_at',
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(EarningsYTD)
+class EarningsYTDAdmin(LargeTableAdmin):
+    """Read only, rows are derived from payroll (see rebuild_earnings_ytd)"""
+    list_display = ['employee', 'year', 'month', 'payslips', 'basic_salary', 'allowances', 'overtime', 'deductions', 'net_salary']
+    list_filter = [YearFilter, MonthFilter]
+    search_fields = ['employee__first_name', 'employee__last_name', 'employee__email']
+    ordering = ['-year', '-month', '-id']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SalaryHistory)
+class SalaryHistoryAdmin(LargeTableAdmin):
+    """Read only, salaries are recorded through the API so ranges stay contiguous"""
+    list_display = ['employee', 'salary', 'effective_from', 'effective_to', 'reason', 'created_at']
+    list_filter = ['effective_from']
+    search_fields = ['employee__first_name', 'employee__last_name', 'employee__email']
+    ordering = ['-effective_from', '-id']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class DepartmentShiftInline(admin.TabularInline):
+    model = DepartmentShift
+    extra = 0
+
+
+@admin.register(Shift)
+class ShiftAdmin(admin.ModelAdmin):
+    list_display = ['name', 'start_time', 'grace_minutes', 'standard_hours', 'updated_at']
+    search_fields = ['name']
+    inlines = [DepartmentShiftInline]
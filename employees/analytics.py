@@ -0,0 +1,212 @@
+import heapq
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+
+from .archive import horizon
+from .models import Attendance, AttendanceArchive, AttendanceMonthlySummary, Employee, calculate_working_hours
+from .shifts import DEFAULT_STANDARD_HOURS, shift_table
+
+STATUS_COUNTERS = {
+    'Present': 'present_days',
+    'Late': 'late_days',
+    'Absent': 'absent_days',
+    'Half Day': 'half_days',
+    'On Leave': 'leave_days',
+}
+
+SUMMARY_FIELDS = [
+    'department', 'present_days', 'late_days', 'absent_days', 'half_days',
+    'leave_days', 'total_hours', 'overtime_hours',
+]
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+class MonthAccumulator:
+    """
+    Running totals of one employee's attendance in one month, hours above
+    `overtime_after` a day (the standard hours of their shift) are overtime
+    """
+
+    COUNTERS = ['present_days', 'late_days', 'absent_days', 'half_days',
+                'leave_days', 'total_hours', 'overtime_hours']
+    __slots__ = COUNTERS + ['overtime_after']
+
+    def __init__(self, overtime_after=DEFAULT_STANDARD_HOURS):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.overtime_after = overtime_after
+
+    def add(self, day, status, clock_in, clock_out):
+        counter = STATUS_COUNTERS.get(status)
+        if counter:
+            setattr(self, counter, getattr(self, counter) + 1)
+        hours = calculate_working_hours(day, clock_in, clock_out)
+        self.total_hours += hours
+        if hours > self.overtime_after:
+            self.overtime_hours += hours - self.overtime_after
+
+    def to_summary(self, employee_id, department, period):
+        return AttendanceMonthlySummary(
+            employee_id=employee_id,
+            department=department,
+            period=period,
+            present_days=self.present_days,
+            late_days=self.late_days,
+            absent_days=self.absent_days,
+            half_days=self.half_days,
+            leave_days=self.leave_days,
+            total_hours=Decimal(str(round(self.total_hours, 2))),
+            overtime_hours=Decimal(str(round(self.overtime_hours, 2))),
+        )
+
+
+def _attendance_rows(queryset):
+    return queryset.values_list(
+        'employee_id', 'employee__department', 'date', 'status', 'clock_in', 'clock_out'
+    )
+
+
+def _upsert_summaries(summaries):
+    AttendanceMonthlySummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=['employee', 'period'],
+        update_fields=SUMMARY_FIELDS + ['updated_at'],
+    )
+
+
+def refresh_monthly_summaries(keys):
+    """
+    Recompute the summaries for a set of (employee_id, period) keys.
+
+    Runs one attendance query per distinct month touched, which keeps the
+    per-save cost of incremental maintenance at a handful of statements.
+    """
+    by_period = defaultdict(set)
+    for employee_id, period in keys:
+        by_period[month_start(period)].add(employee_id)
+
+    shifts = shift_table()
+    with transaction.atomic():
+        for period, employee_ids in by_period.items():
+            totals = {}
+            departments = {}
+            rows = _attendance_rows(Attendance.objects.filter(
+                employee_id__in=employee_ids,
+                date__gte=period,
+                date__lt=next_month(period),
+            ))
+            for employee_id, department, day, status, clock_in, clock_out in rows:
+                if employee_id not in totals:
+                    totals[employee_id] = MonthAccumulator(shifts.rule(employee_id, department).standard_hours)
+                    departments[employee_id] = department
+                totals[employee_id].add(day, status, clock_in, clock_out)
+
+            if totals:
+                _upsert_summaries([
+                    acc.to_summary(employee_id, departments[employee_id], period)
+                    for employee_id, acc in totals.items()
+                ])
+            emptied = employee_ids - set(totals)
+            if emptied:
+                AttendanceMonthlySummary.objects.filter(
+                    employee_id__in=emptied, period=period
+                ).delete()
+
+
+def _archived_attendance_rows(start, end, batch_size):
+    """
+    Rows of AttendanceArchive shaped like _attendance_rows. The archive may
+    be another database, departments come from one employee query instead
+    of a join.
+    """
+    archive = AttendanceArchive.objects.order_by('employee_id', 'date')
+    if start:
+        archive = archive.filter(date__gte=start)
+    if end:
+        archive = archive.filter(date__lt=next_month(end))
+    departments = dict(Employee.objects.values_list('id', 'department'))
+    rows = archive.values_list('employee_id', 'date', 'status', 'clock_in', 'clock_out')
+    for employee_id, day, status, clock_in, clock_out in rows.iterator(chunk_size=batch_size):
+        yield employee_id, departments.get(employee_id), day, status, clock_in, clock_out
+
+
+def rebuild_monthly_summaries(start=None, end=None, batch_size=2000):
+    """
+    Backfill the monthly rollup from raw attendance in a single ordered scan.
+
+    `start` and `end` are month start dates (inclusive). Existing summaries
+    in the range are replaced. Ranges reaching before the archive horizon
+    merge in archived attendance, an employee's month is wholly in one tier.
+    Returns the number of summary rows written.
+    """
+    attendance = Attendance.objects.order_by('employee_id', 'date')
+    summaries = AttendanceMonthlySummary.objects.all()
+    if start:
+        attendance = attendance.filter(date__gte=start)
+        summaries = summaries.filter(period__gte=start)
+    if end:
+        attendance = attendance.filter(date__lt=next_month(end))
+        summaries = summaries.filter(period__lte=end)
+    rows = _attendance_rows(attendance).iterator(chunk_size=batch_size)
+    if not start or start < horizon():
+        rows = heapq.merge(
+            rows, _archived_attendance_rows(start, end, batch_size), key=lambda row: (row[0], row[2]),
+        )
+
+    shifts = shift_table()
+    written = 0
+    batch = []
+    current_key = None
+    current = None
+    department = None
+
+    def flush():
+        nonlocal written
+        _upsert_summaries(batch)
+        written += len(batch)
+        batch.clear()
+
+    with transaction.atomic():
+        summaries.delete()
+        for employee_id, dept, day, status, clock_in, clock_out in rows:
+            key = (employee_id, month_start(day))
+            if key != current_key:
+                if current is not None:
+                    batch.append(current.to_summary(current_key[0], department, current_key[1]))
+                    if len(batch) >= batch_size:
+                        flush()
+                current_key, department = key, dept
+                current = MonthAccumulator(shifts.rule(employee_id, department).standard_hours)
+            current.add(day, status, clock_in, clock_out)
+        if current is not None:
+            batch.append(current.to_summary(current_key[0], department, current_key[1]))
+        if batch:
+            flush()
+    return written
+
+
+def refresh_employee_department(employee):
+    """Re-tag an employee's summaries after a department change"""
+    AttendanceMonthlySummary.objects.filter(employee=employee).exclude(
+        department=employee.department
+    ).update(department=employee.department)
+
+
+def refresh_departments(employee_ids, department):
+    """Re-tag the summaries of employees moved to `department` together"""
+    AttendanceMonthlySummary.objects.filter(employee_id__in=employee_ids).exclude(
+        department=department
+    ).update(department=department)
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class EmployeesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "employees"
+
+    def ready(self):
+        # Connect model signal handlers
+        from . import signals  # noqa: F401
+        # Opt-in slow query log, see SLOW_QUERY_THRESHOLD_MS
+        from django.core.signals import request_finished
+        from django.db.backends.signals import connection_created
+        from .slow_queries import flush, install
+        connection_created.connect(install)
+        request_finished.connect(flush)
@@ -0,0 +1,160 @@
+"""
+Archival of closed years of attendance and payroll.
+
+`manage.py archive_history` moves rows dated before the hot horizon out of
+Attendance and Payroll into AttendanceArchive and PayrollArchive, which can
+live in a separate `archive` database. The hot tables, and their indexes,
+then only grow with the last ARCHIVE_HOT_YEARS years. Attendance follows
+its payroll: it is archived once the employee's payroll of that month is,
+so payroll that can still be recomputed always finds its attendance hot.
+
+List endpoints read both tiers only when their date filter reaches before
+the horizon, so queries on current periods never touch the archive.
+"""
+from datetime import date
+from itertools import chain
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .models import Attendance, AttendanceArchive, Payroll, PayrollArchive
+from .routing import ARCHIVE
+from .versioning import bump_versions
+
+
+def archive_alias():
+    return ARCHIVE if ARCHIVE in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+def horizon(today=None):
+    """First day that stays in the hot tables, Jan 1 of the oldest hot year"""
+    today = today or date.today()
+    return date(today.year - getattr(settings, 'ARCHIVE_HOT_YEARS', 2) + 1, 1, 1)
+
+
+def reaches_archive(*days):
+    """Whether any of the ISO date strings falls before the horizon"""
+    limit = horizon()
+    for day in days:
+        try:
+            if day and date.fromisoformat(day) < limit:
+                return True
+        except ValueError:
+            pass
+    return False
+
+
+def archived(model):
+    """Archive queryset with employees loaded, joined when they share a database"""
+    queryset = model.objects.all()
+    if archive_alias() == DEFAULT_DB_ALIAS:
+        return queryset.select_related('employee')
+    return queryset.prefetch_related('employee')
+
+
+class Tiered:
+    """
+    Hot rows followed by archived rows, countable and sliceable like a
+    queryset so paginators can page through both. Each tier keeps its own
+    ordering, they are not interleaved: rows left hot before the horizon
+    (months with unpaid or adjusted payroll) list ahead of archived rows
+    that are more recent.
+    """
+
+    def __init__(self, hot, archive):
+        self.hot = hot
+        self.archive = archive
+        self._hot_count = None
+
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.hot.count()
+        return self._hot_count
+
+    def count(self):
+        return self.hot_count() + self.archive.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return chain(self.hot, self.archive)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return list(self[index:index + 1])[0]
+        start, stop = index.start or 0, index.stop
+        hot_count = self.hot_count()
+        rows = list(self.hot[start:stop]) if start < hot_count else []
+        if stop is None or stop > hot_count:
+            archive_stop = None if stop is None else stop - hot_count
+            rows += list(self.archive[max(start - hot_count, 0):archive_stop])
+        return rows
+
+
+def _delete_ids(model, ids, chunk_size=500):
+    """DELETE rows by id without the ORM's deletion collector and signals"""
+    connection = connections[DEFAULT_DB_ALIAS]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            cursor.execute(f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(chunk))})', chunk)
+
+
+def _move(model, archive_model, queryset, batch_size):
+    """Copy rows into the archive and delete them from the hot table, in batches"""
+    alias = archive_alias()
+    fields = [field.attname for field in model._meta.concrete_fields]
+    moved = 0
+    while True:
+        # Archive commits first: a failure in between leaves rows in both
+        # tiers, and the next run skips the copies and finishes the delete
+        with transaction.atomic(using=DEFAULT_DB_ALIAS), transaction.atomic(using=alias):
+            rows = list(queryset.order_by('id').values(*fields)[:batch_size])
+            if not rows:
+                break
+            archive_model.objects.using(alias).bulk_create(
+                [archive_model(**row) for row in rows], ignore_conflicts=True,
+            )
+            # Plain DELETE: archiving is not a deletion, no tombstones,
+            # payroll recomputation or summary refresh
+            _delete_ids(model, [row['id'] for row in rows])
+        moved += len(rows)
+    return moved
+
+
+def archive_history(before_year=None, batch_size=5000):
+    """
+    Move attendance and paid payroll of the years before `before_year` (at
+    most up to the horizon) into the archive. Payroll rows that are unpaid
+    or have adjustments stay hot, and so does the attendance of their
+    employee and month, which recomputing them reads.
+    """
+    before = horizon()
+    if before_year:
+        before = min(before, date(before_year, 1, 1))
+    payroll = _move(
+        Payroll, PayrollArchive,
+        Payroll.objects.filter(year__lt=before.year, status='Paid', adjustments__isnull=True),
+        batch_size,
+    )
+    hot_payroll = Payroll.objects.filter(
+        employee_id=OuterRef('employee_id'),
+        month=ExtractMonth(OuterRef('date')),
+        year=ExtractYear(OuterRef('date')),
+    )
+    attendance = _move(
+        Attendance, AttendanceArchive,
+        Attendance.objects.filter(date__lt=before).exclude(Exists(hot_payroll)),
+        batch_size,
+    )
+    if attendance or payroll:
+        bump_versions(Attendance, Payroll)
+    return {'before': before, 'attendance': attendance, 'payroll': payroll}
+
+
+def payroll_is_archived(month, year):
+    return date(year, month, 1) < horizon() and archived(PayrollArchive).filter(month=month, year=year).exists()
@@ -0,0 +1,281 @@
+import json
+import math
+import platform
+import statistics
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from io import StringIO
+
+import django
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections, reset_queries
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .models import User, Employee, Attendance, Payroll
+
+
+@dataclass
+class Case:
+    """One API call to measure. `prepare` runs untimed before each call"""
+    name: str
+    method: str
+    path: object  # str or callable(iteration, fixtures) -> str
+    data: object = None  # dict or callable(iteration, fixtures) -> dict
+    prepare: object = None
+    # Cap for expensive calls, measured fewer times than the rest
+    max_iterations: int = None
+
+    def resolve(self, value, iteration, fixtures):
+        return value(iteration, fixtures) if callable(value) else value
+
+
+def _clock_employee(iteration, fixtures):
+    employees = fixtures['employee_ids']
+    return {'employee_id': employees[iteration % len(employees)]}
+
+
+def _reset_clock(iteration, fixtures):
+    """Clock-ins cycle through employees, clear today's row when wrapping around"""
+    if iteration and iteration % len(fixtures['employee_ids']) == 0:
+        Attendance.objects.filter(date=date.today()).delete()
+
+
+def _reset_payroll(iteration, fixtures):
+    Payroll.objects.filter(month=fixtures['month'], year=fixtures['year']).delete()
+
+
+def _payslip_path(iteration, fixtures):
+    payroll_ids = fixtures['payroll_ids']
+    return f'/api/payroll/{payroll_ids[iteration % len(payroll_ids)]}/payslip/'
+
+
+CASES = [
+    Case('attendance.clock_in', 'post', '/api/attendance/clock/',
+         data=lambda i, f: dict(_clock_employee(i, f), clock_type='in'), prepare=_reset_clock),
+    Case('employees.stats', 'get', '/api/employees/stats/'),
+    Case('attendance.stats', 'get', '/api/attendance/stats/'),
+    Case('leaves.stats', 'get', '/api/leaves/stats/'),
+    Case('payroll.stats', 'get', lambda i, f: f"/api/payroll/stats/?month={f['payroll_month']}&year={f['payroll_year']}"),
+    Case('employees.list', 'get', '/api/employees/?department=Engineering&status=Active'),
+    Case('attendance.list', 'get',
+         lambda i, f: f"/api/attendance/?start_date={f['week_start']}&end_date={f['week_end']}"),
+    Case('leaves.list', 'get', '/api/leaves/?status=Approved'),
+    Case('payroll.list', 'get', lambda i, f: f"/api/payroll/?month={f['payroll_month']}&year={f['payroll_year']}"),
+    Case('payroll.payslip', 'get', _payslip_path),
+    Case('payroll.process', 'post', '/api/payroll/process/',
+         data=lambda i, f: {'month': f['month'], 'year': f['year']},
+         prepare=_reset_payroll, max_iterations=5),
+]
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(timings, queries):
+    milliseconds = [value * 1000 for value in timings]
+    return {
+        'iterations': len(milliseconds),
+        'queries': queries,
+        'mean_ms': round(statistics.fmean(milliseconds), 3),
+        'min_ms': round(min(milliseconds), 3),
+        'p50_ms': round(percentile(milliseconds, 0.50), 3),
+        'p90_ms': round(percentile(milliseconds, 0.90), 3),
+        'p95_ms': round(percentile(milliseconds, 0.95), 3),
+        'p99_ms': round(percentile(milliseconds, 0.99), 3),
+        'max_ms': round(max(milliseconds), 3),
+    }
+
+
+def load_scale(employees, years, seed):
+    """Replace the database contents with generated data of the given size"""
+    call_command(
+        'generate_data', employees=employees, years=years, seed=seed,
+        payroll_months=1, clear=True, stdout=StringIO(),
+    )
+
+
+def build_fixtures():
+    """Ids and dates the benchmark cases refer to"""
+    today = date.today()
+    payroll = Payroll.objects.order_by('-year', '-month').values('month', 'year').first() or {
+        'month': today.month, 'year': today.year,
+    }
+    return {
+        'employee_ids': list(Employee.objects.filter(status='Active').order_by('id').values_list('id', flat=True)[:500]),
+        'payroll_ids': list(Payroll.objects.order_by('id').values_list('id', flat=True)[:500]),
+        'payroll_month': payroll['month'],
+        'payroll_year': payroll['year'],
+        # The generator never covers the current month, so processing it is a full run
+        'month': today.month,
+        'year': today.year,
+        'week_start': today - timedelta(days=7),
+        'week_end': today,
+    }
+
+
+def authenticated_client():
+    user, _ = User.objects.get_or_create(
+        username='benchmark', defaults={'role': 'admin', 'is_staff': True},
+    )
+    token, _ = Token.objects.get_or_create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def run_case(client, case, fixtures, iterations):
+    """Time a case, counting the queries of one extra warm-up call"""
+    if case.max_iterations:
+        iterations = min(iterations, case.max_iterations)
+
+    def call(iteration):
+        if case.prepare:
+            case.prepare(iteration, fixtures)
+        path = case.resolve(case.path, iteration, fixtures)
+        data = case.resolve(case.data, iteration, fixtures)
+        request = getattr(client, case.method)
+        started = time.perf_counter()
+        response = request(path, data, format='json') if case.method != 'get' else request(path)
+        elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f'{case.name}: {case.method.upper()} {path} returned {response.status_code}')
+        return elapsed
+
+    # A full query log (bounded deque) would make the capture count nothing
+    reset_queries()
+    with CaptureQueriesContext(connection) as captured:
+        call(0)
+    # Read now, the captured list is a view on a log each request resets
+    queries = len(captured)
+    timings = [call(iteration) for iteration in range(1, iterations + 1)]
+    return dict(summarize(timings, queries), endpoint=case.name)
+
+
+def run_concurrent_clocks(fixtures, threads, iterations):
+    """
+    Clock `iterations` employees in and out from each of `threads` threads at
+    once, each thread with its own client and connection. Failed calls,
+    such as "database is locked", are counted rather than raised.
+    """
+    employee_ids = fixtures['employee_ids'][:threads * iterations]
+    Attendance.objects.filter(date=date.today(), employee_id__in=employee_ids).delete()
+    clients = [authenticated_client() for _ in range(threads)]
+    timings, errors = [], []
+    barrier = threading.Barrier(threads)
+
+    def work(index):
+        client = clients[index]
+        try:
+            barrier.wait()
+            for employee_id in employee_ids[index::threads]:
+                for clock_type in ('in', 'out'):
+                    started = time.perf_counter()
+                    try:
+                        response = client.post('/api/attendance/clock/',
+                                               {'employee_id': employee_id, 'clock_type': clock_type},
+                                               format='json')
+                        failed = response.status_code >= 400
+                    except DatabaseError:
+                        failed = True
+                    timings.append(time.perf_counter() - started)
+                    if failed:
+                        errors.append(employee_id)
+        finally:
+            connections.close_all()
+
+    workers = [threading.Thread(target=work, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    return dict(
+        summarize(timings, None),
+        endpoint=f'attendance.clock_concurrent[{threads}]',
+        errors=len(errors),
+        requests_per_second=round(len(timings) / elapsed, 1),
+    )
+
+
+def run_benchmarks(scales, iterations=20, years=0.25, seed=42, cases=None, log=None, concurrency=0):
+    """
+    Run every case at every scale and return the results document. With
+    `concurrency`, also clock in and out from that many threads at once.
+    """
+    cases = cases or CASES
+    results = []
+    for scale in scales:
+        if log:
+            log(f'Generating {scale} employees...')
+        load_scale(scale, years, seed)
+        fixtures = build_fixtures()
+        client = authenticated_client()
+        for case in cases:
+            result = run_case(client, case, fixtures, iterations)
+            result['scale'] = scale
+            results.append(result)
+            if log:
+                log(f"  {case.name:<22} p50 {result['p50_ms']:>9.2f} ms  "
+                    f"p95 {result['p95_ms']:>9.2f} ms  queries {result['queries']}")
+        if concurrency:
+            result = run_concurrent_clocks(fixtures, concurrency, iterations)
+            result['scale'] = scale
+            results.append(result)
+            if log:
+                log(f"  {result['endpoint']:<22} p50 {result['p50_ms']:>9.2f} ms  "
+                    f"p95 {result['p95_ms']:>9.2f} ms  errors {result['errors']}  "
+                    f"{result['requests_per_second']} req/s")
+    return {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'iterations': iterations,
+            'years': years,
+            'seed': seed,
+            'concurrency': concurrency,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Regressions of `current` against `baseline`: any increase in query count
+    or failed calls, or a p95 latency more than `threshold` (a fraction)
+    above the baseline.
+    """
+    previous = {(row['scale'], row['endpoint']): row for row in baseline['results']}
+    regressions = []
+    for row in current['results']:
+        before = previous.get((row['scale'], row['endpoint']))
+        if not before:
+            continue
+        if row.get('errors', 0) > before.get('errors', 0):
+            regressions.append(
+                f"{row['endpoint']} @ {row['scale']}: errors {before.get('errors', 0)} -> {row['errors']}"
+            )
+        if (row['queries'] or 0) > (before['queries'] or 0):
+            regressions.append(
+                f"{row['endpoint']} @ {row['scale']}: queries {before['queries']} -> {row['queries']}"
+            )
+        if row['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(
+                f"{row['endpoint']} @ {row['scale']}: p95 {before['p95_ms']:.2f} ms -> {row['p95_ms']:.2f} ms"
+            )
+    return regressions
+
+
+def load_results(path):
+    with open(path) as handle:
+        return json.load(handle)
@@ -0,0 +1,92 @@
+import itertools
+import json
+import queue
+import threading
+from collections import deque
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+# Queued to a subscriber that can no longer be served incrementally
+RESYNC = (0, 'resync', '{}')
+
+
+class BroadcastHub:
+    """
+    In-process publish/subscribe hub for server-sent events.
+
+    Each event is encoded once and handed to every subscriber queue, so the
+    cost of an event is one fan-out regardless of how many dashboards are
+    listening. A short replay buffer lets reconnecting clients resume from
+    their Last-Event-ID instead of refetching everything.
+
+    Events only reach subscribers in the process that saved the row, so the
+    live stream should be served by a single (threaded) worker process.
+    """
+
+    def __init__(self, replay_size=500, queue_size=1000):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._replay = deque(maxlen=replay_size)
+        self._queue_size = queue_size
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber and return its queue plus any missed events"""
+        subscriber = queue.Queue(maxsize=self._queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            backlog = []
+            if last_event_id is not None:
+                oldest = self._replay[0][0] if self._replay else self._last_id + 1
+                if last_event_id > self._last_id or last_event_id + 1 < oldest:
+                    # Unknown id or older than the replay window: resync
+                    backlog = None
+                else:
+                    backlog = [item for item in self._replay if item[0] > last_event_id]
+        return subscriber, backlog
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event_type, payload):
+        """Encode an event once and fan it out to all subscribers"""
+        data = json.dumps(payload, cls=DjangoJSONEncoder)
+        with self._lock:
+            self._last_id = next(self._ids)
+            item = (self._last_id, event_type, data)
+            self._replay.append(item)
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(item)
+            except queue.Full:
+                self._evict(subscriber)
+        return item[0]
+
+    def _evict(self, subscriber):
+        """Drop a slow consumer and tell it to resync on its next read"""
+        self.unsubscribe(subscriber)
+        try:
+            while True:
+                subscriber.get_nowait()
+        except queue.Empty:
+            pass
+        subscriber.put_nowait(RESYNC)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+def format_sse(event_id, event_type, data):
+    """Format a single server-sent event frame"""
+    # An empty id clears Last-Event-ID so a resynced client reconnects fresh
+    return f"id: {event_id or ''}\nevent: {event_type}\ndata: {data}\n\n"
+
+
+# Hub shared by the attendance signals and the live attendance stream
+attendance_hub = BroadcastHub()
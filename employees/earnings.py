@@ -0,0 +1,120 @@
+"""
+Year-to-date earnings per employee.
+
+EarningsYTD keeps, for every month an employee has a payroll row, the
+running totals of the year through that month. Any change to Payroll
+refreshes the affected employee-years in the same transaction, through the
+signals for single rows and explicit calls from the bulk payroll paths, so
+payslips and dashboards read YTD figures with one indexed lookup instead of
+aggregating the year. Archived payroll keeps counting for its year.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+
+from .archive import horizon
+from .models import EarningsYTD, Employee, Payroll, PayrollArchive
+
+
+AMOUNT_FIELDS = ['basic_salary', 'allowances', 'overtime', 'deductions', 'net_salary']
+
+
+def _amount_rows(model, condition):
+    return model.objects.filter(condition).order_by().values_list(
+        'employee_id', 'year', 'month', *AMOUNT_FIELDS
+    )
+
+
+def _accumulate(rows):
+    """EarningsYTD rows from (employee_id, year, month, *amounts) sorted rows"""
+    key = None
+    for employee_id, year, month, *amounts in rows:
+        if (employee_id, year) != key:
+            key = (employee_id, year)
+            totals = [Decimal(0)] * len(AMOUNT_FIELDS)
+            payslips = 0
+        totals = [total + amount for total, amount in zip(totals, amounts)]
+        payslips += 1
+        yield EarningsYTD(
+            employee_id=employee_id, year=year, month=month, payslips=payslips,
+            **dict(zip(AMOUNT_FIELDS, totals)),
+        )
+
+
+def _replace(condition, include_archive):
+    """Recompute the YTD rows matching `condition`, a Q on employee_id and year"""
+    rows = {}
+    if include_archive:
+        rows = {row[:3]: row for row in _amount_rows(PayrollArchive, condition)}
+    # A hot row wins over its copy left in the archive by an interrupted run
+    rows.update((row[:3], row) for row in _amount_rows(Payroll, condition))
+    accumulators = list(_accumulate(sorted(rows.values())))
+    EarningsYTD.objects.filter(condition).delete()
+    EarningsYTD.objects.bulk_create(accumulators, batch_size=1000)
+    return len(accumulators)
+
+
+def refresh_earnings_ytd(keys):
+    """
+    Recompute the YTD rows of a set of (employee_id, year) keys, with a
+    fixed number of statements whatever the number of keys.
+    """
+    by_year = defaultdict(set)
+    for employee_id, year in keys:
+        by_year[year].add(employee_id)
+    if not by_year:
+        return
+    condition = reduce(or_, (
+        Q(year=year, employee_id__in=employee_ids) for year, employee_ids in by_year.items()
+    ))
+    # No savepoint: callers are already in a transaction, or it is the only write
+    with transaction.atomic(savepoint=False):
+        _replace(condition, include_archive=min(by_year) < horizon().year)
+
+
+def rebuild_earnings_ytd(year=None, batch_size=500):
+    """
+    Rebuild the YTD rows from payroll, of one year or all, `batch_size`
+    employees at a time. Returns the number of rows written.
+    """
+    employee_ids = list(Employee.objects.order_by('id').values_list('id', flat=True))
+    include_archive = year is None or year < horizon().year
+    written = 0
+    with transaction.atomic():
+        if year is None:
+            EarningsYTD.objects.all().delete()
+        for start in range(0, len(employee_ids), batch_size):
+            condition = Q(employee_id__in=employee_ids[start:start + batch_size])
+            if year is not None:
+                condition &= Q(year=year)
+            written += _replace(condition, include_archive)
+    return written
+
+
+def earnings_ytd(employee_id, year, month=None):
+    """YTD totals through `month` (default: the latest month on file), or None"""
+    rows = EarningsYTD.objects.filter(employee_id=employee_id, year=year)
+    if month is not None:
+        rows = rows.filter(month__lte=month)
+    return rows.order_by('-month').first()
+
+
+def ytd_data(row):
+    """API representation of an EarningsYTD row"""
+    if row is None:
+        return None
+    return {
+        'year': row.year,
+        'through_month': row.month,
+        'payslips': row.payslips,
+        'basic_salary': float(row.basic_salary),
+        'allowances': float(row.allowances),
+        'overtime': float(row.overtime),
+        'gross_salary': float(row.gross_salary),
+        'deductions': float(row.deductions),
+        'net_salary': float(row.net_salary),
+    }
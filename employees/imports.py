@@ -0,0 +1,216 @@
+"""
+Bulk attendance import from time-clock exports.
+
+The CSV is read as a stream and written in chunks: each chunk is validated
+in memory against an employee map built once, then upserted into
+Attendance on (employee, date) with one prepared statement. Memory stays
+bounded by the chunk size. The side effects of `save()` (monthly
+summaries, payroll recomputation, table version) run once at the end for
+every employee and month touched.
+
+Columns: `employee_id` or `email`, `date` (YYYY-MM-DD), and optionally
+`clock_in` / `clock_out` (H:MM[:SS]), `status` and `notes`. Without a
+status, a row is Present, or Late when clocked in after the start of the
+employee's shift.
+"""
+import csv
+from datetime import date, time
+
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .analytics import month_start, refresh_monthly_summaries
+from .broadcast import attendance_hub
+from .models import Attendance, Employee
+from .payroll import dates_to_payroll_keys, mark_payroll_dirty
+from .shifts import shift_table
+from .versioning import bump_versions
+
+
+STATUSES = {value for value, _ in Attendance.STATUS_CHOICES}
+INSERTED_COLUMNS = ['employee_id', 'date', 'status', 'clock_in', 'clock_out', 'notes', 'created_at', 'updated_at']
+UPDATED_COLUMNS = ['status', 'clock_in', 'clock_out', 'notes', 'updated_at']
+# Errors kept for the report, the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+NOT_UTF8 = 'not UTF-8 text'
+
+
+class ImportResult:
+    """Counters and per-row errors of an import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
+
+
+def employee_map():
+    """(employee id, shift rule) keyed by id string and lower-cased email"""
+    shifts = shift_table()
+    lookup = {}
+    for employee_id, email, department in Employee.objects.order_by().values_list('id', 'email', 'department'):
+        lookup[str(employee_id)] = lookup[email.lower()] = (employee_id, shifts.rule(employee_id, department))
+    return lookup
+
+
+def _parse_time(value):
+    """H:MM or H:MM:SS, device exports often drop the leading zero"""
+    if not value:
+        return None
+    parts = value.split(':')
+    if len(parts) not in (2, 3):
+        raise ValueError(value)
+    return time(*map(int, parts))
+
+
+def parse_row(row, employees):
+    """
+    (employee_id, date, status, clock_in, clock_out, notes) of one CSV row,
+    raises ValueError with a readable message. Plain tuples, model
+    instances cost more to build than the whole upsert.
+    """
+    key = (row.get('employee_id') or row.get('email') or '').strip().lower()
+    if not key:
+        raise ValueError('employee_id or email is required')
+    if key not in employees:
+        raise ValueError(f'unknown employee {key!r}')
+    employee_id, rule = employees[key]
+    try:
+        day = date.fromisoformat((row.get('date') or '').strip())
+    except ValueError:
+        raise ValueError(f"invalid date {row.get('date')!r}")
+    try:
+        clock_in = _parse_time((row.get('clock_in') or '').strip())
+        clock_out = _parse_time((row.get('clock_out') or '').strip())
+    except ValueError:
+        raise ValueError('clock_in and clock_out must be H:MM[:SS]')
+    if clock_out and not clock_in:
+        raise ValueError('clock_out without clock_in')
+    status = (row.get('status') or '').strip()
+    if not status:
+        status = rule.status(clock_in) if clock_in else 'Present'
+    elif status not in STATUSES:
+        raise ValueError(f'invalid status {status!r}')
+    return employee_id, day, status, clock_in, clock_out, (row.get('notes') or '').strip()
+
+
+def _upsert_sql(connection):
+    table = connection.ops.quote_name(Attendance._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(column) for column in INSERTED_COLUMNS)
+    updates = ', '.join(
+        f'{connection.ops.quote_name(column)} = excluded.{connection.ops.quote_name(column)}'
+        for column in UPDATED_COLUMNS
+    )
+    placeholders = ', '.join(['%s'] * len(INSERTED_COLUMNS))
+    return (
+        f'INSERT INTO {table} ({columns}) VALUES ({placeholders}) '
+        f'ON CONFLICT (employee_id, date) DO UPDATE SET {updates}'
+    )
+
+
+def _write_chunk(records, result):
+    """
+    Upsert one chunk with a single prepared statement. The ORM's bulk_create
+    compiles SQL per row, which dominated the import time.
+    """
+    ops = connection.ops
+    now = ops.adapt_datetimefield_value(timezone.now())
+    params = [
+        (
+            employee_id, ops.adapt_datefield_value(day), status,
+            ops.adapt_timefield_value(clock_in), ops.adapt_timefield_value(clock_out),
+            notes, now, now,
+        )
+        for employee_id, day, status, clock_in, clock_out, notes in records.values()
+    ]
+    with transaction.atomic():
+        existing = set(
+            Attendance.objects.filter(
+                employee_id__in={employee_id for employee_id, _ in records},
+                date__in={day for _, day in records},
+            ).values_list('employee_id', 'date')
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(_upsert_sql(connection), params)
+    updated = len(existing & records.keys())
+    result.updated += updated
+    result.created += len(records) - updated
+
+
+def import_attendance(lines, chunk_size=5000):
+    """
+    Import CSV text lines (a file object or any iterable of str). A later
+    row for the same employee and day replaces an earlier one.
+    """
+    result = ImportResult()
+    employees = employee_map()
+    reader = csv.DictReader(lines)
+    try:
+        fieldnames = reader.fieldnames
+    except UnicodeDecodeError:
+        result.error(1, NOT_UTF8)
+        return result
+    if not fieldnames or 'date' not in fieldnames or not ({'employee_id', 'email'} & set(fieldnames)):
+        result.error(1, 'header must include date and employee_id or email')
+        return result
+
+    # Bounded by employees x months, not by rows
+    summary_keys = set()
+    payroll_keys = set()
+    records = {}
+    first_line = 2
+
+    def flush():
+        try:
+            _write_chunk(records, result)
+        except DatabaseError as exc:
+            result.error(first_line, f'chunk up to line {reader.line_num} not imported: {exc}')
+            return
+        for employee_id, day in records:
+            summary_keys.add((employee_id, month_start(day)))
+            payroll_keys.update(dates_to_payroll_keys(employee_id, day))
+
+    try:
+        for row in reader:
+            result.rows += 1
+            try:
+                record = parse_row(row, employees)
+            except ValueError as exc:
+                result.error(reader.line_num, str(exc))
+                continue
+            records[record[:2]] = record
+            if len(records) >= chunk_size:
+                flush()
+                records = {}
+                first_line = reader.line_num + 1
+    except UnicodeDecodeError:
+        # The decoder can't resume past the bad bytes, the rows before them
+        # are still imported
+        result.error(reader.line_num + 1, f'{NOT_UTF8}, the rest of the file was skipped')
+    if records:
+        flush()
+
+    if result.created or result.updated:
+        refresh_monthly_summaries(summary_keys)
+        mark_payroll_dirty(payroll_keys, reason='Attendance imported')
+        bump_versions(Attendance)
+        if month_start(date.today()) in {period for _, period in summary_keys}:
+            # Too many changes for incremental events, dashboards refetch
+            attendance_hub.publish('resync', {})
+    return result
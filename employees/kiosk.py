@@ -0,0 +1,157 @@
+"""
+Batch sync of punches taken on shared kiosks.
+
+A kiosk that lost connectivity queues its punches, each with an idempotency
+key, and sends the backlog in the order the punches were taken. A batch is
+applied in one transaction: the punches are folded in memory onto the
+attendance rows they touch, the rows are written with one insert and one
+update, and the outcome of every punch is kept as a PunchReceipt. Punches
+whose key already has a receipt are not applied again and get the recorded
+outcome back, so replaying a batch is a single lookup.
+
+Punches are dated and timed by the kiosk clock, not by arrival, and follow
+the rules of the clock endpoint: the first clock in of a day sets the
+status from the employee's shift, a clock out needs an earlier clock in.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import refresh_monthly_summaries
+from .broadcast import attendance_hub
+from .models import Attendance, Employee, PunchReceipt
+from .payroll import dates_to_payroll_keys, mark_payroll_dirty
+from .shifts import shift_table
+from .versioning import bump_versions
+
+
+UPDATED_FIELDS = ['status', 'clock_in', 'clock_out', 'updated_at']
+
+
+def _apply(punch, rule, rows, created, changes):
+    """Fold one punch onto the attendance rows, the error message when rejected"""
+    local = timezone.localtime(punch['timestamp'])
+    day_key = (punch['employee_id'], local.date())
+    at = local.time()
+    row = rows.get(day_key)
+
+    if punch['clock_type'] == 'in':
+        if row is not None and row.clock_in:
+            return 'Already clocked in that day'
+        if row is None:
+            row = rows[day_key] = Attendance(employee_id=day_key[0], date=day_key[1])
+            created.add(day_key)
+        punch_status = rule.status(at)
+        changes[day_key].add('clock_in')
+        if row.status != punch_status:
+            changes[day_key].add('status')
+        row.clock_in = at
+        row.status = punch_status
+    else:
+        if row is None or not row.clock_in:
+            return 'Must clock in first'
+        if at < row.clock_in:
+            return 'Clock out before clock in'
+        row.clock_out = at
+        changes[day_key].add('clock_out')
+    return ''
+
+
+def _write(rows, created, changes):
+    """Save the changed rows set-based, then the side effects `save()` would have"""
+    new_rows = [rows[key] for key in changes if key in created]
+    updated_rows = [rows[key] for key in changes if key not in created]
+    now = timezone.now()
+    for row in updated_rows:
+        row.updated_at = now
+    # Signals are skipped, their work is done once for the whole batch below
+    Attendance.objects.bulk_create(new_rows)
+    Attendance.objects.bulk_update(updated_rows, UPDATED_FIELDS)
+
+    payroll_keys = set()
+    for employee_id, day in changes:
+        payroll_keys.update(dates_to_payroll_keys(employee_id, day))
+    mark_payroll_dirty(payroll_keys, reason='Kiosk punches synced')
+
+    events = []
+    for key, changed in changes.items():
+        row = rows[key]
+        events.append({
+            'id': row.pk,
+            'employee': row.employee_id,
+            'date': row.date,
+            'status': row.status,
+            'clock_in': row.clock_in,
+            'clock_out': row.clock_out,
+            'changes': sorted(changed),
+        })
+
+    def after_commit():
+        refresh_monthly_summaries(set(changes))
+        bump_versions(Attendance)
+        for payload in events:
+            attendance_hub.publish('attendance', payload)
+    transaction.on_commit(after_commit)
+
+
+def sync_punches(punches, device=''):
+    """
+    Apply validated punches (dicts of key, employee_id, clock_type and an
+    aware timestamp) in order. Returns the counts and one result per punch,
+    in the order given.
+    """
+    with transaction.atomic():
+        receipts = {
+            receipt.key: receipt
+            for receipt in PunchReceipt.objects.filter(key__in={punch['key'] for punch in punches})
+        }
+        # First occurrence of each key not seen before, in kiosk order
+        pending = {}
+        for punch in punches:
+            if punch['key'] not in receipts:
+                pending.setdefault(punch['key'], punch)
+
+        if pending:
+            employee_ids = {punch['employee_id'] for punch in pending.values()}
+            known = dict(Employee.objects.filter(id__in=employee_ids).values_list('id', 'department'))
+            shifts = shift_table()
+            days = {timezone.localtime(punch['timestamp']).date() for punch in pending.values()}
+            rows = {
+                (row.employee_id, row.date): row
+                for row in Attendance.objects.filter(employee_id__in=known, date__in=days)
+            }
+            created = set()
+            changes = defaultdict(set)
+
+            new_receipts = []
+            for key, punch in pending.items():
+                if punch['employee_id'] in known:
+                    rule = shifts.rule(punch['employee_id'], known[punch['employee_id']])
+                    error = _apply(punch, rule, rows, created, changes)
+                else:
+                    error = 'Employee not found'
+                receipts[key] = PunchReceipt(
+                    key=key,
+                    employee_id=punch['employee_id'],
+                    clock_type=punch['clock_type'],
+                    punched_at=punch['timestamp'],
+                    outcome='rejected' if error else 'applied',
+                    error=error,
+                    device=device,
+                )
+                new_receipts.append(receipts[key])
+
+            if changes:
+                _write(rows, created, changes)
+            PunchReceipt.objects.bulk_create(new_receipts)
+
+    results = []
+    counts = {'applied': 0, 'rejected': 0, 'replayed': 0}
+    for punch in punches:
+        result = receipts[punch['key']].as_result()
+        # Applied by an earlier request, or earlier in this batch
+        result['replayed'] = pending.get(result['key']) is not punch
+        counts['replayed' if result['replayed'] else result['outcome']] += 1
+        results.append(result)
+    return {**counts, 'results': results}
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from employees.archive import archive_history, horizon
+
+
+class Command(BaseCommand):
+    help = 'Move attendance and paid payroll of closed years into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before-year', type=int,
+                            help='Archive years before this one (default and maximum: the hot horizon)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Hot tables keep everything from {horizon()}')
+        result = archive_history(options['before_year'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Archived {result['attendance']} attendance and {result['payroll']} payroll "
+            f"rows dated before {result['before']}"
+        ))
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from employees.benchmarks import compare, load_results, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Measure latency percentiles and query counts of the API hot paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='100,1000',
+                            help='Comma-separated employee counts to benchmark at')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed calls per endpoint')
+        parser.add_argument('--years', type=float, default=0.25, help='Years of generated attendance')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--concurrency', type=int, default=0,
+                            help='Also clock in and out from this many threads at once')
+        parser.add_argument('--output', default='benchmark-results.json', help='JSON results file, "-" for stdout')
+        parser.add_argument('--compare', help='Previous results file to check for regressions')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed p95 slowdown against --compare, as a fraction')
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(value) for value in options['scales'].split(',') if value]
+        except ValueError:
+            raise CommandError('--scales must be a comma-separated list of integers')
+        if not scales or min(scales) < 1 or options['iterations'] < 1 or options['concurrency'] < 0:
+            raise CommandError('--scales and --iterations must be positive')
+        baseline = load_results(options['compare']) if options['compare'] else None
+
+        # Benchmarks wipe and regenerate data, so they run in a throwaway database
+        old_name = connection.settings_dict['NAME']
+        temp_dir = None
+        if connection.vendor == 'sqlite':
+            # On disk rather than the default in-memory test database, like production
+            temp_dir = tempfile.TemporaryDirectory()
+            connection.settings_dict['TEST']['NAME'] = os.path.join(temp_dir.name, 'benchmark.sqlite3')
+            # A throwaway file, so measure with the journaling production would use
+            connection.settings_dict['OPTIONS']['wal'] = True
+        setup_test_environment(debug=False)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = run_benchmarks(
+                scales,
+                iterations=options['iterations'],
+                years=options['years'],
+                seed=options['seed'],
+                log=self.stdout.write,
+                concurrency=options['concurrency'],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if temp_dir:
+                temp_dir.cleanup()
+
+        document = json.dumps(results, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(document)
+        else:
+            with open(options['output'], 'w') as handle:
+                handle.write(document + '\n')
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline:
+            regressions = compare(baseline, results, options['threshold'])
+            if regressions:
+                for line in regressions:
+                    self.stderr.write(f'  {line}')
+                raise CommandError(f'{len(regressions)} regression(s) against {options["compare"]}')
+            self.stdout.write(self.style.SUCCESS('✅ No regressions'))
@@ -0,0 +1,275 @@
+import multiprocessing
+import random
+import time as timer
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections, models, transaction
+from django.db.models import Max
+
+from employees.analytics import rebuild_monthly_summaries
+from employees.archive import archive_alias
+from employees.models import Employee, Attendance, AttendanceArchive, Leave, Payroll, PayrollArchive, Tombstone
+from employees.payroll import process_payroll
+from employees.salaries import start_salaries
+from employees.versioning import bump_versions
+
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda',
+               'William', 'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+              'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Moore']
+POSITIONS = {
+    'Engineering': ['Developer', 'Senior Developer', 'DevOps Engineer', 'QA Engineer'],
+    'Design': ['UI/UX Designer', 'Graphic Designer'],
+    'Marketing': ['Marketing Specialist', 'Marketing Manager'],
+    'HR': ['HR Officer', 'Recruiter'],
+    'Sales': ['Sales Representative', 'Account Manager'],
+}
+LEAVE_TYPES = ['Vacation', 'Sick Leave', 'Personal', 'Work From Home', 'Unpaid']
+
+# Precomputed punch times, picking from a list is much cheaper than building times per row
+ON_TIME_CLOCK_INS = [time(8, minute) for minute in range(0, 60, 3)]
+LATE_CLOCK_INS = [time(9, minute) for minute in range(5, 60, 5)]
+CLOCK_OUTS = [time(hour, minute) for hour in (16, 17, 18, 19) for minute in range(0, 60, 5)]
+
+
+def _working_days(start, end):
+    days = []
+    current = start
+    while current <= end:
+        if current.weekday() < 5:
+            days.append(current)
+        current += timedelta(days=1)
+    return days
+
+
+def _generate_chunk(task):
+    """
+    Generate and insert attendance and leave for a slice of employees.
+
+    Each slice has its own random generator derived from the seed, so the
+    output does not depend on how many worker processes are used.
+    """
+    chunk_index, employees, days, options = task
+    rng = random.Random(f"{options['seed']}:{chunk_index}")
+    batch_size = options['batch_size']
+    leave_rate = options['leave_rate']
+    absence_rate = options['absence_rate']
+    late_rate = options['late_rate']
+
+    attendance_batch = []
+    leaves = []
+    attendance_count = 0
+
+    def flush():
+        nonlocal attendance_count
+        Attendance.objects.bulk_create(attendance_batch, batch_size=batch_size)
+        attendance_count += len(attendance_batch)
+        attendance_batch.clear()
+
+    # Every bulk insert is its own short transaction, so parallel workers
+    # never hold the database write lock while generating rows
+    for employee_id, join_date in employees:
+        on_leave = set()
+        # Leave requests arrive as short spans, sized to hit the leave rate on average
+        index = 0
+        while index < len(days):
+            if rng.random() < leave_rate / 3:
+                span = days[index:index + rng.randint(1, 5)]
+                if span[0] >= join_date:
+                    leaves.append(Leave(
+                        employee_id=employee_id,
+                        leave_type=rng.choice(LEAVE_TYPES),
+                        start_date=span[0],
+                        end_date=span[-1],
+                        days=len(span),
+                        status='Approved',
+                        reason='Generated',
+                    ))
+                    on_leave.update(span)
+                index += len(span)
+            else:
+                index += 1
+
+        for day in days:
+            if day < join_date:
+                continue
+            if day in on_leave:
+                attendance_batch.append(Attendance(employee_id=employee_id, date=day, status='On Leave'))
+                continue
+            roll = rng.random()
+            if roll < absence_rate:
+                attendance_batch.append(Attendance(employee_id=employee_id, date=day, status='Absent'))
+                continue
+            late = roll < absence_rate + late_rate
+            attendance_batch.append(Attendance(
+                employee_id=employee_id,
+                date=day,
+                status='Late' if late else 'Present',
+                clock_in=rng.choice(LATE_CLOCK_INS if late else ON_TIME_CLOCK_INS),
+                clock_out=rng.choice(CLOCK_OUTS),
+            ))
+            if len(attendance_batch) >= batch_size:
+                flush()
+
+    if attendance_batch:
+        flush()
+    Leave.objects.bulk_create(leaves, batch_size=batch_size)
+    return attendance_count, len(leaves)
+
+
+def _dependents(model):
+    """`model` and every model cascading from it, children before their parents"""
+    ordered = []
+    for relation in model._meta.related_objects:
+        if relation.on_delete is models.CASCADE:
+            ordered += [child for child in _dependents(relation.related_model) if child not in ordered]
+    return ordered + [model]
+
+
+def _clear_tables(alias, cleared):
+    """
+    Empty the tables of `cleared`, in order, with the backend's flush
+    statements.
+
+    A queryset delete loads every row to send the per-row signals
+    (tombstones, rollup and payroll bookkeeping), which takes far longer
+    than generating the data.
+    """
+    ops = connections[alias].ops
+    ops.execute_sql_flush(ops.sql_flush(no_style(), [model._meta.db_table for model in cleared]))
+
+
+def _run_in_worker(task):
+    try:
+        return _generate_chunk(task)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Generate large volumes of synthetic HR data for load and scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=1000, help='Number of employees to create')
+        parser.add_argument('--years', type=float, default=1, help='Years of attendance history')
+        parser.add_argument('--leave-rate', type=float, default=0.05,
+                            help='Approximate fraction of working days spent on leave')
+        parser.add_argument('--absence-rate', type=float, default=0.03)
+        parser.add_argument('--late-rate', type=float, default=0.10)
+        parser.add_argument('--payroll-months', type=int, default=3,
+                            help='Process payroll for this many past months (older ones are marked Paid)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, same seed gives the same data')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes generating attendance')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--chunk-size', type=int, default=500, help='Employees per unit of work')
+        parser.add_argument('--clear', action='store_true', help='Delete all existing employees, their records and archives first')
+
+    def handle(self, *args, **options):
+        if options['employees'] < 1 or options['years'] <= 0:
+            raise CommandError('--employees and --years must be positive')
+        started = timer.monotonic()
+
+        if options['clear']:
+            self.stdout.write('Clearing existing data...')
+            # Archived rows and tombstones only point at employees by id
+            _clear_tables(archive_alias(), [AttendanceArchive, PayrollArchive])
+            _clear_tables(DEFAULT_DB_ALIAS, [Tombstone, *_dependents(Employee)])
+
+        end = date.today() - timedelta(days=1)
+        start = end - timedelta(days=int(options['years'] * 365))
+        days = _working_days(start, end)
+
+        employees = self._create_employees(options, start)
+        self.stdout.write(f'Created {len(employees)} employees ({timer.monotonic() - started:.1f}s)')
+
+        tasks = [
+            (index, employees[offset:offset + options['chunk_size']], days, options)
+            for index, offset in enumerate(range(0, len(employees), options['chunk_size']))
+        ]
+        attendance_count = leave_count = 0
+        if options['workers'] > 1:
+            # Children open their own connections, never share the parent's
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(options['workers']) as pool:
+                results = pool.imap_unordered(_run_in_worker, tasks)
+                for attendance, leaves in results:
+                    attendance_count += attendance
+                    leave_count += leaves
+        else:
+            for task in tasks:
+                attendance, leaves = _generate_chunk(task)
+                attendance_count += attendance
+                leave_count += leaves
+        self.stdout.write(
+            f'Created {attendance_count} attendance records and {leave_count} leave requests '
+            f'({timer.monotonic() - started:.1f}s)'
+        )
+
+        # Bulk inserts skip the signals that keep the rollup current
+        summaries = rebuild_monthly_summaries(date(start.year, start.month, 1), batch_size=options['batch_size'])
+        self.stdout.write(f'Rebuilt {summaries} monthly summaries ({timer.monotonic() - started:.1f}s)')
+
+        payroll_count = self._process_payroll(options['payroll_months'], end)
+        self.stdout.write(f'Processed {payroll_count} payroll records ({timer.monotonic() - started:.1f}s)')
+
+        bump_versions(Employee, Attendance, Leave, Payroll)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Generated data in {timer.monotonic() - started:.1f}s'
+        ))
+
+    def _create_employees(self, options, history_start):
+        """Insert employees with explicit ids and return (id, join_date) pairs"""
+        rng = random.Random(options['seed'])
+        first_id = (Employee.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        departments = list(POSITIONS)
+        span = (date.today() - history_start).days
+
+        employees = []
+        for offset in range(options['employees']):
+            employee_id = first_id + offset
+            department = rng.choice(departments)
+            # Most employees predate the history window, the rest joined during it
+            join_date = history_start - timedelta(days=rng.randint(0, 2000))
+            if rng.random() < 0.3:
+                join_date = history_start + timedelta(days=rng.randint(0, span))
+            employees.append(Employee(
+                id=employee_id,
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                email=f'employee{employee_id}@generated.example.com',
+                department=department,
+                position=rng.choice(POSITIONS[department]),
+                salary=Decimal(rng.randrange(3000, 15000, 50)),
+                join_date=join_date,
+                status='Active',
+            ))
+
+        with transaction.atomic():
+            Employee.objects.bulk_create(employees, batch_size=options['batch_size'])
+            start_salaries(employees)
+        # Explicit ids leave sequence-backed databases behind, move them forward
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Employee]):
+                cursor.execute(sql)
+        return [(employee.id, employee.join_date) for employee in employees]
+
+    def _process_payroll(self, months, end):
+        """Run payroll for the last `months` complete months, all but the latest are Paid"""
+        periods = []
+        current = date(end.year, end.month, 1)
+        for _ in range(months):
+            current = (current - timedelta(days=1)).replace(day=1)
+            periods.append((current.month, current.year))
+
+        count = 0
+        for index, (month, year) in enumerate(reversed(periods)):
+            records = process_payroll(month, year)
+            count += len(records)
+            if index < len(periods) - 1:
+                Payroll.objects.filter(month=month, year=year).update(status='Paid')
+        return count
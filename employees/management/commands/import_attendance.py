@@ -0,0 +1,39 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.imports import import_attendance
+
+
+class Command(BaseCommand):
+    help = 'Upsert attendance from a time-clock CSV export (see employees/imports.py for the columns)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file, "-" for stdin')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows validated and written together')
+        parser.add_argument('--show-errors', type=int, default=20, help='Row errors to print')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        started = time.perf_counter()
+        if options['path'] == '-':
+            result = import_attendance(sys.stdin, chunk_size=options['chunk_size'])
+        else:
+            try:
+                with open(options['path'], newline='', encoding='utf-8-sig') as handle:
+                    result = import_attendance(handle, chunk_size=options['chunk_size'])
+            except OSError as exc:
+                raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        for error in result.errors[:options['show_errors']]:
+            self.stderr.write(f"  line {error['line']}: {error['error']}")
+        if result.failed > options['show_errors']:
+            self.stderr.write(f'  ... {result.failed - options["show_errors"]} more')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {result.rows} rows in {elapsed:.1f}s: {result.created} created, '
+            f'{result.updated} updated, {result.failed} failed'
+        ))
+
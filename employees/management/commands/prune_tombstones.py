@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from employees.tombstones import prune_tombstones, tombstone_horizon
+
+
+class Command(BaseCommand):
+    help = 'Delete sync tombstones older than SYNC_TOMBSTONE_DAYS (run daily, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = prune_tombstones(now)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Deleted {deleted} tombstones from before {tombstone_horizon(now):%Y-%m-%d %H:%M}'
+        ))
@@ -0,0 +1,31 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.analytics import rebuild_monthly_summaries
+
+
+class Command(BaseCommand):
+    help = 'Backfill the monthly attendance rollup used by reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First month to rebuild (YYYY-MM)')
+        parser.add_argument('--end', help='Last month to rebuild (YYYY-MM)')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        start = self._parse_month(options['start'])
+        end = self._parse_month(options['end'])
+
+        self.stdout.write('Rebuilding monthly attendance summaries...')
+        written = rebuild_monthly_summaries(start, end, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Wrote {written} monthly summaries'))
+
+    def _parse_month(self, value):
+        if not value:
+            return None
+        try:
+            year, month = value.split('-')
+            return date(int(year), int(month), 1)
+        except ValueError:
+            raise CommandError(f'Invalid month "{value}", expected YYYY-MM')
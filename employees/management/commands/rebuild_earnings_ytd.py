@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from employees.earnings import rebuild_earnings_ytd
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the year-to-date earnings totals from payroll (after imports or raw changes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Only rebuild this year (default: every year)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Employees per batch')
+
+    def handle(self, *args, **options):
+        written = rebuild_earnings_ytd(year=options['year'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {written} year-to-date rows rebuilt'))
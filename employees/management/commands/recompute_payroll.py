@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from employees.payroll import PayrollPlan, recompute_dirty_payroll
+
+
+class Command(BaseCommand):
+    help = 'Recompute payroll rows queued by attendance or leave changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        plan = PayrollPlan.compile()
+        totals = {'recomputed': 0, 'adjusted': 0, 'unchanged': 0}
+        remaining = None
+        while True:
+            result = recompute_dirty_payroll(plan, batch_size=options['batch_size'])
+            for name in totals:
+                totals[name] += result[name]
+            # Stop when drained, or when rows keep being re-queued concurrently
+            if not result['remaining'] or (remaining is not None and result['remaining'] >= remaining):
+                break
+            remaining = result['remaining']
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Recomputed {totals['recomputed']}, adjusted {totals['adjusted']}, "
+            f"unchanged {totals['unchanged']}"
+        ))
@@ -0,0 +1,32 @@
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.reconcile import reconcile_day
+
+
+class Command(BaseCommand):
+    help = 'Record absences and close or flag open punches of past days (run nightly, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat,
+                            help='Last day to reconcile, YYYY-MM-DD (default: yesterday)')
+        parser.add_argument('--days', type=int, default=1,
+                            help='Days to reconcile, ending at --date, to catch up on missed runs')
+        parser.add_argument('--close-at', type=lambda value: datetime.strptime(value, '%H:%M').time(),
+                            help='Clock out open punches at this time (HH:MM) instead of flagging them')
+
+    def handle(self, *args, **options):
+        last = options['date'] or date.today() - timedelta(days=1)
+        if last >= date.today():
+            raise CommandError('Only past days can be reconciled, today is still being clocked')
+        if options['days'] < 1:
+            raise CommandError('--days must be positive')
+
+        for offset in range(options['days'] - 1, -1, -1):
+            result = reconcile_day(last - timedelta(days=offset), close_at=options['close_at'])
+            self.stdout.write(
+                f"{result['date']}: {result['absent']} absent, {result['on_leave']} on leave, "
+                f"{result['closed']} punches closed, {result['flagged']} flagged"
+            )
+        self.stdout.write(self.style.SUCCESS('✅ Attendance reconciled'))
@@ -0,0 +1,190 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from rest_framework import serializers
+
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name -> (help text, buckets); every request observes each of these once
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Wall time of API requests', SECONDS_BUCKETS),
+    'http_request_db_queries': ('Database queries per request', QUERY_BUCKETS),
+    'http_request_db_seconds': ('Time spent in database queries per request', SECONDS_BUCKETS),
+    'http_request_serializer_seconds': ('Time spent serializing and rendering per request', SECONDS_BUCKETS),
+    'http_response_size_bytes': ('Response body size', BYTES_BUCKETS),
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram, bucket counts are cumulated when exported"""
+
+    __slots__ = ['buckets', 'counts', 'total', 'count']
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class RequestMetrics:
+    """Measurements of the request being handled, filled in as it runs"""
+
+    __slots__ = ['view', 'queries', 'db_seconds', 'serializer_seconds']
+
+    def __init__(self):
+        self.view = 'unresolved'
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+
+
+current_request = ContextVar('current_request_metrics', default=None)
+
+
+class MetricsRegistry:
+    """
+    In-process aggregation of request metrics per (view, method).
+
+    Each worker process keeps its own numbers, so with several workers
+    every scrape only sees the process that answered it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self._responses = {}
+
+    def record(self, view, method, status, duration, metrics, size):
+        labels = (view, method)
+        values = {
+            'http_request_duration_seconds': duration,
+            'http_request_db_queries': metrics.queries,
+            'http_request_db_seconds': metrics.db_seconds,
+            'http_request_serializer_seconds': metrics.serializer_seconds,
+            'http_response_size_bytes': size,
+        }
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {
+                    name: Histogram(buckets) for name, (_, buckets) in HISTOGRAMS.items()
+                }
+            for name, value in values.items():
+                if value is not None:
+                    series[name].observe(value)
+            key = (view, method, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._responses.clear()
+
+    def render(self):
+        """Export everything in the Prometheus text exposition format"""
+        with self._lock:
+            series = {labels: {name: (list(h.counts), h.total, h.count) for name, h in histograms.items()}
+                      for labels, histograms in self._series.items()}
+            responses = dict(self._responses)
+
+        lines = [
+            '# HELP http_requests_total API requests by view, method and status',
+            '# TYPE http_requests_total counter',
+        ]
+        for (view, method, status), value in sorted(responses.items()):
+            lines.append(f'http_requests_total{{view="{view}",method="{method}",status="{status}"}} {value}')
+
+        for name, (help_text, buckets) in HISTOGRAMS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (view, method), histograms in sorted(series.items()):
+                counts, total, count = histograms[name]
+                labels = f'view="{view}",method="{method}"'
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{{labels}}} {total:.6f}')
+                lines.append(f'{name}_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def time_queries(execute, sql, params, many, context):
+    """Database execute wrapper adding each query's time to the current request"""
+    metrics = current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_seconds += time.perf_counter() - started
+
+
+def view_name(view_func, method):
+    """Label a resolved view like `PayrollViewSet.process` or `sync_view`"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        return f'{cls.__name__}.{actions.get(method.lower(), method.lower())}'
+    if cls.__name__ == 'WrappedAPIView':
+        # Function views decorated with @api_view
+        return view_func.__name__
+    return cls.__name__
+
+
+def timed_serialization(produce):
+    """Call `produce` and add its time to the current request's serializer time"""
+    metrics = current_request.get()
+    if metrics is None:
+        return produce()
+    started = time.perf_counter()
+    try:
+        return produce()
+    finally:
+        metrics.serializer_seconds += time.perf_counter() - started
+
+
+class TimedListSerializer(serializers.ListSerializer):
+
+    @property
+    def data(self):
+        return timed_serialization(lambda: super(TimedListSerializer, self).data)
+
+
+class TimedDataMixin:
+    """
+    Time top-level `serializer.data` calls for the metrics middleware,
+    `many=True` included. Nested fields are part of their parent's call.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # many=True instantiates Meta.list_serializer_class
+        meta = getattr(cls, 'Meta', None)
+        if meta is None:
+            cls.Meta = type('Meta', (), {'list_serializer_class': TimedListSerializer})
+        elif not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = TimedListSerializer
+
+    @property
+    def data(self):
+        return timed_serialization(lambda: super(TimedDataMixin, self).data)
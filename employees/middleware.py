@@ -0,0 +1,90 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from .metrics import RequestMetrics, current_request, registry, time_queries, view_name
+from .routing import pin_to_primary, replica_configured, track_writes
+
+
+class PerformanceMetricsMiddleware:
+    """
+    Record wall time, query count and time, serializer time and response
+    size of every API request, labelled by DRF view and action, into the
+    in-process metrics registry exposed at /api/metrics/.
+
+    Cost per request is a few clock reads and one locked histogram update,
+    plus two clock reads per database query.
+    """
+
+    path_prefix = '/api/'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith(self.path_prefix):
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(time_queries))
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        duration = time.perf_counter() - started
+
+        size = None if response.streaming else len(response.content)
+        registry.record(
+            metrics.view,
+            request.method,
+            response.status_code,
+            duration,
+            metrics,
+            size,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.view = view_name(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns
+        metrics = current_request.get()
+        if metrics is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                metrics.serializer_seconds += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+class ReplicaPinMiddleware:
+    """
+    Pin users to the primary database for a few seconds after a request
+    of theirs writes, so replica-backed reports show their own changes.
+    Does nothing unless a replica is configured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_configured():
+            return self.get_response(request)
+
+        with track_writes() as writes:
+            response = self.get_response(request)
+        # DRF puts the token-authenticated user on the Django request too
+        user = getattr(request, 'user', None)
+        if writes.wrote and user is not None and user.is_authenticated:
+            pin_to_primary(user)
+        return response
@@ -0,0 +1,32 @@
+# Generated migration for per-table version counters (conditional GET)
+
+from django.db import migrations, models
+
+
+VERSIONED_TABLES = ['employee', 'attendance', 'leave', 'payroll']
+
+
+def seed_versions(apps, schema_editor):
+    TableVersion = apps.get_model('employees', 'TableVersion')
+    TableVersion.objects.bulk_create(
+        [TableVersion(table=table) for table in VERSIONED_TABLES],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0003_bimonthly_payroll'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('table', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
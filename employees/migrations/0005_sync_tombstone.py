@@ -0,0 +1,41 @@
+# Generated migration for delta sync (updated_at indexes and tombstones)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0004_table_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('employee_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['deleted_at'],
+                'indexes': [
+                    models.Index(fields=['employee_id', 'deleted_at'], name='employees_t_employe_e4cbb1_idx'),
+                ],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['employee', 'updated_at'], name='employees_a_employe_a01d47_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['employee', 'updated_at'], name='employees_l_employe_9a4637_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payroll',
+            index=models.Index(fields=['employee', 'updated_at'], name='employees_p_employe_b77bfb_idx'),
+        ),
+    ]
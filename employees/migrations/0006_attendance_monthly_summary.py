@@ -0,0 +1,51 @@
+# Generated migration for the monthly attendance rollup
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0005_sync_tombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceMonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(max_length=50)),
+                ('period', models.DateField(help_text='First day of the summarized month')),
+                ('present_days', models.IntegerField(default=0)),
+                ('late_days', models.IntegerField(default=0)),
+                ('absent_days', models.IntegerField(default=0)),
+                ('half_days', models.IntegerField(default=0)),
+                ('leave_days', models.IntegerField(default=0)),
+                ('total_hours', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('overtime_hours', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Attendance Monthly Summaries',
+                'ordering': ['-period', 'employee'],
+            },
+        ),
+        migrations.AddField(
+            model_name='attendancemonthlysummary',
+            name='employee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to='employees.employee'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancemonthlysummary',
+            index=models.Index(fields=['period', 'department'], name='employees_a_period_455a9e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancemonthlysummary',
+            index=models.Index(fields=['department', 'period'], name='employees_a_departm_a5955d_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='attendancemonthlysummary',
+            unique_together={('employee', 'period')},
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated migration for configurable payroll rules
+
+from django.db import migrations, models
+
+
+# The rules previously hard-coded in PayrollViewSet.process
+DEFAULT_RULES = [
+    ('Allowance', 'earning', 'percent_of_salary', '10'),
+    ('Overtime', 'earning', 'per_overtime_hour', '25'),
+    ('Absence deduction', 'deduction', 'per_absent_day', '1'),
+]
+
+
+def seed_default_rules(apps, schema_editor):
+    PayrollRule = apps.get_model('employees', 'PayrollRule')
+    PayrollRule.objects.bulk_create([
+        PayrollRule(name=name, kind=kind, basis=basis, amount=amount)
+        for name, kind, basis, amount in DEFAULT_RULES
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0006_attendance_monthly_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('earning', 'Earning'), ('deduction', 'Deduction')], max_length=20)),
+                ('basis', models.CharField(choices=[('fixed', 'Fixed amount'), ('percent_of_salary', 'Percent of basic salary'), ('per_overtime_hour', 'Amount per overtime hour'), ('per_absent_day', 'Daily rates per absent day')], max_length=30)),
+                ('amount', models.DecimalField(decimal_places=4, help_text='Amount, percentage or multiplier depending on the basis', max_digits=10)),
+                ('department', models.CharField(blank=True, choices=[('Engineering', 'Engineering'), ('Design', 'Design'), ('Marketing', 'Marketing'), ('HR', 'HR'), ('Sales', 'Sales')], help_text='Leave blank to apply to every department', max_length=50)),
+                ('position', models.CharField(blank=True, help_text='Leave blank to apply to every position', max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['kind', 'name'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='payrollrule',
+            index=models.Index(fields=['is_active'], name='employees_p_is_acti_5396d9_idx'),
+        ),
+        migrations.RunPython(seed_default_rules, migrations.RunPython.noop),
+    ]
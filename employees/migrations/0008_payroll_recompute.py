@@ -0,0 +1,64 @@
+# Generated migration for incremental payroll recomputation
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0007_payroll_rule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollAdjustment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('allowances', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('overtime', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('deductions', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('net_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('reason', models.CharField(blank=True, max_length=100)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Paid', 'Paid')], default='Pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollRecompute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('year', models.IntegerField(validators=[django.core.validators.MinValueValidator(2000)])),
+                ('reason', models.CharField(blank=True, max_length=100)),
+                ('marked_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['marked_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='payrollrecompute',
+            name='employee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_recomputes', to='employees.employee'),
+        ),
+        migrations.AddField(
+            model_name='payrolladjustment',
+            name='payroll',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='adjustments', to='employees.payroll'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='payrollrecompute',
+            unique_together={('employee', 'month', 'year')},
+        ),
+        migrations.AddIndex(
+            model_name='payrolladjustment',
+            index=models.Index(fields=['status'], name='employees_p_status_6cded6_idx'),
+        ),
+    ]
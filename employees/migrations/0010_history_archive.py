@@ -0,0 +1,79 @@
+# Generated migration for the attendance and payroll history archive
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0009_slow_query'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('Present', 'Present'), ('Absent', 'Absent'), ('Late', 'Late'), ('Half Day', 'Half Day'), ('On Leave', 'On Leave')], max_length=20)),
+                ('clock_in', models.TimeField(blank=True, null=True)),
+                ('clock_out', models.TimeField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Archived Attendance Records',
+                'ordering': ['-date', '-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('month', models.IntegerField()),
+                ('year', models.IntegerField()),
+                ('basic_salary', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('allowances', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('overtime', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('deductions', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('net_salary', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Processed', 'Processed'), ('Paid', 'Paid')], max_length=20)),
+                ('processed_date', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-year', '-month', '-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='payrollarchive',
+            name='employee',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='archived_payroll', to='employees.employee'),
+        ),
+        migrations.AddField(
+            model_name='attendancearchive',
+            name='employee',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='archived_attendance', to='employees.employee'),
+        ),
+        migrations.AddIndex(
+            model_name='payrollarchive',
+            index=models.Index(fields=['year', 'month'], name='employees_p_year_0f13e4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payrollarchive',
+            index=models.Index(fields=['employee', 'year', 'month'], name='employees_p_employe_6751ff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancearchive',
+            index=models.Index(fields=['date'], name='employees_a_date_ad5110_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancearchive',
+            index=models.Index(fields=['employee', 'date'], name='employees_a_employe_5ae5a9_idx'),
+        ),
+    ]
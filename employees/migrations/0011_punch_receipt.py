@@ -0,0 +1,34 @@
+# Generated migration for kiosk punch receipts
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0010_history_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PunchReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('employee_id', models.BigIntegerField()),
+                ('clock_type', models.CharField(max_length=3)),
+                ('punched_at', models.DateTimeField(help_text='Client time of the punch')),
+                ('outcome', models.CharField(choices=[('applied', 'Applied'), ('rejected', 'Rejected')], max_length=10)),
+                ('error', models.CharField(blank=True, max_length=200)),
+                ('device', models.CharField(blank=True, max_length=100)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-received_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='punchreceipt',
+            index=models.Index(fields=['received_at'], name='employees_p_receive_e03972_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated migration for the payroll year-first index
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0011_punch_receipt'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payroll',
+            name='employees_p_month_e3f096_idx',
+        ),
+        migrations.AddIndex(
+            model_name='payroll',
+            index=models.Index(fields=['year', 'month'], name='employees_p_year_d639ba_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated migration for year-to-date earnings
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0012_payroll_year_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarningsYTD',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField(help_text='Totals run from January through this month')),
+                ('payslips', models.IntegerField(default=0)),
+                ('basic_salary', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('allowances', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('overtime', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('deductions', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('net_salary', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Earnings YTD',
+                'verbose_name_plural': 'Earnings YTD',
+                'ordering': ['-year', '-month', 'employee'],
+            },
+        ),
+        migrations.AddField(
+            model_name='earningsytd',
+            name='employee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='earnings_ytd', to='employees.employee'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='earningsytd',
+            unique_together={('employee', 'year', 'month')},
+        ),
+    ]
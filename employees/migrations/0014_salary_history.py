@@ -0,0 +1,67 @@
+# Generated migration for effective-dated salary history
+
+from datetime import date
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def seed_current_salaries(apps, schema_editor):
+    """
+    Each employee's current salary, in force since joining (today at the
+    latest), like salaries.start_salaries
+    """
+    Employee = apps.get_model('employees', 'Employee')
+    SalaryHistory = apps.get_model('employees', 'SalaryHistory')
+    today = date.today()
+    SalaryHistory.objects.bulk_create(
+        (
+            SalaryHistory(
+                employee_id=employee_id, salary=salary, effective_from=min(join_date, today),
+                reason='Initial salary',
+            )
+            for employee_id, salary, join_date in Employee.objects.values_list('id', 'salary', 'join_date').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0013_earnings_ytd'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalaryHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('salary', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('effective_from', models.DateField()),
+                ('effective_to', models.DateField(blank=True, help_text='Start of the next salary, empty while current', null=True)),
+                ('reason', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Salary history',
+                'ordering': ['-effective_from'],
+            },
+        ),
+        migrations.AddField(
+            model_name='payrolladjustment',
+            name='basic_salary',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='salaryhistory',
+            name='employee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='salary_history', to='employees.employee'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='salaryhistory',
+            unique_together={('employee', 'effective_from')},
+        ),
+        migrations.RunPython(seed_current_salaries, migrations.RunPython.noop),
+    ]
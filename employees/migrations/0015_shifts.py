@@ -0,0 +1,50 @@
+# Generated migration for shift definitions
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0014_salary_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentShift',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(choices=[('Engineering', 'Engineering'), ('Design', 'Design'), ('Marketing', 'Marketing'), ('HR', 'HR'), ('Sales', 'Sales')], max_length=50, unique=True)),
+            ],
+            options={
+                'ordering': ['department'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Shift',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('start_time', models.TimeField()),
+                ('grace_minutes', models.PositiveIntegerField(default=0, help_text='Clock ins this late still count as on time')),
+                ('standard_hours', models.DecimalField(decimal_places=2, default=8, help_text='Hours per day above which worked time counts as overtime', max_digits=4, validators=[django.core.validators.MinValueValidator(0)])),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['start_time', 'name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='departmentshift',
+            name='shift',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departments', to='employees.shift'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='shift',
+            field=models.ForeignKey(blank=True, help_text="Overrides the department's shift", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='employees', to='employees.shift'),
+        ),
+    ]
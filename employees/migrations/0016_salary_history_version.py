@@ -0,0 +1,19 @@
+# Generated migration seeding the salary history version counter
+
+from django.db import migrations
+
+
+def seed_version(apps, schema_editor):
+    TableVersion = apps.get_model('employees', 'TableVersion')
+    TableVersion.objects.bulk_create([TableVersion(table='salaryhistory')], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0015_shifts'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_version, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,16 @@ from django.core.validators import MinValueValidator
 from django.utils import timezone
 
 
+class LoadedValuesMixin:
+    """Remember the values a row was loaded with, so signal handlers can tell what changed"""
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+
 class User(AbstractUser):
     """Custom User model with role-based access"""
     
@@ -31,7 +41,30 @@ class User(AbstractUser):
         return self.role == 'employee'
 
 
-class Employee(models.Model):
+class Shift(LoadedValuesMixin, models.Model):
+    """Working hours a punch is checked against, see employees.shifts"""
+    
+    name = models.CharField(max_length=100, unique=True)
+    start_time = models.TimeField()
+    grace_minutes = models.PositiveIntegerField(default=0, help_text="Clock ins this late still count as on time")
+    standard_hours = models.DecimalField(
+        max_digits=4,
+        decimal_places=2,
+        default=8,
+        validators=[MinValueValidator(0)],
+        help_text="Hours per day above which worked time counts as overtime"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['start_time', 'name']
+    
+    def __str__(self):
+        return f"{self.name} ({self.start_time:%H:%M})"
+
+
+class Employee(LoadedValuesMixin, models.Model):
     """Employee model for storing employee information"""
     
     DEPARTMENT_CHOICES = [
@@ -68,6 +101,14 @@ class Employee(models.Model):
     )
     join_date = models.DateField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    shift = models.ForeignKey(
+        Shift,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='employees',
+        help_text="Overrides the department's shift"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -87,7 +128,72 @@ class Employee(models.Model):
         return f"{self.first_name} {self.last_name}"
 
 
-class Attendance(models.Model):
+class DepartmentShift(LoadedValuesMixin, models.Model):
+    """Shift of every employee of a department without one of their own"""
+    
+    department = models.CharField(max_length=50, choices=Employee.DEPARTMENT_CHOICES, unique=True)
+    shift = models.ForeignKey(
+        Shift,
+        on_delete=models.CASCADE,
+        related_name='departments'
+    )
+    
+    class Meta:
+        ordering = ['department']
+    
+    def __str__(self):
+        return f"{self.department} - {self.shift.name}"
+
+
+class SalaryHistory(models.Model):
+    """
+    Salary of an employee from `effective_from` up to, not including,
+    `effective_to` (open ended when null). Payroll reads salaries from here,
+    see employees.salaries.
+    """
+    
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='salary_history'
+    )
+    salary = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(0)]
+    )
+    effective_from = models.DateField()
+    effective_to = models.DateField(null=True, blank=True, help_text="Start of the next salary, empty while current")
+    reason = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-effective_from']
+        # The unique index on (employee, effective_from) serves the as-of lookups
+        unique_together = ['employee', 'effective_from']
+        verbose_name_plural = 'Salary history'
+    
+    def __str__(self):
+        return f"{self.employee_id} - {self.salary} from {self.effective_from}"
+
+
+def calculate_working_hours(day, clock_in, clock_out):
+    """Hours between clock in and clock out, handling overnight shifts"""
+    if clock_in and clock_out:
+        from datetime import datetime, timedelta
+        clock_in_dt = datetime.combine(day, clock_in)
+        clock_out_dt = datetime.combine(day, clock_out)
+        
+        if clock_out_dt < clock_in_dt:
+            clock_out_dt += timedelta(days=1)
+        
+        diff = clock_out_dt - clock_in_dt
+        hours = diff.total_seconds() / 3600
+        return round(hours, 2)
+    return 0
+
+
+class Attendance(LoadedValuesMixin, models.Model):
     """Attendance model for tracking employee attendance"""
     
     STATUS_CHOICES = [
@@ -118,6 +224,7 @@ class Attendance(models.Model):
             models.Index(fields=['date']),
             models.Index(fields=['employee', 'date']),
             models.Index(fields=['status']),
+            models.Index(fields=['employee', 'updated_at']),
         ]
         verbose_name_plural = 'Attendance Records'
     
@@ -127,21 +234,10 @@ class Attendance(models.Model):
     @property
     def working_hours(self):
         """Calculate working hours"""
-        if self.clock_in and self.clock_out:
-            from datetime import datetime, timedelta
-            clock_in_dt = datetime.combine(self.date, self.clock_in)
-            clock_out_dt = datetime.combine(self.date, self.clock_out)
-            
-            if clock_out_dt < clock_in_dt:
-                clock_out_dt += timedelta(days=1)
-            
-            diff = clock_out_dt - clock_in_dt
-            hours = diff.total_seconds() / 3600
-            return round(hours, 2)
-        return 0
-
-
-class Leave(models.Model):
+        return calculate_working_hours(self.date, self.clock_in, self.clock_out)
+
+
+class Leave(LoadedValuesMixin, models.Model):
     """Leave model for managing employee leave requests"""
     
     LEAVE_TYPE_CHOICES = [
@@ -178,6 +274,7 @@ class Leave(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['start_date', 'end_date']),
             models.Index(fields=['employee', 'status']),
+            models.Index(fields=['employee', 'updated_at']),
         ]
     
     def __str__(self):
@@ -191,7 +288,7 @@ class Leave(models.Model):
         super().save(*args, **kwargs)
 
 
-class Payroll(models.Model):
+class Payroll(LoadedValuesMixin, models.Model):
     """Payroll model for managing employee salary payments"""
     
     STATUS_CHOICES = [
@@ -221,9 +318,11 @@ class Payroll(models.Model):
         ordering = ['-year', '-month', '-created_at']
         unique_together = ['employee', 'month', 'year']
         indexes = [
-            models.Index(fields=['month', 'year']),
+            # Year first: serves the -year, -month ordering and year ranges
+            models.Index(fields=['year', 'month']),
             models.Index(fields=['employee', 'month', 'year']),
             models.Index(fields=['status']),
+            models.Index(fields=['employee', 'updated_at']),
         ]
     
     def __str__(self):
@@ -248,6 +347,110 @@ class Payroll(models.Model):
 
 
 
+class PayrollRecompute(models.Model):
+    """Queue entry for a payroll row whose attendance or leave inputs changed"""
+    
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='payroll_recomputes'
+    )
+    month = models.IntegerField(validators=[MinValueValidator(1)])
+    year = models.IntegerField(validators=[MinValueValidator(2000)])
+    reason = models.CharField(max_length=100, blank=True)
+    # Refreshed whenever the row is marked again while already queued
+    marked_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['marked_at']
+        unique_together = ['employee', 'month', 'year']
+    
+    def __str__(self):
+        return f"{self.employee_id} - {self.month}/{self.year} ({self.reason})"
+
+
+class PayrollAdjustment(models.Model):
+    """Correction to a payroll row that was already paid"""
+    
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Paid', 'Paid'),
+    ]
+    
+    payroll = models.ForeignKey(
+        Payroll,
+        on_delete=models.CASCADE,
+        related_name='adjustments'
+    )
+    basic_salary = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    allowances = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    overtime = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    deductions = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    net_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    reason = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status']),
+        ]
+    
+    def __str__(self):
+        return f"Adjustment {self.net_amount} for payroll #{self.payroll_id}"
+
+
+class PayrollRule(models.Model):
+    """Earning or deduction rule applied when payroll is processed"""
+    
+    KIND_CHOICES = [
+        ('earning', 'Earning'),
+        ('deduction', 'Deduction'),
+    ]
+    
+    BASIS_CHOICES = [
+        ('fixed', 'Fixed amount'),
+        ('percent_of_salary', 'Percent of basic salary'),
+        ('per_overtime_hour', 'Amount per overtime hour'),
+        ('per_absent_day', 'Daily rates per absent day'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    basis = models.CharField(max_length=30, choices=BASIS_CHOICES)
+    amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=4,
+        help_text="Amount, percentage or multiplier depending on the basis"
+    )
+    department = models.CharField(
+        max_length=50,
+        blank=True,
+        choices=Employee.DEPARTMENT_CHOICES,
+        help_text="Leave blank to apply to every department"
+    )
+    position = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Leave blank to apply to every position"
+    )
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['kind', 'name']
+        indexes = [
+            models.Index(fields=['is_active']),
+        ]
+    
+    def __str__(self):
+        scope = ' / '.join(filter(None, [self.department, self.position])) or 'All employees'
+        return f"{self.name} ({self.get_kind_display()}, {scope})"
+
+
 class PayrollPeriod(models.Model):
     """Payroll Period model for bi-monthly cutoff management"""
     
@@ -341,3 +544,252 @@ class WorkSchedule(models.Model):
     def total_rest_days(self):
         """Count total rest days"""
         return len(self.rest_days) if self.rest_days else 0
+
+
+class TableVersion(models.Model):
+    """Change counter per table, used to validate cached API responses"""
+    
+    table = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.table} v{self.version}"
+
+
+class Tombstone(models.Model):
+    """Marker left behind by a deleted row so sync clients can drop it"""
+    
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    # Plain column, the employee may be deleted together with the row
+    employee_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['deleted_at']
+        indexes = [
+            models.Index(fields=['employee_id', 'deleted_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.model} #{self.object_id} deleted {self.deleted_at}"
+
+
+class AttendanceMonthlySummary(models.Model):
+    """Pre-aggregated attendance per employee and month for reporting"""
+    
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='monthly_summaries'
+    )
+    # Department at rollup time, so reports slice without joining employees
+    department = models.CharField(max_length=50)
+    period = models.DateField(help_text="First day of the summarized month")
+    present_days = models.IntegerField(default=0)
+    late_days = models.IntegerField(default=0)
+    absent_days = models.IntegerField(default=0)
+    half_days = models.IntegerField(default=0)
+    leave_days = models.IntegerField(default=0)
+    total_hours = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    overtime_hours = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-period', 'employee']
+        unique_together = ['employee', 'period']
+        indexes = [
+            models.Index(fields=['period', 'department']),
+            models.Index(fields=['department', 'period']),
+        ]
+        verbose_name_plural = 'Attendance Monthly Summaries'
+    
+    def __str__(self):
+        return f"{self.employee_id} - {self.period:%Y-%m}"
+    
+    @property
+    def worked_days(self):
+        """Days with hours on the clock (present, late or half day)"""
+        return self.present_days + self.late_days + self.half_days
+
+
+class EarningsYTD(models.Model):
+    """
+    Year-to-date payroll totals of an employee through a month, one row per
+    month with a payroll row. Maintained from Payroll, see employees.earnings.
+    """
+    
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='earnings_ytd'
+    )
+    year = models.IntegerField()
+    month = models.IntegerField(help_text="Totals run from January through this month")
+    payslips = models.IntegerField(default=0)
+    basic_salary = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    allowances = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    overtime = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    deductions = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    net_salary = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-year', '-month', 'employee']
+        unique_together = ['employee', 'year', 'month']
+        verbose_name = 'Earnings YTD'
+        verbose_name_plural = 'Earnings YTD'
+    
+    def __str__(self):
+        return f"{self.employee_id} - YTD {self.month}/{self.year}"
+    
+    @property
+    def gross_salary(self):
+        return self.basic_salary + self.allowances + self.overtime
+
+
+class SlowQuery(models.Model):
+    """Deduplicated query shape that ran above the slow query threshold"""
+    
+    fingerprint = models.CharField(max_length=40, unique=True)
+    # SQL with literals and IN lists normalized away
+    shape = models.TextField()
+    # First occurrence, with its parameters
+    sample_sql = models.TextField()
+    explain = models.TextField(blank=True)
+    view = models.CharField(max_length=200, blank=True, help_text="View that first ran the query")
+    last_view = models.CharField(max_length=200, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-total_ms']
+        verbose_name_plural = 'Slow Queries'
+    
+    def __str__(self):
+        return f"{self.shape[:80]} ({self.count}x)"
+    
+    @property
+    def average_ms(self):
+        return self.total_ms / self.count if self.count else 0
+
+
+class AttendanceArchive(models.Model):
+    """
+    Attendance of closed years, moved out of the hot table by
+    `manage.py archive_history`. Rows keep their original ids. May live in
+    a separate `archive` database, hence no foreign key constraint.
+    """
+    
+    id = models.BigIntegerField(primary_key=True)
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='archived_attendance'
+    )
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=Attendance.STATUS_CHOICES)
+    clock_in = models.TimeField(null=True, blank=True)
+    clock_out = models.TimeField(null=True, blank=True)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['date']),
+            models.Index(fields=['employee', 'date']),
+        ]
+        verbose_name_plural = 'Archived Attendance Records'
+    
+    def __str__(self):
+        return f"{self.employee_id} - {self.date} - {self.status} (archived)"
+    
+    @property
+    def working_hours(self):
+        return calculate_working_hours(self.date, self.clock_in, self.clock_out)
+
+
+class PayrollArchive(models.Model):
+    """Payroll of closed years, see AttendanceArchive"""
+    
+    id = models.BigIntegerField(primary_key=True)
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='archived_payroll'
+    )
+    month = models.IntegerField()
+    year = models.IntegerField()
+    basic_salary = models.DecimalField(max_digits=10, decimal_places=2)
+    allowances = models.DecimalField(max_digits=10, decimal_places=2)
+    overtime = models.DecimalField(max_digits=10, decimal_places=2)
+    deductions = models.DecimalField(max_digits=10, decimal_places=2)
+    net_salary = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Payroll.STATUS_CHOICES)
+    processed_date = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-year', '-month', '-created_at']
+        indexes = [
+            models.Index(fields=['year', 'month']),
+            models.Index(fields=['employee', 'year', 'month']),
+        ]
+    
+    def __str__(self):
+        return f"{self.employee_id} - {self.month}/{self.year} (archived)"
+    
+    @property
+    def gross_salary(self):
+        return self.basic_salary + self.allowances + self.overtime
+
+
+class PunchReceipt(models.Model):
+    """
+    Outcome of a kiosk punch, keyed by the idempotency key the kiosk
+    generated for it. A replayed punch gets the recorded outcome back.
+    """
+    
+    OUTCOME_CHOICES = [
+        ('applied', 'Applied'),
+        ('rejected', 'Rejected'),
+    ]
+    
+    key = models.CharField(max_length=64, unique=True)
+    # Plain column, receipts outlive deleted employees like tombstones
+    employee_id = models.BigIntegerField()
+    clock_type = models.CharField(max_length=3)
+    punched_at = models.DateTimeField(help_text="Client time of the punch")
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES)
+    error = models.CharField(max_length=200, blank=True)
+    device = models.CharField(max_length=100, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-received_at']
+        indexes = [
+            models.Index(fields=['received_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} {self.clock_type} {self.outcome}"
+    
+    def as_result(self):
+        """Per-punch entry of the sync response"""
+        return {
+            'key': self.key,
+            'employee_id': self.employee_id,
+            'clock_type': self.clock_type,
+            'outcome': self.outcome,
+            'error': self.error,
+        }
@@ -0,0 +1,421 @@
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .analytics import MonthAccumulator, next_month
+from .earnings import refresh_earnings_ytd
+from .salaries import month_salaries
+from .schedules import DEFAULT_SCHEDULE, work_schedules
+from .shifts import shift_table
+from .models import (
+    Employee, Attendance, Leave, Payroll, PayrollAdjustment,
+    PayrollRecompute, PayrollRule
+)
+from .versioning import bump_versions
+
+
+# Working days per month used to derive the daily rate
+WORKING_DAYS = getattr(settings, 'PAYROLL_WORKING_DAYS', 22)
+
+CENTS = Decimal('0.01')
+
+
+def to_money(value):
+    return Decimal(str(value)).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def month_bounds(month, year):
+    """First and last day of a month"""
+    start = date(year, month, 1)
+    return start, next_month(start) - timedelta(days=1)
+
+
+# Every supported rule basis is linear in one input, so any number of rules
+# collapses into one coefficient per input.
+Coefficients = namedtuple('Coefficients', [
+    'fixed_earning', 'salary_earning', 'overtime_rate',
+    'fixed_deduction', 'salary_deduction', 'absence_rate',
+])
+
+ZERO = Coefficients(*([0.0] * len(Coefficients._fields)))
+
+# (kind, basis) -> (coefficient, sign)
+RULE_COEFFICIENT = {
+    ('earning', 'fixed'): ('fixed_earning', 1),
+    ('earning', 'percent_of_salary'): ('salary_earning', 1),
+    ('earning', 'per_overtime_hour'): ('overtime_rate', 1),
+    ('earning', 'per_absent_day'): ('absence_rate', -1),
+    ('deduction', 'fixed'): ('fixed_deduction', 1),
+    ('deduction', 'percent_of_salary'): ('salary_deduction', 1),
+    ('deduction', 'per_overtime_hour'): ('overtime_rate', -1),
+    ('deduction', 'per_absent_day'): ('absence_rate', 1),
+}
+
+
+def _add(left, right):
+    return Coefficients(*(a + b for a, b in zip(left, right)))
+
+
+def _rule_coefficients(rule):
+    name, sign = RULE_COEFFICIENT[(rule.kind, rule.basis)]
+    amount = float(rule.amount) * sign
+    if rule.basis == 'percent_of_salary':
+        amount /= 100
+    return ZERO._replace(**{name: amount})
+
+
+class PayrollPlan:
+    """
+    Payroll rules compiled into per-scope coefficients.
+
+    Rules are grouped by scope (all employees, department, position or both)
+    and summed once. Evaluating an employee is a dictionary lookup plus a
+    fixed number of multiplications, however many rules exist.
+    """
+
+    def __init__(self, rules, working_days=WORKING_DAYS):
+        self.working_days = working_days
+        self._scopes = defaultdict(lambda: ZERO)
+        for rule in rules:
+            key = (rule.department or None, rule.position or None)
+            self._scopes[key] = _add(self._scopes[key], _rule_coefficients(rule))
+        self._resolved = {}
+
+    @classmethod
+    def compile(cls, working_days=WORKING_DAYS):
+        """Load the active rules in one query and compile them"""
+        return cls(PayrollRule.objects.filter(is_active=True), working_days)
+
+    def coefficients(self, department, position):
+        key = (department, position)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            resolved = ZERO
+            for scope in ((None, None), (department, None), (None, position), (department, position)):
+                if scope in self._scopes:
+                    resolved = _add(resolved, self._scopes[scope])
+            self._resolved[key] = resolved
+        return resolved
+
+    def evaluate(self, salary, department, position, present_days, overtime_hours):
+        """Return (allowances, overtime, deductions) for one employee"""
+        c = self.coefficients(department, position)
+        salary = float(salary)
+        absent_days = max(self.working_days - present_days, 0)
+        daily_rate = salary / self.working_days
+        allowances = c.fixed_earning + c.salary_earning * salary
+        overtime = c.overtime_rate * overtime_hours
+        deductions = (
+            c.fixed_deduction
+            + c.salary_deduction * salary
+            + c.absence_rate * daily_rate * absent_days
+        )
+        return to_money(allowances), to_money(overtime), to_money(deductions)
+
+
+def attendance_totals(employee_ids, start, end):
+    """
+    Present days and overtime hours per employee over a date range, in one
+    query. `employee_ids` may be a list or a `values('id')` queryset.
+    Overtime starts after the standard hours of each employee's shift.
+    """
+    shifts = shift_table()
+    totals = defaultdict(MonthAccumulator)
+    rows = Attendance.objects.filter(
+        employee_id__in=employee_ids,
+        date__range=[start, end],
+    ).values_list('employee_id', 'employee__department', 'date', 'status', 'clock_in', 'clock_out')
+    for employee_id, department, day, status, clock_in, clock_out in rows.iterator(chunk_size=5000):
+        if employee_id not in totals:
+            totals[employee_id] = MonthAccumulator(shifts.rule(employee_id, department).standard_hours)
+        totals[employee_id].add(day, status, clock_in, clock_out)
+    return totals
+
+
+def paid_leave_days(employee_ids, start, end):
+    """
+    Scheduled work days per employee inside a date range covered by
+    approved paid leave, not counting days already present or late in
+    attendance. One query, three when anyone has leave in the range.
+    """
+    leaves = list(Leave.objects.filter(
+        employee_id__in=employee_ids,
+        status='Approved',
+        start_date__lte=end,
+        end_date__gte=start,
+    ).exclude(leave_type='Unpaid').values_list('employee_id', 'start_date', 'end_date'))
+    if not leaves:
+        return defaultdict(int)
+    on_leave = {employee_id for employee_id, _, _ in leaves}
+    schedules = work_schedules(on_leave, start, end)
+    attended = set(Attendance.objects.filter(
+        employee_id__in=on_leave, date__range=[start, end], status__in=['Present', 'Late'],
+    ).values_list('employee_id', 'date'))
+
+    # Sets, so overlapping leaves count a day once
+    leave_days = defaultdict(set)
+    for employee_id, leave_start, leave_end in leaves:
+        schedule = schedules.get(employee_id, DEFAULT_SCHEDULE)
+        day = max(leave_start, start)
+        while day <= min(leave_end, end):
+            if schedule.is_work_day(day) and (employee_id, day) not in attended:
+                leave_days[employee_id].add(day)
+            day += timedelta(days=1)
+    return defaultdict(int, {employee_id: len(days) for employee_id, days in leave_days.items()})
+
+
+def build_payroll(employee, totals, plan, month, year, leave_days=0, status='Processed', salary=None):
+    """
+    Unsaved Payroll row for one employee, with net salary filled in.
+    `salary` is the salary of the month, the live one when not given.
+    """
+    salary = employee.salary if salary is None else salary
+    present_days = totals.present_days + totals.late_days + leave_days
+    allowances, overtime, deductions = plan.evaluate(
+        salary, employee.department, employee.position,
+        present_days, totals.overtime_hours,
+    )
+    basic_salary = to_money(salary)
+    return Payroll(
+        employee=employee,
+        month=month,
+        year=year,
+        basic_salary=basic_salary,
+        allowances=allowances,
+        overtime=overtime,
+        deductions=deductions,
+        net_salary=basic_salary + allowances + overtime - deductions,
+        status=status,
+        processed_date=timezone.now() if status == 'Processed' else None,
+    )
+
+
+def process_payroll(month, year, plan=None, batch_size=1000):
+    """
+    Create Payroll rows for every active employee without one for the month.
+
+    The rule plan is compiled once, attendance and leave are aggregated in
+    one query each and rows are written with bulk inserts. Salaries are the
+    ones in force at the end of the month, from the salary history.
+    """
+    plan = plan or PayrollPlan.compile()
+    start, end = month_bounds(month, year)
+
+    already_processed = Payroll.objects.filter(month=month, year=year).values('employee_id')
+    pending = Employee.objects.filter(status='Active').exclude(id__in=already_processed)
+    employees = list(pending)
+    totals = attendance_totals(pending.values('id'), start, end)
+    leave_days = paid_leave_days(pending.values('id'), start, end)
+    salaries = month_salaries(month, year, pending.values('id'))
+
+    payroll_records = [
+        build_payroll(
+            employee, totals[employee.id], plan, month, year, leave_days[employee.id],
+            salary=salaries.get(employee.id),
+        )
+        for employee in employees
+    ]
+    with transaction.atomic():
+        Payroll.objects.bulk_create(payroll_records, batch_size=batch_size)
+        refresh_earnings_ytd({(payroll.employee_id, year) for payroll in payroll_records})
+    if payroll_records:
+        bump_versions(Payroll)
+    return payroll_records
+
+
+# Status a payroll row must be in to move to each status
+TRANSITIONS = {'Processed': 'Pending', 'Paid': 'Processed'}
+
+
+def transition_payroll(queryset, status):
+    """
+    Move the selected rows to `status` with one UPDATE, stamping what
+    Payroll.save() would: the net salary and, once, the processed date.
+    Rows not in the preceding status are left alone. Returns the number of
+    rows moved and the skipped ones counted by their status.
+    """
+    if status not in TRANSITIONS:
+        raise ValueError(f"Payroll can only be moved to {' or '.join(TRANSITIONS)}")
+    queryset = queryset.order_by()
+    now = timezone.now()
+    with transaction.atomic():
+        skipped = dict(
+            queryset.exclude(status=TRANSITIONS[status])
+            .values_list('status').annotate(rows=Count('id'))
+        )
+        moved = queryset.filter(status=TRANSITIONS[status]).update(
+            status=status,
+            net_salary=F('basic_salary') + F('allowances') + F('overtime') - F('deductions'),
+            processed_date=Coalesce('processed_date', Value(now)),
+            updated_at=now,
+        )
+        # Amounts don't change, net is restated from them: totals stay valid
+        if moved:
+            transaction.on_commit(lambda: bump_versions(Payroll))
+    return moved, skipped
+
+
+def _months_between(start, end):
+    """(month, year) pairs covered by a date range"""
+    current = date(start.year, start.month, 1)
+    while current <= end:
+        yield current.month, current.year
+        current = next_month(current)
+
+
+def mark_payroll_dirty(keys, reason=''):
+    """
+    Queue recomputation for (employee_id, month, year) keys that already
+    have a payroll row. Months that were never processed are skipped.
+    """
+    keys = set(keys)
+    if not keys:
+        return 0
+    # One term per month rather than per key, bulk callers pass thousands
+    by_period = defaultdict(set)
+    for employee_id, month, year in keys:
+        by_period[month, year].add(employee_id)
+    match = Q()
+    for (month, year), employee_ids in by_period.items():
+        match |= Q(month=month, year=year, employee_id__in=employee_ids)
+    processed = Payroll.objects.filter(match).values_list('employee_id', 'month', 'year')
+    return queue_recompute(processed, reason)
+
+
+def queue_recompute(keys, reason=''):
+    """Queue (employee_id, month, year) keys known to have a payroll row"""
+    now = timezone.now()
+    entries = [
+        PayrollRecompute(employee_id=employee_id, month=month, year=year, reason=reason, marked_at=now)
+        for employee_id, month, year in keys
+    ]
+    PayrollRecompute.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=['employee', 'month', 'year'],
+        update_fields=['reason', 'marked_at'],
+    )
+    return len(entries)
+
+
+def dates_to_payroll_keys(employee_id, *days):
+    return {(employee_id, day.month, day.year) for day in days if day}
+
+
+def leave_to_payroll_keys(employee_id, start, end):
+    return {(employee_id, month, year) for month, year in _months_between(start, end)}
+
+
+RECOMPUTED_FIELDS = ['basic_salary', 'allowances', 'overtime', 'deductions', 'net_salary', 'updated_at']
+
+
+def recompute_dirty_payroll(plan=None, batch_size=500):
+    """
+    Recompute queued payroll rows.
+
+    The month's salary is read again from the salary history. Rows that are
+    not paid yet are updated in place. Paid rows are left untouched and get
+    a PayrollAdjustment carrying the difference instead.
+    Work is proportional to the number of queued rows, one batch of at most
+    `batch_size` entries per call. Returns counters of what happened.
+    """
+    plan = plan or PayrollPlan.compile()
+    result = {'recomputed': 0, 'adjusted': 0, 'unchanged': 0, 'remaining': 0}
+
+    started_at = timezone.now()
+    entries = list(
+        PayrollRecompute.objects.order_by('id')
+        .values_list('id', 'employee_id', 'month', 'year')[:batch_size]
+    )
+    by_month = defaultdict(list)
+    for _, employee_id, month, year in entries:
+        by_month[(month, year)].append(employee_id)
+
+    now = timezone.now()
+    updated = []
+    adjustments = []
+    with transaction.atomic():
+        for (month, year), employee_ids in by_month.items():
+            start, end = month_bounds(month, year)
+            payrolls = list(
+                Payroll.objects.filter(month=month, year=year, employee_id__in=employee_ids)
+                .select_related('employee')
+            )
+            totals = attendance_totals(employee_ids, start, end)
+            leave_days = paid_leave_days(employee_ids, start, end)
+            salaries = month_salaries(month, year, employee_ids)
+            prior = {
+                row['payroll']: row
+                for row in PayrollAdjustment.objects.filter(
+                    payroll__in=[payroll.id for payroll in payrolls if payroll.status == 'Paid']
+                ).values('payroll').annotate(
+                    basic_salary_total=Sum('basic_salary'),
+                    allowances_total=Sum('allowances'),
+                    overtime_total=Sum('overtime'),
+                    deductions_total=Sum('deductions'),
+                )
+            }
+
+            for payroll in payrolls:
+                employee = payroll.employee
+                employee_totals = totals[employee.id]
+                # Rows of employees without salary history keep their salary
+                basic_salary = to_money(salaries.get(employee.id, payroll.basic_salary))
+                allowances, overtime, deductions = plan.evaluate(
+                    basic_salary, employee.department, employee.position,
+                    employee_totals.present_days + employee_totals.late_days + leave_days[employee.id],
+                    employee_totals.overtime_hours,
+                )
+
+                if payroll.status == 'Paid':
+                    previous = prior.get(payroll.id, {})
+                    delta_basic = basic_salary - payroll.basic_salary - (previous.get('basic_salary_total') or 0)
+                    delta_allowances = allowances - payroll.allowances - (previous.get('allowances_total') or 0)
+                    delta_overtime = overtime - payroll.overtime - (previous.get('overtime_total') or 0)
+                    delta_deductions = deductions - payroll.deductions - (previous.get('deductions_total') or 0)
+                    if delta_basic or delta_allowances or delta_overtime or delta_deductions:
+                        adjustments.append(PayrollAdjustment(
+                            payroll=payroll,
+                            basic_salary=delta_basic,
+                            allowances=delta_allowances,
+                            overtime=delta_overtime,
+                            deductions=delta_deductions,
+                            net_amount=delta_basic + delta_allowances + delta_overtime - delta_deductions,
+                            reason='Salary, attendance or leave changed after payment',
+                        ))
+                        result['adjusted'] += 1
+                    else:
+                        result['unchanged'] += 1
+                elif (basic_salary, allowances, overtime, deductions) != (
+                    payroll.basic_salary, payroll.allowances, payroll.overtime, payroll.deductions
+                ):
+                    payroll.basic_salary = basic_salary
+                    payroll.allowances = allowances
+                    payroll.overtime = overtime
+                    payroll.deductions = deductions
+                    payroll.net_salary = basic_salary + allowances + overtime - deductions
+                    payroll.updated_at = now
+                    updated.append(payroll)
+                    result['recomputed'] += 1
+                else:
+                    result['unchanged'] += 1
+
+        Payroll.objects.bulk_update(updated, RECOMPUTED_FIELDS, batch_size=batch_size)
+        refresh_earnings_ytd({(payroll.employee_id, payroll.year) for payroll in updated})
+        PayrollAdjustment.objects.bulk_create(adjustments, batch_size=batch_size)
+        # Entries marked again while this batch ran stay queued
+        PayrollRecompute.objects.filter(
+            id__in=[entry[0] for entry in entries],
+            marked_at__lte=started_at,
+        ).delete()
+
+    if updated:
+        bump_versions(Payroll)
+    result['remaining'] = PayrollRecompute.objects.count()
+    return result
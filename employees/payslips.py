@@ -0,0 +1,180 @@
+"""
+Payslips, one at a time or a whole pay run as NDJSON.
+
+A payslip only depends on its payroll row and employee. Paid rows don't
+change any more, so their payslips are kept in the `payslips` cache (the
+default one when not configured) without a timeout, until the cache evicts
+them. Entries are keyed by row id and the last update of the row and of the
+employee: an edit made anyway, or a renamed or transferred employee, gets a
+new key instead of a stale payslip. Archived rows keep the row id and
+update time, so they share the cache entries.
+
+Year-to-date totals change with other months' rows, and a paid row can
+receive adjustments later: both are read on every request instead of being
+cached.
+"""
+import heapq
+import json
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .earnings import ytd_data
+from .models import EarningsYTD, PayrollAdjustment
+
+
+# Rows read, and cache entries fetched, per round trip
+CHUNK_SIZE = 500
+
+
+def payslip_data(payroll):
+    """Payslip of a payroll row (hot or archived) with its employee loaded"""
+    employee = payroll.employee
+    return {
+        'employee': {
+            'name': employee.full_name,
+            'email': employee.email,
+            'department': employee.department,
+            'position': employee.position,
+            'employee_id': f"EMP-{str(employee.id).zfill(4)}"
+        },
+        'period': {
+            'month': payroll.month,
+            'year': payroll.year,
+            'pay_date': payroll.processed_date or timezone.now()
+        },
+        'earnings': {
+            'basic_salary': float(payroll.basic_salary),
+            'allowances': float(payroll.allowances),
+            'overtime': float(payroll.overtime),
+            'gross_salary': float(payroll.gross_salary)
+        },
+        'deductions': {
+            'total': float(payroll.deductions)
+        },
+        'net_salary': float(payroll.net_salary)
+    }
+
+
+def payslip_cache():
+    return caches['payslips' if 'payslips' in settings.CACHES else 'default']
+
+
+def _cache_key(payroll):
+    return f'payslip:{payroll.pk}:{payroll.updated_at.timestamp()}:{payroll.employee.updated_at.timestamp()}'
+
+
+def _ytd_key(row):
+    return (row.employee_id, row.year, row.month)
+
+
+def adjustment_data(adjustment):
+    return {
+        'basic_salary': float(adjustment.basic_salary),
+        'allowances': float(adjustment.allowances),
+        'overtime': float(adjustment.overtime),
+        'deductions': float(adjustment.deductions),
+        'net_amount': float(adjustment.net_amount),
+        'reason': adjustment.reason,
+        'status': adjustment.status,
+        'created_at': adjustment.created_at,
+    }
+
+
+def _adjustments(payrolls):
+    """{payroll_id: [adjustment_data]} of the paid rows, the only ones adjusted"""
+    paid = [payroll.pk for payroll in payrolls if payroll.status == 'Paid']
+    adjustments = {}
+    if paid:
+        rows = PayrollAdjustment.objects.filter(payroll_id__in=paid).order_by('created_at', 'id')
+        for adjustment in rows:
+            adjustments.setdefault(adjustment.payroll_id, []).append(adjustment_data(adjustment))
+    return adjustments
+
+
+def payslip(payroll):
+    """
+    payslip_data, from the cache for paid rows, with the year-to-date
+    totals and the adjustments made after payment
+    """
+    ytd = EarningsYTD.objects.filter(
+        employee_id=payroll.employee_id, year=payroll.year, month=payroll.month,
+    ).first()
+    if payroll.status != 'Paid':
+        data = payslip_data(payroll)
+    else:
+        key = _cache_key(payroll)
+        cache = payslip_cache()
+        data = cache.get(key)
+        if data is None:
+            data = payslip_data(payroll)
+            cache.set(key, data, None)
+    return {
+        **data,
+        'adjustments': _adjustments([payroll]).get(payroll.pk, []),
+        'year_to_date': ytd_data(ytd),
+    }
+
+
+def _encode(chunk):
+    cache = payslip_cache()
+    paid = {_cache_key(payroll): payroll for payroll in chunk if payroll.status == 'Paid'}
+    cached = cache.get_many(paid) if paid else {}
+    ytd = {
+        _ytd_key(row): row
+        for row in EarningsYTD.objects.filter(
+            employee_id__in={payroll.employee_id for payroll in chunk},
+            year__in={payroll.year for payroll in chunk},
+            month__in={payroll.month for payroll in chunk},
+        )
+    }
+    adjustments = _adjustments(chunk)
+    built = {}
+    for payroll in chunk:
+        key = _cache_key(payroll) if payroll.status == 'Paid' else None
+        data = cached.get(key) if key else None
+        if data is None:
+            data = payslip_data(payroll)
+            if key:
+                built[key] = data
+        line = {
+            'payroll_id': payroll.pk,
+            **data,
+            'adjustments': adjustments.get(payroll.pk, []),
+            'year_to_date': ytd_data(ytd.get(_ytd_key(payroll))),
+        }
+        yield json.dumps(line, cls=DjangoJSONEncoder) + '\n'
+    if built:
+        cache.set_many(built, None)
+
+
+def payslip_lines(*querysets, chunk_size=CHUNK_SIZE):
+    """
+    One JSON payslip per line for every row of `querysets`, which should
+    load the employees (select_related or prefetch_related) and be ordered
+    by employee_id: rows of several querysets, such as the hot and archived
+    rows of a month, are merged in that order. Rows are read in chunks,
+    memory doesn't grow with the pay run.
+    """
+    rows = heapq.merge(
+        *(queryset.iterator(chunk_size=chunk_size) for queryset in querysets),
+        key=attrgetter('employee_id'),
+    )
+    chunk = []
+    employee_id, seen = None, set()
+    for payroll in rows:
+        if payroll.employee_id != employee_id:
+            employee_id, seen = payroll.employee_id, set()
+        # A row an interrupted archive run left in both tiers comes once
+        if payroll.pk in seen:
+            continue
+        seen.add(payroll.pk)
+        chunk.append(payroll)
+        if len(chunk) >= chunk_size:
+            yield from _encode(chunk)
+            chunk = []
+    if chunk:
+        yield from _encode(chunk)
@@ -0,0 +1,16 @@
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+
+class IsAdminRole(BasePermission):
+    """Allow access to users with the admin role (or superusers)"""
+    
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and user.is_admin)
+
+
+class IsAdminRoleOrReadOnly(IsAdminRole):
+    """Reads as the default permissions allow, changes for the admin role only"""
+    
+    def has_permission(self, request, view):
+        return request.method in SAFE_METHODS or super().has_permission(request, view)
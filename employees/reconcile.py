@@ -0,0 +1,99 @@
+"""
+Nightly reconciliation of attendance.
+
+Nobody records a row for an employee who never clocks in, and a forgotten
+clock out leaves a day with zero hours. `reconcile_day` closes both gaps
+for one past day with a fixed number of statements, whatever the head
+count:
+
+- every active employee scheduled that day without a row gets one,
+  'On Leave' when an approved leave covers the day, 'Absent' otherwise.
+  The schedule is the employee's WorkSchedule of the period when there is
+  one, else the ATTENDANCE_WORKWEEK weekdays;
+- open punches (clock in, no clock out) are closed at `close_at` when
+  given, or flagged with a note for a manager to fix.
+"""
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Trim
+from django.utils import timezone
+
+from .analytics import refresh_monthly_summaries
+from .models import Attendance, Employee, Leave
+from .payroll import dates_to_payroll_keys, mark_payroll_dirty
+from .schedules import DEFAULT_SCHEDULE, work_schedules
+from .versioning import bump_versions
+
+
+MISSING_CLOCK_OUT = '[Missing clock-out]'
+AUTO_CLOCK_OUT = '[Clock-out added by reconciliation]'
+
+
+def scheduled_employees(day):
+    """Ids of the active employees expected at work on `day`"""
+    employees = set(
+        Employee.objects.filter(status='Active', join_date__lte=day).values_list('id', flat=True)
+    )
+    schedules = work_schedules(employees, day, day)
+    return {
+        employee_id for employee_id in employees
+        if schedules.get(employee_id, DEFAULT_SCHEDULE).is_work_day(day)
+    }
+
+
+def _note(marker):
+    return Trim(Concat(F('notes'), Value(' ' + marker)))
+
+
+def reconcile_day(day, close_at=None):
+    """
+    Reconcile one day, see the module docstring. Safe to run again: rows
+    already there and punches already flagged are left alone.
+    """
+    with transaction.atomic():
+        missing = scheduled_employees(day) - set(
+            Attendance.objects.filter(date=day).values_list('employee_id', flat=True)
+        )
+        on_leave = set(
+            Leave.objects.filter(
+                employee_id__in=missing, status='Approved', start_date__lte=day, end_date__gte=day,
+            ).values_list('employee_id', flat=True)
+        )
+        # A punch landing meanwhile wins over the generated row
+        Attendance.objects.bulk_create([
+            Attendance(
+                employee_id=employee_id, date=day,
+                status='On Leave' if employee_id in on_leave else 'Absent',
+            )
+            for employee_id in missing
+        ], ignore_conflicts=True)
+
+        open_punches = Attendance.objects.filter(date=day, clock_in__isnull=False, clock_out__isnull=True)
+        now = timezone.now()
+        closed = []
+        if close_at is not None:
+            closable = open_punches.filter(clock_in__lt=close_at)
+            closed = list(closable.values_list('employee_id', flat=True))
+            closable.update(clock_out=close_at, notes=_note(AUTO_CLOCK_OUT), updated_at=now)
+        flagged = open_punches.exclude(notes__contains=MISSING_CLOCK_OUT)
+        flagged_ids = list(flagged.values_list('employee_id', flat=True))
+        flagged.update(notes=_note(MISSING_CLOCK_OUT), updated_at=now)
+
+        # The bulk statements skip the save() signals, do their work once
+        changed = missing | set(closed)
+        if changed:
+            mark_payroll_dirty(
+                {key for employee_id in changed for key in dates_to_payroll_keys(employee_id, day)},
+                reason='Attendance reconciled',
+            )
+            transaction.on_commit(lambda: refresh_monthly_summaries({(employee_id, day) for employee_id in changed}))
+        if changed or flagged_ids:
+            transaction.on_commit(lambda: bump_versions(Attendance))
+
+    return {
+        'date': day,
+        'absent': len(missing - on_leave),
+        'on_leave': len(on_leave),
+        'closed': len(closed),
+        'flagged': len(flagged_ids),
+    }
@@ -0,0 +1,42 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets `text/event-stream` requests through content negotiation"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Streams are produced by StreamingHttpResponse, this only renders errors
+        if data is None:
+            return b''
+        return f"event: error\ndata: {data}\n\n".encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Lets `application/x-ndjson` requests through content negotiation"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Lines are produced by StreamingHttpResponse, this only renders errors
+        if data is None:
+            return b''
+        return (json.dumps(data, default=str) + '\n').encode(self.charset)
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Plain text exposition format read by Prometheus scrapers"""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        # Errors such as a denied permission arrive as dicts
+        return f"# error: {data}\n".encode(self.charset)
@@ -0,0 +1,187 @@
+"""
+Bulk employee onboarding and set-based mass updates.
+
+`create_employees` validates rows in chunks: each row goes through the
+regular serializer rules, but email uniqueness is checked with one query
+per chunk instead of one per row, and the valid rows are inserted with
+bulk_create. `update_employees` turns a selection ("department Sales",
+"these ids") and a change ("status Active", "raise salary by 4%") into a
+single UPDATE. Both report every row and bump the Employee version once.
+"""
+import csv
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .analytics import refresh_departments
+from .models import Employee
+from .salaries import record_salaries, start_salaries
+from .shifts import invalidate_shifts, reapply_shifts, shift_table
+from .serializers import EmployeeRowSerializer
+from .versioning import bump_versions
+
+
+EMAIL_TAKEN = 'Employee with this email already exists.'
+NOT_UTF8 = 'The CSV file is not UTF-8 text, the rest of the file was skipped.'
+SELECTION_FIELDS = ['department', 'position', 'status']
+REPORTED_FIELDS = ['department', 'position', 'status', 'salary']
+
+
+class BulkCreateResult:
+    """Counters and one entry per row, in input order"""
+
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.results = []
+
+    def ok(self, row, employee):
+        self.created += 1
+        self.results.append({'row': row, 'id': employee.pk, 'email': employee.email})
+
+    def error(self, row, errors):
+        self.failed += 1
+        self.results.append({'row': row, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'failed': self.failed, 'results': self.results}
+
+
+def csv_rows(lines):
+    """Rows of a CSV with the serializer's column names, blank cells left out"""
+    for row in csv.DictReader(lines):
+        yield {key: value.strip() for key, value in row.items() if key and value and value.strip()}
+
+
+def _create_chunk(chunk, result):
+    valid = []
+    failed = {}
+    for number, row in chunk:
+        serializer = EmployeeRowSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((number, serializer.validated_data))
+        else:
+            failed[number] = serializer.errors
+
+    taken = set(
+        Employee.objects.filter(email__in={data['email'] for _, data in valid}).values_list('email', flat=True)
+    )
+    new = {}
+    for number, data in valid:
+        if data['email'] in taken:
+            failed[number] = {'email': [EMAIL_TAKEN]}
+        else:
+            # Also rejects a repeat of the email further down the file
+            taken.add(data['email'])
+            new[number] = Employee(**data)
+
+    if new:
+        try:
+            with transaction.atomic():
+                Employee.objects.bulk_create(new.values())
+                start_salaries(new.values())
+                if any(employee.shift_id for employee in new.values()):
+                    transaction.on_commit(invalidate_shifts)
+        except IntegrityError:
+            # An email was taken concurrently, nothing of this chunk was saved
+            for number in new:
+                failed[number] = {'email': [EMAIL_TAKEN]}
+            new = {}
+
+    for number, _ in chunk:
+        if number in new:
+            result.ok(number, new[number])
+        else:
+            result.error(number, failed[number])
+
+
+def create_employees(rows, chunk_size=500):
+    """
+    Create employees from an iterable of field dicts, numbered from 1.
+    Rows decoded lazily from an upload stop at the first bytes that aren't
+    UTF-8, reported on the row after the last one read.
+    """
+    result = BulkCreateResult()
+    chunk = []
+    number = 0
+    try:
+        for number, row in enumerate(rows, 1):
+            chunk.append((number, row))
+            if len(chunk) >= chunk_size:
+                _create_chunk(chunk, result)
+                chunk = []
+    except UnicodeDecodeError:
+        # The decoder can't resume past the bad bytes, the rows before them
+        # are still created
+        decode_error = number + 1
+    else:
+        decode_error = None
+    if chunk:
+        _create_chunk(chunk, result)
+    if decode_error:
+        result.error(decode_error, {'file': [NOT_UTF8]})
+    if result.created:
+        bump_versions(Employee)
+    return result
+
+
+def update_employees(where, changes):
+    """
+    Apply validated `changes` to the employees matching `where` (see
+    EmployeeBulkUpdateSerializer) in one UPDATE. Reports the old and new
+    values of every changed field per employee, and the requested ids that
+    don't exist.
+    """
+    queryset = Employee.objects.order_by()
+    if 'ids' in where:
+        queryset = queryset.filter(id__in=where['ids'])
+    for field in SELECTION_FIELDS:
+        if field in where:
+            queryset = queryset.filter(**{field: where[field]})
+
+    values = {field: changes[field] for field in REPORTED_FIELDS if field in changes}
+    if 'raise_percent' in changes:
+        values['salary'] = Round(F('salary') * (1 + changes['raise_percent'] / 100), 2)
+    values['updated_at'] = timezone.now()
+
+    with transaction.atomic():
+        before = {
+            row['id']: row
+            for row in queryset.select_for_update().values('id', *REPORTED_FIELDS)
+        }
+        if before:
+            Employee.objects.filter(id__in=before).update(**values)
+            after = list(Employee.objects.filter(id__in=before).values('id', *REPORTED_FIELDS))
+            if 'department' in changes:
+                refresh_departments(before, changes['department'])
+                table = shift_table()
+                hours = {row['id']: table.rule(row['id'], row['department']).standard_hours for row in after}
+                reapply_shifts([
+                    employee_id for employee_id, row in before.items()
+                    if table.rule(employee_id, row['department']).standard_hours != hours[employee_id]
+                ])
+            raised = {row['id']: row['salary'] for row in after if row['salary'] != before[row['id']]['salary']}
+            record_salaries(raised, date.today(), reason='Bulk update')
+            transaction.on_commit(lambda: bump_versions(Employee))
+        else:
+            after = []
+
+    results = []
+    for row in after:
+        old = before[row['id']]
+        results.append({
+            'id': row['id'],
+            'changes': {
+                field: [old[field], row[field]] for field in REPORTED_FIELDS if old[field] != row[field]
+            },
+        })
+    results.sort(key=lambda entry: entry['id'])
+    return {
+        'matched': len(results),
+        'updated': sum(1 for entry in results if entry['changes']),
+        'missing': sorted(set(where.get('ids', [])) - before.keys()),
+        'results': results,
+    }
@@ -0,0 +1,139 @@
+"""
+Database routing: reporting reads on a read replica, history on an archive.
+
+Views decorated with `reads_from_replica` read from the `replica` database
+when DATABASES defines one; everything else, and every write, uses
+`default`. A user whose request wrote to the primary is pinned to it for
+REPLICA_PIN_SECONDS, so their own changes show up in their reports even
+while the replica lags behind.
+
+The archive models live in the `archive` database when there is one, see
+employees.archive.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.request import Request
+
+
+REPLICA = 'replica'
+ARCHIVE = 'archive'
+ARCHIVED_MODELS = {'employees.attendancearchive', 'employees.payrollarchive'}
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_write_flag = ContextVar('request_write_flag', default=None)
+
+
+class WriteFlag:
+    """Set by the router when the request being handled writes"""
+
+    __slots__ = ['wrote']
+
+    def __init__(self):
+        self.wrote = False
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def _pin_key(user):
+    return f'replica-pin:{user.pk}'
+
+
+def pin_to_primary(user):
+    cache.set(_pin_key(user), True, getattr(settings, 'REPLICA_PIN_SECONDS', 10))
+
+
+def is_pinned(user):
+    return bool(user and user.is_authenticated and cache.get(_pin_key(user)))
+
+
+@contextmanager
+def track_writes():
+    """Yield a WriteFlag telling whether anything inside wrote to the database"""
+    flag = WriteFlag()
+    token = _write_flag.set(flag)
+    try:
+        yield flag
+    finally:
+        _write_flag.reset(token)
+
+
+def reads_from_replica(view):
+    """Send the reads of a view method or function view to the replica"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        request = args[0] if isinstance(args[0], Request) else args[1]
+        if not replica_configured() or is_pinned(request.user):
+            return view(*args, **kwargs)
+        token = _replica_reads.set(True)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class ArchiveRouter:
+    """Keep the archive models, and only them, in the `archive` database if configured"""
+
+    def _archive_db(self, model):
+        if model._meta.label_lower in ARCHIVED_MODELS and ARCHIVE in settings.DATABASES:
+            return ARCHIVE
+        return None
+
+    def db_for_read(self, model, **hints):
+        db = self._archive_db(model)
+        if db is None:
+            # Employees of archived rows come from the primary
+            instance = hints.get('instance')
+            if instance is not None and instance._state.db == ARCHIVE:
+                return DEFAULT_DB_ALIAS
+        return db
+
+    def db_for_write(self, model, **hints):
+        return self._archive_db(model)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if ARCHIVE in (obj1._state.db, obj2._state.db):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if ARCHIVE not in settings.DATABASES:
+            return None
+        archived = f'{app_label}.{model_name}' in ARCHIVED_MODELS
+        return archived if db == ARCHIVE else (False if archived else None)
+
+
+class ReplicaRouter:
+    """Database router for `reads_from_replica` views, see the module docstring"""
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and replica_configured():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        flag = _write_flag.get()
+        if flag is not None:
+            flag.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both sides
+        databases = {DEFAULT_DB_ALIAS, REPLICA}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db == REPLICA:
+            return False
+        return None
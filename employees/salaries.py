@@ -0,0 +1,115 @@
+"""
+Effective-dated salaries.
+
+Employee.salary only holds the salary in force today. SalaryHistory keeps
+every salary with the range of days it applies to, so payroll of any month
+is computed with the salary of that month, also when a raise is recorded
+after the fact or an old month is recomputed. A payroll month uses the
+salary in force on its last day.
+
+`salaries_as_of` resolves the salary of every employee on a day with one
+range lookup. Ranges are kept contiguous: each row ends where the next one
+of the same employee starts.
+"""
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+
+from .analytics import next_month
+from .models import Employee, SalaryHistory
+from .versioning import bump_versions
+
+
+def salaries_as_of(day, employee_ids=None):
+    """
+    {employee_id: salary} in force on `day`, in one query. `employee_ids`
+    may be a list or a `values('id')` queryset, all employees when omitted.
+    Employees without history before `day` are left out.
+    """
+    rows = SalaryHistory.objects.filter(
+        Q(effective_to__isnull=True) | Q(effective_to__gt=day),
+        effective_from__lte=day,
+    )
+    if employee_ids is not None:
+        rows = rows.filter(employee_id__in=employee_ids)
+    return dict(rows.order_by().values_list('employee_id', 'salary'))
+
+
+def month_salaries(month, year, employee_ids=None):
+    """salaries_as_of the last day of a payroll month"""
+    return salaries_as_of(next_month(date(year, month, 1)) - timedelta(days=1), employee_ids)
+
+
+def start_salaries(employees):
+    """First history row of new employees, from joining (today at the latest)"""
+    today = date.today()
+    SalaryHistory.objects.bulk_create([
+        SalaryHistory(
+            employee_id=employee.pk, salary=employee.salary,
+            effective_from=min(employee.join_date, today), reason='Initial salary',
+        )
+        for employee in employees
+    ], batch_size=1000)
+
+
+def _restitch(employee_ids):
+    """Set effective_to of the employees' rows to the start of the next row"""
+    changed = []
+    following = {}
+    for row in SalaryHistory.objects.filter(employee_id__in=employee_ids).order_by('employee_id', '-effective_from'):
+        effective_to = following.get(row.employee_id)
+        if row.effective_to != effective_to:
+            row.effective_to = effective_to
+            changed.append(row)
+        following[row.employee_id] = row.effective_from
+    SalaryHistory.objects.bulk_update(changed, ['effective_to'], batch_size=1000)
+
+
+def record_salaries(salaries, effective_from, reason=''):
+    """
+    Record {employee_id: salary} as in force from `effective_from`, today
+    or earlier, replacing an entry of the same day. Processed payroll of
+    the months since then is queued for recomputation, and Employee.salary
+    is set to the salary in force today.
+    """
+    # Payroll resolves salaries through this module
+    from .payroll import mark_payroll_dirty
+
+    if not salaries:
+        return
+    today = date.today()
+    if effective_from > today:
+        raise ValueError('Salaries can only be recorded from today or an earlier day')
+    # Callers changing the employees too want both or neither, no savepoint
+    with transaction.atomic(savepoint=False):
+        SalaryHistory.objects.bulk_create(
+            [
+                SalaryHistory(employee_id=employee_id, salary=salary, effective_from=effective_from, reason=reason)
+                for employee_id, salary in salaries.items()
+            ],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['employee', 'effective_from'],
+            update_fields=['salary', 'reason'],
+        )
+        _restitch(salaries)
+
+        # No future entries, so the open row is the one in force today.
+        # A queryset update: save() would record the salary again.
+        current = SalaryHistory.objects.filter(
+            employee_id=OuterRef('pk'), effective_to__isnull=True,
+        ).order_by().values('salary')[:1]
+        Employee.objects.filter(id__in=salaries).exclude(salary=Subquery(current)).update(salary=Subquery(current))
+
+        months = []
+        month = effective_from.replace(day=1)
+        while month <= today:
+            months.append(month)
+            month = next_month(month)
+        mark_payroll_dirty(
+            {(employee_id, month.month, month.year) for employee_id in salaries for month in months},
+            reason='Salary changed',
+        )
+        # Payroll simulations cache the salaries of a month until this moves
+        bump_versions(SalaryHistory)
@@ -0,0 +1,55 @@
+"""
+Scheduled work days.
+
+An employee is expected at work on the days listed in the WorkSchedule of
+the payroll period covering the day, when there is one, and else on the
+ATTENDANCE_WORKWEEK weekdays. Reconciliation uses this to decide who is
+absent, payroll to count paid leave on work days only.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+
+from .models import WorkSchedule
+
+
+WORKWEEK = frozenset(getattr(settings, 'ATTENDANCE_WORKWEEK', [0, 1, 2, 3, 4]))
+
+
+class Schedule:
+    """Days of a range covered by explicit schedules, and the work days among them"""
+
+    __slots__ = ('covered', 'work_days')
+
+    def __init__(self):
+        self.covered = set()
+        self.work_days = set()
+
+    def is_work_day(self, day):
+        if day in self.covered:
+            return day in self.work_days
+        return day.weekday() in WORKWEEK
+
+
+DEFAULT_SCHEDULE = Schedule()
+
+
+def work_schedules(employee_ids, start, end):
+    """
+    {employee_id: Schedule} of the employees with WorkSchedules overlapping
+    a date range, in one query. Others follow DEFAULT_SCHEDULE.
+    """
+    schedules = {}
+    rows = WorkSchedule.objects.filter(
+        employee_id__in=employee_ids,
+        payroll_period__start_date__lte=end,
+        payroll_period__end_date__gte=start,
+    ).values_list('employee_id', 'payroll_period__start_date', 'payroll_period__end_date', 'work_days')
+    for employee_id, period_start, period_end, work_days in rows:
+        schedule = schedules.setdefault(employee_id, Schedule())
+        day = max(period_start, start)
+        while day <= min(period_end, end):
+            schedule.covered.add(day)
+            day += timedelta(days=1)
+        schedule.work_days.update(date.fromisoformat(day) for day in work_days or [])
+    return schedules
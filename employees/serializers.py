@@ -1,8 +1,11 @@
+from datetime import date
+
 from rest_framework import serializers
-from .models import Employee, Attendance, Leave, Payroll
+from .metrics import TimedDataMixin
+from .models import Employee, Attendance, Leave, Payroll, PayrollRule, SalaryHistory, Shift
 
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(TimedDataMixin, serializers.ModelSerializer):
     """Serializer for Employee model"""
     full_name = serializers.ReadOnlyField()
     
@@ -10,7 +13,7 @@ class EmployeeSerializer(serializers.ModelSerializer):
         model = Employee
         fields = [
             'id', 'first_name', 'last_name', 'full_name', 'email',
-            'department', 'position', 'salary', 'join_date', 'status',
+            'department', 'position', 'salary', 'join_date', 'status', 'shift',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
@@ -26,7 +29,66 @@ class EmployeeSerializer(serializers.ModelSerializer):
         return value
 
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class EmployeeRowSerializer(EmployeeSerializer):
+    """Row of a bulk import, email uniqueness is checked for the whole batch at once"""
+    
+    class Meta(EmployeeSerializer.Meta):
+        extra_kwargs = {'email': {'validators': []}}
+    
+    def validate_email(self, value):
+        return value
+
+
+class EmployeeSelectionSerializer(TimedDataMixin, serializers.Serializer):
+    """Which employees a bulk update applies to, all given criteria must match"""
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    department = serializers.ChoiceField(choices=Employee.DEPARTMENT_CHOICES, required=False)
+    position = serializers.CharField(max_length=100, required=False)
+    status = serializers.ChoiceField(choices=Employee.STATUS_CHOICES, required=False)
+    
+    def validate(self, data):
+        if not data:
+            raise serializers.ValidationError("Select employees by ids, department, position or status.")
+        return data
+
+
+class EmployeeChangesSerializer(TimedDataMixin, serializers.Serializer):
+    """What a bulk update sets, `raise_percent` scales each salary"""
+    department = serializers.ChoiceField(choices=Employee.DEPARTMENT_CHOICES, required=False)
+    position = serializers.CharField(max_length=100, required=False)
+    status = serializers.ChoiceField(choices=Employee.STATUS_CHOICES, required=False)
+    salary = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    raise_percent = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=-99, required=False)
+    
+    def validate(self, data):
+        if not data:
+            raise serializers.ValidationError("Nothing to change.")
+        if 'salary' in data and 'raise_percent' in data:
+            raise serializers.ValidationError("Give either salary or raise_percent, not both.")
+        return data
+
+
+class EmployeeBulkUpdateSerializer(TimedDataMixin, serializers.Serializer):
+    """Set-based update of the selected employees"""
+    where = EmployeeSelectionSerializer()
+    set = EmployeeChangesSerializer()
+
+
+class SalaryHistorySerializer(TimedDataMixin, serializers.ModelSerializer):
+    """Salary of an employee over a range of days, `effective_to` excluded"""
+    
+    class Meta:
+        model = SalaryHistory
+        fields = ['id', 'salary', 'effective_from', 'effective_to', 'reason', 'created_at']
+        read_only_fields = ['effective_to', 'created_at']
+    
+    def validate_effective_from(self, value):
+        if value > date.today():
+            raise serializers.ValidationError("Salaries can only be recorded from today or an earlier day.")
+        return value
+
+
+class AttendanceSerializer(TimedDataMixin, serializers.ModelSerializer):
     """Serializer for Attendance model"""
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
     working_hours = serializers.ReadOnlyField()
@@ -68,7 +130,7 @@ class AttendanceSerializer(serializers.ModelSerializer):
         return data
 
 
-class LeaveSerializer(serializers.ModelSerializer):
+class LeaveSerializer(TimedDataMixin, serializers.ModelSerializer):
     """Serializer for Leave model"""
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
     
@@ -92,7 +154,7 @@ class LeaveSerializer(serializers.ModelSerializer):
         return data
 
 
-class PayrollSerializer(serializers.ModelSerializer):
+class PayrollSerializer(TimedDataMixin, serializers.ModelSerializer):
     """Serializer for Payroll model"""
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
     gross_salary = serializers.ReadOnlyField()
@@ -135,7 +197,58 @@ class PayrollSerializer(serializers.ModelSerializer):
         return data
 
 
-class ClockInOutSerializer(serializers.Serializer):
+class PayrollRuleSerializer(TimedDataMixin, serializers.ModelSerializer):
+    """Serializer for PayrollRule model"""
+    
+    class Meta:
+        model = PayrollRule
+        fields = [
+            'id', 'name', 'kind', 'basis', 'amount', 'department', 'position',
+            'is_active', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['created_at', 'updated_at']
+
+
+class ShiftSerializer(TimedDataMixin, serializers.ModelSerializer):
+    """Serializer for Shift model, with the departments it is assigned to"""
+    departments = serializers.SlugRelatedField(slug_field='department', many=True, read_only=True)
+    
+    class Meta:
+        model = Shift
+        fields = [
+            'id', 'name', 'start_time', 'grace_minutes', 'standard_hours', 'departments',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = ['created_at', 'updated_at']
+
+
+class ShiftAssignmentSerializer(TimedDataMixin, serializers.Serializer):
+    """Departments and/or employees to put on a shift"""
+    departments = serializers.ListField(
+        child=serializers.ChoiceField(choices=Employee.DEPARTMENT_CHOICES), required=False, allow_empty=False
+    )
+    employees = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    
+    def validate(self, data):
+        if not data:
+            raise serializers.ValidationError("Give departments and/or employees.")
+        return data
+
+
+class PayrollTransitionSerializer(TimedDataMixin, serializers.Serializer):
+    """Status change of the payroll rows given by ids, or of a whole month"""
+    status = serializers.ChoiceField(choices=['Processed', 'Paid'])
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    month = serializers.IntegerField(min_value=1, max_value=12, required=False)
+    year = serializers.IntegerField(min_value=2000, required=False)
+    
+    def validate(self, data):
+        if 'ids' not in data and not ('month' in data and 'year' in data):
+            raise serializers.ValidationError("Give ids, or month and year.")
+        return data
+
+
+class ClockInOutSerializer(TimedDataMixin, serializers.Serializer):
     """Serializer for clock in/out operations"""
     employee_id = serializers.IntegerField()
     clock_type = serializers.ChoiceField(choices=['in', 'out'])
@@ -145,3 +258,17 @@ class ClockInOutSerializer(serializers.Serializer):
         if not Employee.objects.filter(id=value).exists():
             raise serializers.ValidationError("Employee not found.")
         return value
+
+
+class PunchSerializer(TimedDataMixin, serializers.Serializer):
+    """One kiosk punch, `key` is generated by the kiosk and unique per punch"""
+    key = serializers.CharField(max_length=64)
+    employee_id = serializers.IntegerField()
+    clock_type = serializers.ChoiceField(choices=['in', 'out'])
+    timestamp = serializers.DateTimeField()
+
+
+class PunchBatchSerializer(TimedDataMixin, serializers.Serializer):
+    """Punches in the order they were taken on the kiosk"""
+    device = serializers.CharField(max_length=100, required=False, default='')
+    punches = PunchSerializer(many=True, allow_empty=False, max_length=1000)
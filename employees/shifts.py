@@ -0,0 +1,163 @@
+"""
+Shifts: when a clock in is late, and after how many hours work is overtime.
+
+An employee works their own shift when they have one, else their
+department's, else the default rules (start at DEFAULT_SHIFT_START, no
+grace, DEFAULT_STANDARD_HOURS a day).
+
+Punches resolve the shift from a table of every assignment kept in process
+memory, so the clock endpoints don't query for it. The table is loaded
+again after any shift or assignment change: changes bump a generation
+counter in the shared cache, which every process compares with the one its
+table was loaded at. Use a shared cache (e.g. Redis) when running several
+workers, the default local-memory cache only reaches its own process.
+
+Changing the standard hours someone works by reassigns overtime: callers
+pass the employees concerned to `reapply_shifts`.
+"""
+import threading
+from collections import namedtuple
+from datetime import date, time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, QuerySet
+
+from .models import DepartmentShift, Employee, Payroll, Shift
+
+
+DEFAULT_SHIFT_START = time(9, 0)
+DEFAULT_STANDARD_HOURS = 8
+GENERATION_KEY = 'shifts:generation'
+DAY_SECONDS = 24 * 3600
+
+
+def _seconds(moment):
+    return moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+class ShiftRule(namedtuple('ShiftRule', ['start', 'grace_minutes', 'standard_hours'])):
+    """Thresholds of one shift, plain values so the table is cheap to share"""
+
+    __slots__ = ()
+
+    def status(self, clock_in):
+        """
+        Attendance status of a clock in at `clock_in`. Times are compared as
+        offsets from the shift start around the clock, so a 22:00 shift
+        is late at 00:30: up to half a day before the start is early,
+        after the grace minutes and up to half a day after it is late.
+        """
+        offset = (_seconds(clock_in) - _seconds(self.start)) % DAY_SECONDS
+        return 'Late' if self.grace_minutes * 60 <= offset < DAY_SECONDS // 2 else 'Present'
+
+
+DEFAULT_RULE = ShiftRule(DEFAULT_SHIFT_START, 0, DEFAULT_STANDARD_HOURS)
+
+
+class ShiftTable:
+    """Every shift and assignment, as loaded at one generation"""
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.rules = {
+            shift_id: ShiftRule(start, grace, float(hours))
+            for shift_id, start, grace, hours in Shift.objects.values_list(
+                'id', 'start_time', 'grace_minutes', 'standard_hours'
+            )
+        }
+        self.departments = dict(DepartmentShift.objects.values_list('department', 'shift_id'))
+        self.employees = dict(
+            Employee.objects.filter(shift__isnull=False).order_by().values_list('id', 'shift_id')
+        )
+
+    def rule(self, employee_id, department):
+        return self.resolve(self.employees.get(employee_id), department)
+
+    def resolve(self, shift_id, department):
+        """Rule of someone on their own `shift_id` (None for none) in `department`"""
+        return self.rules.get(shift_id or self.departments.get(department), DEFAULT_RULE)
+
+
+_lock = threading.Lock()
+_table = None
+
+
+def _generation():
+    return cache.get(GENERATION_KEY, 0)
+
+
+def shift_table():
+    """The current ShiftTable, loaded only when assignments changed"""
+    global _table
+    generation = _generation()
+    table = _table
+    if table is not None and table.generation == generation:
+        return table
+    with _lock:
+        if _table is None or _table.generation != generation:
+            _table = ShiftTable(generation)
+        return _table
+
+
+def shift_rule(employee_id, department):
+    """ShiftRule of one employee"""
+    return shift_table().rule(employee_id, department)
+
+
+def invalidate_shifts():
+    """Make every process reload the table, call once the change committed"""
+    global _table
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+    with _lock:
+        _table = None
+
+
+def reapply_shifts(employees):
+    """
+    Bring the figures derived from standard hours in line after the
+    standard hours of `employees` (ids or an Employee queryset) changed,
+    inside the changing transaction. Payroll not paid yet is queued for
+    recomputation, and the monthly summaries of its months and of the
+    current month are refreshed once the change commits. Paid payroll and
+    the Late status of recorded punches keep the rules they were made with.
+    """
+    # Both resolve standard hours through this module
+    from .analytics import refresh_monthly_summaries
+    from .payroll import queue_recompute
+
+    if isinstance(employees, QuerySet):
+        employees = employees.values_list('id', flat=True)
+    employee_ids = set(employees)
+    if not employee_ids:
+        return
+    keys = set(
+        Payroll.objects.filter(employee_id__in=employee_ids).exclude(status='Paid')
+        .values_list('employee_id', 'month', 'year')
+    )
+    queue_recompute(keys, reason='Shift changed')
+    this_month = date.today().replace(day=1)
+    periods = {(employee_id, date(year, month, 1)) for employee_id, month, year in keys}
+    periods |= {(employee_id, this_month) for employee_id in employee_ids}
+
+    def refresh():
+        # The summaries need the new table, whatever ran first on commit
+        invalidate_shifts()
+        refresh_monthly_summaries(periods)
+    transaction.on_commit(refresh)
+
+
+def department_employees(departments):
+    """Employees following the shift of one of `departments`"""
+    return Employee.objects.filter(department__in=departments, shift__isnull=True)
+
+
+def shift_employees(shift):
+    """Employees working `shift`, their own or their department's"""
+    return Employee.objects.filter(
+        Q(shift=shift)
+        | Q(shift__isnull=True, department__in=DepartmentShift.objects.filter(shift=shift).values('department'))
+    )
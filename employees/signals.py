@@ -0,0 +1,283 @@
+from datetime import date
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .analytics import refresh_employee_department, refresh_monthly_summaries
+from .broadcast import attendance_hub
+from .earnings import AMOUNT_FIELDS, refresh_earnings_ytd
+from .payroll import dates_to_payroll_keys, leave_to_payroll_keys, mark_payroll_dirty
+from .models import (
+    Employee, Attendance, AttendanceArchive, DepartmentShift, Leave, Payroll, PayrollArchive, Shift, Tombstone
+)
+from .salaries import record_salaries, start_salaries
+from .shifts import (
+    DEFAULT_RULE, department_employees, invalidate_shifts, reapply_shifts, shift_employees, shift_table
+)
+from .versioning import bump_versions
+
+
+def _attendance_payload(instance):
+    """Compact representation of an attendance row for live events"""
+    return {
+        'id': instance.pk,
+        'employee': instance.employee_id,
+        'date': instance.date,
+        'status': instance.status,
+        'clock_in': instance.clock_in,
+        'clock_out': instance.clock_out,
+    }
+
+
+def _attendance_changes(instance, created):
+    """Work out which live events a saved attendance row represents"""
+    previous = {} if created else getattr(instance, '_loaded_values', None)
+    if previous is None:
+        # Instance was not loaded from the database, report it as a status change
+        return ['status']
+
+    changes = []
+    if instance.clock_in and not previous.get('clock_in'):
+        changes.append('clock_in')
+    if instance.clock_out and not previous.get('clock_out'):
+        changes.append('clock_out')
+    if created or instance.status != previous.get('status'):
+        changes.append('status')
+    return changes
+
+
+def _remember_saved_values(instance):
+    """Later saves of the same instance compare against what was just written"""
+    instance._loaded_values = {
+        'date': instance.date,
+        'status': instance.status,
+        'clock_in': instance.clock_in,
+        'clock_out': instance.clock_out,
+    }
+
+
+# Payroll fields the year-to-date totals depend on
+YTD_FIELDS = ['employee_id', 'year', 'month', *AMOUNT_FIELDS]
+
+
+def _deleted_with_employee(signal_kwargs):
+    """True when a row goes away because its employee is being deleted"""
+    origin = signal_kwargs.get('origin')
+    return isinstance(origin, Employee) or getattr(origin, 'model', None) is Employee
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, created, raw=False, **kwargs):
+    """Broadcast live changes and refresh the monthly rollup once the save commits"""
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_values', None) or {}
+
+    changes = _attendance_changes(instance, created)
+    if changes:
+        payload = _attendance_payload(instance)
+        payload['changes'] = changes
+        transaction.on_commit(lambda: attendance_hub.publish('attendance', payload))
+
+    keys = {(instance.employee_id, instance.date)}
+    if previous.get('date') and previous['date'] != instance.date:
+        keys.add((instance.employee_id, previous['date']))
+    transaction.on_commit(lambda: refresh_monthly_summaries(keys))
+
+    # Queued in the same transaction as the change itself
+    mark_payroll_dirty(
+        dates_to_payroll_keys(instance.employee_id, instance.date, previous.get('date')),
+        reason='Attendance changed',
+    )
+
+    _remember_saved_values(instance)
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_deleted(sender, instance, **kwargs):
+    """Broadcast removal of an attendance row and refresh its month"""
+    payload = {'id': instance.pk, 'employee': instance.employee_id, 'date': instance.date}
+    transaction.on_commit(lambda: attendance_hub.publish('attendance-removed', payload))
+    keys = {(instance.employee_id, instance.date)}
+    transaction.on_commit(lambda: refresh_monthly_summaries(keys))
+    if not _deleted_with_employee(kwargs):
+        mark_payroll_dirty(
+            dates_to_payroll_keys(instance.employee_id, instance.date),
+            reason='Attendance deleted',
+        )
+
+
+@receiver(post_save, sender=Leave)
+def leave_saved(sender, instance, created, raw=False, **kwargs):
+    """Queue payroll recomputation when approved leave is added, changed or revoked"""
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_values', None) or {}
+    keys = set()
+    if instance.status == 'Approved':
+        keys |= leave_to_payroll_keys(instance.employee_id, instance.start_date, instance.end_date)
+    if previous.get('status') == 'Approved':
+        keys |= leave_to_payroll_keys(instance.employee_id, previous['start_date'], previous['end_date'])
+    mark_payroll_dirty(keys, reason='Leave changed')
+    instance._loaded_values = {
+        'status': instance.status,
+        'start_date': instance.start_date,
+        'end_date': instance.end_date,
+    }
+
+
+@receiver(post_delete, sender=Leave)
+def leave_deleted(sender, instance, **kwargs):
+    """Queue payroll recomputation when approved leave is removed"""
+    if instance.status == 'Approved' and not _deleted_with_employee(kwargs):
+        mark_payroll_dirty(
+            leave_to_payroll_keys(instance.employee_id, instance.start_date, instance.end_date),
+            reason='Leave deleted',
+        )
+
+
+@receiver(post_save, sender=Payroll)
+def payroll_saved(sender, instance, created, raw=False, **kwargs):
+    """Refresh the year-to-date totals in the same transaction as the change"""
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_values', None) or {}
+    current = {field: getattr(instance, field) for field in YTD_FIELDS}
+    # Status changes leave the totals alone
+    if created or any(previous.get(field) != value for field, value in current.items()):
+        keys = {(instance.employee_id, instance.year)}
+        if previous.get('year'):
+            keys.add((previous['employee_id'], previous['year']))
+        refresh_earnings_ytd(keys)
+    instance._loaded_values = current
+
+
+@receiver(post_delete, sender=Payroll)
+def payroll_deleted(sender, instance, **kwargs):
+    """Take a removed payroll row out of the year-to-date totals"""
+    if not _deleted_with_employee(kwargs):
+        refresh_earnings_ytd({(instance.employee_id, instance.year)})
+
+
+@receiver(post_save, sender=Employee)
+def employee_saved(sender, instance, created, raw=False, **kwargs):
+    """
+    Keep rollup rows tagged with the employee's current department, record
+    salary changes, reload the shift table when the shift changed and
+    rework overtime when their standard hours changed
+    """
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_values', None) or {}
+    if created:
+        start_salaries([instance])
+    else:
+        refresh_employee_department(instance)
+        if 'salary' in previous and previous['salary'] != instance.salary:
+            record_salaries({instance.pk: instance.salary}, date.today(), reason='Salary changed')
+    if instance.shift_id != previous.get('shift_id'):
+        transaction.on_commit(invalidate_shifts)
+    if not created:
+        table = shift_table()
+        before = table.resolve(previous.get('shift_id'), previous.get('department'))
+        if before.standard_hours != table.resolve(instance.shift_id, instance.department).standard_hours:
+            reapply_shifts([instance.pk])
+    instance._loaded_values = {
+        'salary': instance.salary, 'shift_id': instance.shift_id, 'department': instance.department,
+    }
+
+
+@receiver(post_delete, sender=Employee)
+def employee_deleted(sender, instance, **kwargs):
+    """Drop archived history, it has no foreign key constraint to cascade"""
+    AttendanceArchive.objects.filter(employee_id=instance.pk).delete()
+    PayrollArchive.objects.filter(employee_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Shift)
+def shift_saved(sender, instance, created, raw=False, **kwargs):
+    """Reload shift tables once the change commits, new standard hours rework overtime"""
+    if raw:
+        return
+    transaction.on_commit(invalidate_shifts)
+    previous = getattr(instance, '_loaded_values', None) or {}
+    if not created and previous.get('standard_hours') != instance.standard_hours:
+        reapply_shifts(shift_employees(instance))
+    instance._loaded_values = {'standard_hours': instance.standard_hours}
+
+
+@receiver(pre_delete, sender=Shift)
+def shift_deleting(sender, instance, **kwargs):
+    """Its employees fall back to other rules, found while assignments still exist"""
+    reapply_shifts(shift_employees(instance))
+
+
+@receiver(post_delete, sender=Shift)
+def shift_deleted(sender, instance, **kwargs):
+    """Shift tables in memory are stale once the delete commits"""
+    transaction.on_commit(invalidate_shifts)
+
+
+@receiver(post_save, sender=DepartmentShift)
+def department_shift_saved(sender, instance, created, raw=False, **kwargs):
+    """Employees of the department, before and after the change, follow another shift"""
+    if raw:
+        return
+    transaction.on_commit(invalidate_shifts)
+    previous = getattr(instance, '_loaded_values', None) or {}
+    rules = shift_table().rules
+    # A department has one row at most: without it, the default rules applied
+    before = {instance.department: DEFAULT_RULE}
+    after = {previous.get('department'): DEFAULT_RULE}
+    before[previous.get('department')] = rules.get(previous.get('shift_id'))
+    after[instance.department] = rules.get(instance.shift_id)
+    _reapply_departments(before, after)
+    instance._loaded_values = {'department': instance.department, 'shift_id': instance.shift_id}
+
+
+@receiver(post_delete, sender=DepartmentShift)
+def department_shift_deleted(sender, instance, **kwargs):
+    """The department's employees fall back to the default rules"""
+    transaction.on_commit(invalidate_shifts)
+    _reapply_departments(
+        {instance.department: shift_table().rules.get(instance.shift_id)},
+        {instance.department: DEFAULT_RULE},
+    )
+
+
+def _reapply_departments(before, after):
+    """Rework overtime of the departments whose standard hours changed, unknown rules count as changed"""
+    reapply_shifts(department_employees([
+        department for department, rule in after.items()
+        if department and (
+            rule is None or before.get(department) is None
+            or rule.standard_hours != before[department].standard_hours
+        )
+    ]))
+
+
+def bump_table_version(sender, raw=False, **kwargs):
+    """Invalidate conditional-GET validators of the changed table after commit"""
+    if raw:
+        return
+    transaction.on_commit(lambda: bump_versions(sender))
+
+
+for _model in (Employee, Attendance, Leave, Payroll):
+    _uid = f'bump_version_{_model._meta.model_name}'
+    post_save.connect(bump_table_version, sender=_model, dispatch_uid=_uid)
+    post_delete.connect(bump_table_version, sender=_model, dispatch_uid=_uid)
+
+
+def record_tombstone(sender, instance, **kwargs):
+    """Leave a tombstone behind so delta sync clients learn about deletes"""
+    Tombstone.objects.create(
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+        employee_id=instance.employee_id,
+    )
+
+
+for _model in (Attendance, Leave, Payroll):
+    post_delete.connect(record_tombstone, sender=_model, dispatch_uid=f'tombstone_{_model._meta.model_name}')
@@ -0,0 +1,229 @@
+import threading
+from dataclasses import dataclass, fields
+from datetime import date
+from typing import Optional
+
+import numpy as np
+
+from .models import Employee, Attendance, AttendanceMonthlySummary, Leave, SalaryHistory
+from .payroll import WORKING_DAYS, Coefficients, PayrollPlan, month_bounds, paid_leave_days
+from .salaries import month_salaries
+from .versioning import current_versions
+
+
+@dataclass(frozen=True)
+class PayrollParameters:
+    """
+    Changes to the payroll rules used by `PayrollViewSet.process`. A rate
+    left as None is each employee's own from the active rules, so the
+    defaults reproduce processing; a number replaces it for everyone.
+    """
+    working_days: float = WORKING_DAYS
+    overtime_rate: Optional[float] = None
+    # Earning as a fraction of basic salary, fixed amount rules still apply
+    allowance_rate: Optional[float] = None
+    # Fraction of the daily rate deducted per absent day
+    absence_deduction_rate: Optional[float] = None
+    # Extra deduction as a fraction of basic salary (e.g. a new contribution)
+    deduction_rate: float = 0.0
+    # Across-the-board salary change as a fraction (0.05 = +5%)
+    salary_adjustment: float = 0.0
+
+    @classmethod
+    def from_data(cls, data, base=None):
+        """Build parameters from request data, falling back to `base`"""
+        base = base or cls()
+        values = {}
+        for field in fields(cls):
+            value = data.get(field.name, getattr(base, field.name))
+            values[field.name] = None if value is None and field.default is None else float(value)
+        if values['working_days'] <= 0:
+            raise ValueError('working_days must be positive')
+        return cls(**values)
+
+
+@dataclass
+class PayrollDataset:
+    """Salary and attendance aggregates of all active employees for one month"""
+    departments: np.ndarray  # department labels, one per code
+    department_codes: np.ndarray
+    groups: list  # (department, position) pairs, one per code
+    group_codes: np.ndarray
+    salary: np.ndarray
+    present_days: np.ndarray
+    overtime_hours: np.ndarray
+
+    @property
+    def size(self):
+        return len(self.salary)
+
+
+def load_dataset(month, year):
+    """
+    Load the inputs of a month's payroll into arrays, with four queries
+    plus two when anyone took paid leave in the month. Present days count
+    paid leave on work days and salaries are those of the month, from the
+    salary history, like `process_payroll` does.
+    """
+    active = Employee.objects.filter(status='Active')
+    employees = list(active.order_by('id').values_list('id', 'department', 'salary', 'position'))
+    salaries = month_salaries(month, year, active.values('id'))
+    ids = np.fromiter((row[0] for row in employees), dtype=np.int64, count=len(employees))
+    # The live salary when the history doesn't reach back to the month
+    salary = np.fromiter(
+        (salaries.get(row[0], row[2]) for row in employees), dtype=np.float64, count=len(employees)
+    )
+    departments, department_codes = np.unique(
+        np.array([row[1] for row in employees], dtype=object).astype(str), return_inverse=True
+    )
+    # Payroll rules apply per department and position
+    groups = {}
+    group_codes = np.fromiter(
+        (groups.setdefault((row[1], row[3]), len(groups)) for row in employees),
+        dtype=np.int64, count=len(employees),
+    )
+
+    present_days = np.zeros(len(ids))
+    overtime_hours = np.zeros(len(ids))
+    # Attendance aggregates come from the monthly rollup, not raw rows
+    rows = list(
+        AttendanceMonthlySummary.objects.filter(period=date(year, month, 1))
+        .values_list('employee_id', 'present_days', 'late_days', 'overtime_hours')
+    )
+    if rows and len(ids):
+        summary_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        positions = np.clip(np.searchsorted(ids, summary_ids), 0, len(ids) - 1)
+        matched = ids[positions] == summary_ids
+        present = np.array([row[1] + row[2] for row in rows], dtype=np.float64)
+        overtime = np.array([row[3] for row in rows], dtype=np.float64)
+        present_days[positions[matched]] = present[matched]
+        overtime_hours[positions[matched]] = overtime[matched]
+
+    start, end = month_bounds(month, year)
+    leave_days = paid_leave_days(active.values('id'), start, end)
+    if leave_days and len(ids):
+        leave_ids = np.fromiter(leave_days, dtype=np.int64, count=len(leave_days))
+        positions = np.clip(np.searchsorted(ids, leave_ids), 0, len(ids) - 1)
+        matched = ids[positions] == leave_ids
+        days = np.fromiter(leave_days.values(), dtype=np.float64, count=len(leave_days))
+        present_days[positions[matched]] += days[matched]
+
+    return PayrollDataset(
+        departments=departments,
+        department_codes=department_codes,
+        groups=list(groups),
+        group_codes=group_codes,
+        salary=salary,
+        present_days=present_days,
+        overtime_hours=overtime_hours,
+    )
+
+
+def plan_coefficients(dataset, plan):
+    """The coefficients of `plan` as arrays with one value per employee"""
+    per_group = np.array(
+        [plan.coefficients(department, position) for department, position in dataset.groups],
+        dtype=np.float64,
+    ).reshape(len(dataset.groups), len(Coefficients._fields))
+    return Coefficients(*per_group[dataset.group_codes].T)
+
+
+def _rate(override, rates):
+    return rates if override is None else override
+
+
+def evaluate(dataset, params, coefficients):
+    """
+    Apply the payroll formula to every employee at once, with the plan's
+    `coefficients` (see `plan_coefficients`) where `params` keeps them
+    """
+    c = coefficients
+    salary = dataset.salary * (1 + params.salary_adjustment)
+    daily_rate = salary / params.working_days
+    absent_days = np.maximum(params.working_days - dataset.present_days, 0)
+    allowances = c.fixed_earning + salary * _rate(params.allowance_rate, c.salary_earning)
+    overtime = dataset.overtime_hours * _rate(params.overtime_rate, c.overtime_rate)
+    deductions = (
+        c.fixed_deduction
+        + salary * (c.salary_deduction + params.deduction_rate)
+        + daily_rate * absent_days * _rate(params.absence_deduction_rate, c.absence_rate)
+    )
+    return {
+        'basic_salary': salary,
+        'allowances': allowances,
+        'overtime': overtime,
+        'deductions': deductions,
+        'net_salary': salary + allowances + overtime - deductions,
+    }
+
+
+def _totals(components):
+    return {name: round(float(values.sum()), 2) for name, values in components.items()}
+
+
+def simulate(dataset, scenario, baseline=None, plan=None):
+    """
+    Compare a scenario against the baseline, company-wide and per
+    department. Both start from the active payroll rules, compiled with
+    one query unless a `plan` is given.
+    """
+    baseline = baseline or PayrollParameters()
+    coefficients = plan_coefficients(dataset, plan or PayrollPlan.compile())
+    before = evaluate(dataset, baseline, coefficients)
+    after = evaluate(dataset, scenario, coefficients)
+
+    codes = dataset.department_codes
+    count = len(dataset.departments)
+    headcount = np.bincount(codes, minlength=count)
+    net_before = np.bincount(codes, weights=before['net_salary'], minlength=count)
+    net_after = np.bincount(codes, weights=after['net_salary'], minlength=count)
+
+    baseline_totals = _totals(before)
+    scenario_totals = _totals(after)
+    return {
+        'employees': dataset.size,
+        'baseline': baseline_totals,
+        'scenario': scenario_totals,
+        'delta': {
+            name: round(scenario_totals[name] - baseline_totals[name], 2)
+            for name in scenario_totals
+        },
+        'by_department': [
+            {
+                'department': str(department),
+                'employees': int(headcount[index]),
+                'baseline_net': round(float(net_before[index]), 2),
+                'scenario_net': round(float(net_after[index]), 2),
+                'delta': round(float(net_after[index] - net_before[index]), 2),
+            }
+            for index, department in enumerate(dataset.departments)
+        ],
+    }
+
+
+# Loaded datasets per (month, year), at most DATASET_CACHE_SIZE months
+DATASET_CACHE_SIZE = 12
+_cache_lock = threading.Lock()
+_dataset_cache = {}
+
+
+def get_dataset(month, year):
+    """
+    Return the month's dataset, reusing the loaded arrays until an employee,
+    attendance, leave or salary history row changes, so repeated what-if
+    runs skip the database.
+    """
+    versions = current_versions(Employee, Attendance, Leave, SalaryHistory)
+    key = (month, year)
+    with _cache_lock:
+        cached = _dataset_cache.get(key)
+        if cached and cached[0] == versions:
+            return cached[1]
+
+    dataset = load_dataset(month, year)
+    with _cache_lock:
+        _dataset_cache.pop(key, None)
+        if len(_dataset_cache) >= DATASET_CACHE_SIZE:
+            _dataset_cache.pop(next(iter(_dataset_cache)))
+        _dataset_cache[key] = (versions, dataset)
+    return dataset
@@ -0,0 +1,142 @@
+import atexit
+import hashlib
+import logging
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .metrics import current_request
+
+
+logger = logging.getLogger(__name__)
+
+# Set while the recorder itself talks to the database
+_recording = ContextVar('recording_slow_query', default=False)
+
+# Slow executions waiting to be written, per thread. Writing from inside the
+# execute wrapper is not possible while the statement's rows are unread.
+_local = threading.local()
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES = re.compile(r'\s+')
+
+
+def threshold_ms():
+    """Slow query threshold from settings, None when the log is disabled"""
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+
+
+def query_shape(sql):
+    """SQL with parameter lists, literals and whitespace normalized"""
+    shape = _IN_LIST.sub('(%s, ...)', sql)
+    shape = _STRING.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    return _SPACES.sub(' ', shape).strip()
+
+
+def explain(connection, sql, params):
+    """Query plan of a statement as text, empty if the backend can't explain it"""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return ''
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return '\n'.join(' '.join(str(value) for value in row) for row in cursor.fetchall())
+
+
+def record(connection, sql, params, elapsed_ms, view):
+    """Add one slow execution to its shape, explaining shapes seen for the first time"""
+    from .models import SlowQuery
+
+    shape = query_shape(sql)
+    fingerprint = hashlib.sha1(shape.encode()).hexdigest()
+
+    updated = SlowQuery.objects.filter(fingerprint=fingerprint).update(
+        count=F('count') + 1,
+        total_ms=F('total_ms') + elapsed_ms,
+        max_ms=Greatest('max_ms', elapsed_ms),
+        last_view=view,
+    )
+    if updated:
+        return
+    try:
+        plan = explain(connection, sql, params)
+    except DatabaseError as exc:
+        plan = f'EXPLAIN failed: {exc}'
+    try:
+        sample = connection.ops.last_executed_query(connection.cursor(), sql, params)
+    except Exception:
+        sample = sql
+    SlowQuery.objects.get_or_create(
+        fingerprint=fingerprint,
+        defaults={
+            'shape': shape,
+            'sample_sql': sample,
+            'explain': plan,
+            'view': view,
+            'last_view': view,
+            'count': 1,
+            'total_ms': elapsed_ms,
+            'max_ms': elapsed_ms,
+        },
+    )
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """Database execute wrapper collecting statements slower than the threshold"""
+    limit = threshold_ms()
+    if limit is None or _recording.get():
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms >= limit and not many:
+        metrics = current_request.get()
+        pending = getattr(_local, 'pending', None)
+        if pending is None:
+            pending = _local.pending = []
+        pending.append((
+            context['connection'].alias, sql, params, elapsed_ms,
+            metrics.view if metrics else 'background',
+        ))
+    return result
+
+
+def flush(**kwargs):
+    """
+    Write the slow executions collected by this thread. Runs when a request
+    finishes and at exit; also usable as a `request_finished` receiver.
+    """
+    pending = getattr(_local, 'pending', None)
+    if not pending:
+        return
+    _local.pending = []
+    token = _recording.set(True)
+    try:
+        for alias, sql, params, elapsed_ms, view in pending:
+            try:
+                # Savepoint, so a failed write can't break an open transaction
+                with transaction.atomic(using=alias):
+                    record(connections[alias], sql, params, elapsed_ms, view)
+            except DatabaseError:
+                logger.exception('Could not record slow query')
+    finally:
+        _recording.reset(token)
+
+
+atexit.register(flush)
+
+
+def install(sender, connection, **kwargs):
+    """`connection_created` receiver adding the wrapper to new connections"""
+    if threshold_ms() is not None and log_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_queries)
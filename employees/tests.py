@@ -1,3 +1,1477 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time as time_module
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from itertools import count
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Sum
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from . import simulation
+from .archive import archive_history, horizon
+from .benchmarks import percentile
+from .analytics import rebuild_monthly_summaries
+from .earnings import earnings_ytd, rebuild_earnings_ytd
+from .metrics import RequestMetrics, current_request, registry
+from .payroll import PayrollPlan, mark_payroll_dirty, paid_leave_days, process_payroll, recompute_dirty_payroll
+from .payslips import _cache_key
+from .reconcile import AUTO_CLOCK_OUT, MISSING_CLOCK_OUT, reconcile_day
+from .salaries import _restitch, month_salaries, record_salaries, salaries_as_of
+from .serializers import EmployeeSerializer
+from .shifts import ShiftRule, invalidate_shifts, shift_table
+from .tombstones import prune_tombstones
+from .models import (
+    User, Employee, Attendance, AttendanceArchive, AttendanceMonthlySummary, DepartmentShift, EarningsYTD, Leave,
+    Payroll, PayrollAdjustment, PayrollArchive, PayrollPeriod, PayrollRecompute, PayrollRule, SalaryHistory, Shift,
+    Tombstone, WorkSchedule
+)
+
+
+def count_queries(queries):
+    """
+    Number of statements, counting one multi-row bulk INSERT split into
+    batches as a single statement. Batch counts follow the database's
+    parameter limit, not the code, and are not N+1 queries.
+    """
+    total = 0
+    previous_insert = None
+    for query in queries:
+        sql = query['sql']
+        if sql.startswith('INSERT INTO') and '), (' in sql:
+            table = sql.split(' VALUES ')[0]
+            if table == previous_insert:
+                continue
+            previous_insert = table
+        else:
+            previous_insert = None
+        total += 1
+    return total
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTestCase(APITestCase):
+    """
+    Every API action runs with a fixed number of queries.
+
+    Each action is measured twice, once with SMALL and once with LARGE rows
+    per table, and the two counts must both equal the action's budget. A
+    query that runs per row (N+1) breaks the equality; any other change in
+    the query count breaks the budget. On-commit work (live events, rollup
+    and version bumps) is part of the measured request.
+    """
+    SMALL = 10
+    LARGE = 1000
+
+    def setUp(self):
+        simulation._dataset_cache.clear()
+        invalidate_shifts()
+        self.sequence = count(1)
+        self.population = 0
+        self.today = date.today()
+        last_month = self.today.replace(day=1) - timedelta(days=1)
+        self.payroll_month, self.payroll_year = last_month.month, last_month.year
+
+        self.admin = User.objects.create_user('admin', password='password123', role='admin')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.admin).key}')
+
+    def populate(self, size):
+        """Grow every table to `size` rows per employee-related table"""
+        start, self.population = self.population, size
+        employees = Employee.objects.bulk_create([
+            Employee(
+                first_name='Employee', last_name=str(index), email=f'employee{index}@example.com',
+                department=('Engineering', 'Sales', 'HR')[index % 3], position='Staff',
+                salary=Decimal('22000'), join_date=date(2020, 1, 1),
+                status='Pending' if index % 10 == 0 else 'Active',
+            )
+            for index in range(start, size)
+        ])
+        SalaryHistory.objects.bulk_create([
+            SalaryHistory(employee=employee, salary=Decimal('20000'), effective_from=date(2020, 1, 1),
+                          effective_to=date(2023, 1, 1))
+            for employee in employees
+        ] + [
+            SalaryHistory(employee=employee, salary=Decimal('22000'), effective_from=date(2023, 1, 1))
+            for employee in employees
+        ])
+        Attendance.objects.bulk_create([
+            Attendance(employee=employee, date=self.today, status='Present',
+                       clock_in=time(8, 30), clock_out=time(17, 30))
+            for employee in employees
+        ])
+        Leave.objects.bulk_create([
+            Leave(employee=employee, leave_type='Vacation', days=2,
+                  start_date=self.today + timedelta(days=7), end_date=self.today + timedelta(days=8),
+                  status=('Pending', 'Approved')[index % 2])
+            for index, employee in enumerate(employees)
+        ])
+        Payroll.objects.bulk_create([
+            Payroll(employee=employee, month=self.payroll_month, year=self.payroll_year,
+                    basic_salary=Decimal('22000'), allowances=Decimal('2200'),
+                    net_salary=Decimal('24200'), status='Processed')
+            for employee in employees
+        ])
+
+    def make_employee(self, **fields):
+        number = next(self.sequence)
+        values = dict(
+            first_name='Target', last_name=str(number), email=f'target{number}@example.com',
+            department='Engineering', position='Staff', salary=Decimal('22000'),
+            join_date=date(2020, 1, 1), status='Active',
+        )
+        values.update(fields)
+        return Employee.objects.create(**values)
+
+    def make_user(self):
+        number = next(self.sequence)
+        user = User.objects.create_user(f'user{number}', password='password123')
+        return user, Token.objects.create(user=user)
+
+    def assertQueryBudget(self, budget, request, prepare=None):
+        """
+        Run `request(target)` at both data sizes, where `target` is what
+        `prepare()` returned (set up outside the measurement).
+        """
+        counts = []
+        for size in (self.SMALL, self.LARGE):
+            self.populate(size)
+            target = prepare() if prepare else None
+            # Budgets are for a warm process, the shift table is loaded once per change
+            shift_table()
+            with CaptureQueriesContext(connection) as captured:
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = request(target)
+            self.assertLess(response.status_code, 400, getattr(response, 'data', response))
+            counts.append((count_queries(captured.captured_queries), captured.captured_queries))
+
+        (small, small_queries), (large, large_queries) = counts
+        listing = '\n'.join(f"  {query['sql'][:200]}" for query in large_queries)
+        self.assertEqual(
+            small, large,
+            f'Query count grows with data: {small} queries at {self.SMALL} rows, '
+            f'{large} at {self.LARGE} rows\n{listing}'
+        )
+        self.assertEqual(large, budget, f'Expected {budget} queries, got {large}\n{listing}')
+
+
+class EmployeeQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_list(self):
+        self.assertQueryBudget(4, lambda _: self.client.get('/api/employees/?department=Engineering'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(2, lambda employee: self.client.get(f'/api/employees/{employee.id}/'),
+                               prepare=self.make_employee)
+
+    def test_create(self):
+        self.assertQueryBudget(6, lambda number: self.client.post('/api/employees/', {
+            'first_name': 'New', 'last_name': 'Hire', 'email': f'new{number}@example.com',
+            'department': 'Design', 'position': 'Designer', 'salary': '30000',
+            'join_date': '2024-01-01', 'status': 'Active',
+        }, format='json'), prepare=lambda: next(self.sequence))
+
+    def test_bulk_create(self):
+        def prepare():
+            batch = next(self.sequence)
+            return [
+                {'first_name': 'New', 'last_name': str(index), 'email': f'new{batch}-{index}@example.com',
+                 'department': 'Design', 'position': 'Designer', 'salary': '30000', 'join_date': '2024-01-01'}
+                for index in range(self.SMALL)
+            ] + [{'first_name': 'Taken', 'email': 'employee0@example.com'}]
+        self.assertQueryBudget(7, lambda rows: self.client.post(
+            '/api/employees/bulk/', rows, format='json'
+        ), prepare=prepare)
+
+    def test_bulk_update(self):
+        self.assertQueryBudget(14, lambda _: self.client.post('/api/employees/bulk-update/', {
+            'where': {'department': 'Sales'}, 'set': {'raise_percent': '4', 'department': 'Design'},
+        }, format='json'))
+
+    def test_update(self):
+        self.assertQueryBudget(12, lambda employee: self.client.put(f'/api/employees/{employee.id}/', {
+            'first_name': 'Renamed', 'last_name': employee.last_name, 'email': employee.email,
+            'department': 'Sales', 'position': 'Staff', 'salary': '25000',
+            'join_date': '2020-01-01', 'status': 'Active',
+        }, format='json'), prepare=self.make_employee)
+
+    def test_partial_update(self):
+        self.assertQueryBudget(5, lambda employee: self.client.patch(
+            f'/api/employees/{employee.id}/', {'position': 'Lead'}, format='json'
+        ), prepare=self.make_employee)
+
+    def test_destroy(self):
+        def prepare():
+            employee = self.make_employee()
+            Attendance.objects.create(employee=employee, date=self.today, status='Present')
+            return employee
+        self.assertQueryBudget(21, lambda employee: self.client.delete(f'/api/employees/{employee.id}/'),
+                               prepare=prepare)
+
+    def test_stats(self):
+        self.assertQueryBudget(6, lambda _: self.client.get('/api/employees/stats/'))
+
+    def test_pending(self):
+        self.assertQueryBudget(3, lambda _: self.client.get('/api/employees/pending/'))
+
+    def test_activate(self):
+        self.assertQueryBudget(5, lambda employee: self.client.patch(f'/api/employees/{employee.id}/activate/'),
+                               prepare=lambda: self.make_employee(status='Pending'))
+
+    def test_salary_history(self):
+        self.assertQueryBudget(3, lambda employee: self.client.get(f'/api/employees/{employee.id}/salary-history/'),
+                               prepare=self.make_employee)
+
+    def test_record_salary(self):
+        self.assertQueryBudget(10, lambda employee: self.client.post(f'/api/employees/{employee.id}/salary-history/', {
+            'salary': '24000', 'effective_from': str(self.today.replace(day=1) - timedelta(days=40)),
+        }, format='json'), prepare=self.make_employee)
+
+
+class AttendanceQueryBudgetTests(QueryBudgetTestCase):
+
+    def make_attendance(self):
+        return Attendance.objects.create(
+            employee=self.make_employee(), date=self.today - timedelta(days=1),
+            status='Present', clock_in=time(9), clock_out=time(17),
+        )
+
+    def test_list(self):
+        start, end = self.today - timedelta(days=7), self.today
+        self.assertQueryBudget(4, lambda _: self.client.get(f'/api/attendance/?start_date={start}&end_date={end}'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(2, lambda attendance: self.client.get(f'/api/attendance/{attendance.id}/'),
+                               prepare=self.make_attendance)
+
+    def test_create(self):
+        self.assertQueryBudget(11, lambda employee: self.client.post('/api/attendance/', {
+            'employee': employee.id, 'date': str(self.today), 'status': 'Present',
+            'clock_in': '08:00', 'clock_out': '17:00',
+        }, format='json'), prepare=self.make_employee)
+
+    def test_update(self):
+        self.assertQueryBudget(11, lambda attendance: self.client.put(f'/api/attendance/{attendance.id}/', {
+            'employee': attendance.employee_id, 'date': str(attendance.date), 'status': 'Late',
+            'clock_in': '09:30', 'clock_out': '18:00',
+        }, format='json'), prepare=self.make_attendance)
+
+    def test_partial_update(self):
+        self.assertQueryBudget(9, lambda attendance: self.client.patch(
+            f'/api/attendance/{attendance.id}/', {'status': 'Late'}, format='json'
+        ), prepare=self.make_attendance)
+
+    def test_destroy(self):
+        self.assertQueryBudget(10, lambda attendance: self.client.delete(f'/api/attendance/{attendance.id}/'),
+                               prepare=self.make_attendance)
+
+    def test_clock_in(self):
+        self.assertQueryBudget(13, lambda employee: self.client.post('/api/attendance/clock/', {
+            'employee_id': employee.id, 'clock_type': 'in',
+        }, format='json'), prepare=self.make_employee)
+
+    def test_clock_in_on_shift(self):
+        def prepare():
+            shift = Shift.objects.create(name=f'Early {next(self.sequence)}', start_time=time(6), grace_minutes=10)
+            DepartmentShift.objects.update_or_create(department='Sales', defaults={'shift': shift})
+            return self.make_employee(shift=shift)
+        # Same statements as without shifts: the rule comes from the in-process table
+        self.assertQueryBudget(13, lambda employee: self.client.post('/api/attendance/clock/', {
+            'employee_id': employee.id, 'clock_type': 'in',
+        }, format='json'), prepare=prepare)
+
+    def test_clock_out(self):
+        def prepare():
+            employee = self.make_employee()
+            Attendance.objects.create(employee=employee, date=self.today, status='Present', clock_in=time(8))
+            return employee
+        self.assertQueryBudget(11, lambda employee: self.client.post('/api/attendance/clock/', {
+            'employee_id': employee.id, 'clock_type': 'out',
+        }, format='json'), prepare=prepare)
+
+    def make_punches(self):
+        """An offline backlog: clock in and out of yesterday for a few employees"""
+        yesterday = self.today - timedelta(days=1)
+        punches = []
+        for _ in range(3):
+            employee = self.make_employee()
+            for clock_type, hour in (('in', 8), ('out', 17)):
+                punches.append({
+                    'key': f'kiosk-{next(self.sequence)}', 'employee_id': employee.id,
+                    'clock_type': clock_type, 'timestamp': f'{yesterday}T{hour:02}:00:00Z',
+                })
+        return {'device': 'lobby', 'punches': punches}
+
+    def test_punches(self):
+        self.assertQueryBudget(14, lambda batch: self.client.post(
+            '/api/attendance/punches/', batch, format='json'
+        ), prepare=self.make_punches)
+
+    def test_punches_replay(self):
+        def prepare():
+            batch = self.make_punches()
+            self.client.post('/api/attendance/punches/', batch, format='json')
+            return batch
+        self.assertQueryBudget(4, lambda batch: self.client.post(
+            '/api/attendance/punches/', batch, format='json'
+        ), prepare=prepare)
+
+    def test_import(self):
+        def prepare():
+            rows = ['email,date,clock_in,clock_out']
+            for index in range(self.SMALL):
+                rows.append(f'employee{index}@example.com,{self.today},09:15,17:00')
+                rows.append(f'employee{index}@example.com,{self.today - timedelta(days=1)},08:45,17:00')
+            return SimpleUploadedFile('punches.csv', '\n'.join(rows).encode(), content_type='text/csv')
+        self.assertQueryBudget(12, lambda upload: self.client.post(
+            '/api/attendance/import/', {'file': upload}, format='multipart'
+        ), prepare=prepare)
+
+    def test_today(self):
+        self.assertQueryBudget(3, lambda _: self.client.get('/api/attendance/today/'))
+
+    def test_stats(self):
+        self.assertQueryBudget(5, lambda _: self.client.get('/api/attendance/stats/'))
+
+
+class LeaveQueryBudgetTests(QueryBudgetTestCase):
+
+    def make_leave(self, status='Pending'):
+        return Leave.objects.create(
+            employee=self.make_employee(), leave_type='Sick Leave', status=status,
+            start_date=self.today, end_date=self.today + timedelta(days=1),
+        )
+
+    def test_list(self):
+        self.assertQueryBudget(4, lambda _: self.client.get('/api/leaves/?status=Approved'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(2, lambda leave: self.client.get(f'/api/leaves/{leave.id}/'),
+                               prepare=self.make_leave)
+
+    def test_create(self):
+        self.assertQueryBudget(4, lambda employee: self.client.post('/api/leaves/', {
+            'employee': employee.id, 'leave_type': 'Personal', 'days': 1,
+            'start_date': str(self.today), 'end_date': str(self.today), 'reason': 'Errand',
+        }, format='json'), prepare=self.make_employee)
+
+    def test_update(self):
+        self.assertQueryBudget(5, lambda leave: self.client.put(f'/api/leaves/{leave.id}/', {
+            'employee': leave.employee_id, 'leave_type': 'Vacation', 'days': 2,
+            'start_date': str(leave.start_date), 'end_date': str(leave.end_date), 'status': 'Pending',
+        }, format='json'), prepare=self.make_leave)
+
+    def test_partial_update(self):
+        self.assertQueryBudget(4, lambda leave: self.client.patch(
+            f'/api/leaves/{leave.id}/', {'reason': 'Updated'}, format='json'
+        ), prepare=self.make_leave)
+
+    def test_destroy(self):
+        self.assertQueryBudget(5, lambda leave: self.client.delete(f'/api/leaves/{leave.id}/'),
+                               prepare=self.make_leave)
+
+    def test_approve(self):
+        self.assertQueryBudget(5, lambda leave: self.client.patch(f'/api/leaves/{leave.id}/approve/'),
+                               prepare=self.make_leave)
+
+    def test_reject(self):
+        self.assertQueryBudget(4, lambda leave: self.client.patch(f'/api/leaves/{leave.id}/reject/'),
+                               prepare=self.make_leave)
+
+    def test_pending(self):
+        self.assertQueryBudget(3, lambda _: self.client.get('/api/leaves/pending/'))
+
+    def test_stats(self):
+        self.assertQueryBudget(6, lambda _: self.client.get('/api/leaves/stats/'))
+
+
+class PayrollQueryBudgetTests(QueryBudgetTestCase):
+
+    def make_payroll(self):
+        return Payroll.objects.create(
+            employee=self.make_employee(), month=self.payroll_month, year=self.payroll_year,
+            basic_salary=Decimal('22000'), status='Processed',
+        )
+
+    def period(self):
+        return f'month={self.payroll_month}&year={self.payroll_year}'
+
+    def test_list(self):
+        self.assertQueryBudget(4, lambda _: self.client.get(f'/api/payroll/?{self.period()}'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(2, lambda payroll: self.client.get(f'/api/payroll/{payroll.id}/'),
+                               prepare=self.make_payroll)
+
+    def test_create(self):
+        self.assertQueryBudget(9, lambda employee: self.client.post('/api/payroll/', {
+            'employee': employee.id, 'month': self.payroll_month, 'year': self.payroll_year,
+            'basic_salary': '22000', 'allowances': '100', 'overtime': '0', 'deductions': '0',
+        }, format='json'), prepare=self.make_employee)
+
+    def test_update(self):
+        self.assertQueryBudget(9, lambda payroll: self.client.put(f'/api/payroll/{payroll.id}/', {
+            'employee': payroll.employee_id, 'month': payroll.month, 'year': payroll.year,
+            'basic_salary': '23000', 'allowances': '0', 'overtime': '0', 'deductions': '0',
+            'status': 'Processed',
+        }, format='json'), prepare=self.make_payroll)
+
+    def test_partial_update(self):
+        self.assertQueryBudget(4, lambda payroll: self.client.patch(
+            f'/api/payroll/{payroll.id}/', {'status': 'Paid'}, format='json'
+        ), prepare=self.make_payroll)
+
+    def test_destroy(self):
+        self.assertQueryBudget(8, lambda payroll: self.client.delete(f'/api/payroll/{payroll.id}/'),
+                               prepare=self.make_payroll)
+
+    def test_process(self):
+        # The month of the populated leaves, which adds the paid leave queries
+        month = self.today + timedelta(days=7)
+
+        def prepare():
+            Payroll.objects.filter(month=month.month, year=month.year).delete()
+        self.assertQueryBudget(15, lambda _: self.client.post('/api/payroll/process/', {
+            'month': month.month, 'year': month.year,
+        }, format='json'), prepare=prepare)
+
+    def test_recompute(self):
+        def prepare():
+            payroll = self.make_payroll()
+            PayrollRecompute.objects.create(employee=payroll.employee, month=payroll.month, year=payroll.year)
+        self.assertQueryBudget(16, lambda _: self.client.post('/api/payroll/recompute/'), prepare=prepare)
+
+    def test_transition(self):
+        self.assertQueryBudget(6, lambda _: self.client.post('/api/payroll/transition/', {
+            'status': 'Paid', 'month': self.payroll_month, 'year': self.payroll_year,
+        }, format='json'))
+
+    def test_simulate(self):
+        self.assertQueryBudget(7, lambda _: self.client.post('/api/payroll/simulate/', {
+            'month': self.payroll_month, 'year': self.payroll_year,
+            'scenario': {'allowance_rate': 0.12},
+        }, format='json'), prepare=simulation._dataset_cache.clear)
+
+    def test_payslip(self):
+        self.assertQueryBudget(3, lambda payroll: self.client.get(f'/api/payroll/{payroll.id}/payslip/'),
+                               prepare=self.make_payroll)
+
+    def test_payslips(self):
+        def request(_):
+            response = self.client.get(f'/api/payroll/payslips/?{self.period()}&department=Sales')
+            # Rows are read while the body streams
+            b''.join(response.streaming_content)
+            return response
+        self.assertQueryBudget(3, request)
+
+    def test_stats(self):
+        self.assertQueryBudget(5, lambda _: self.client.get(f'/api/payroll/stats/?{self.period()}'))
+
+
+class PayrollRuleQueryBudgetTests(QueryBudgetTestCase):
+
+    def make_rule(self):
+        return PayrollRule.objects.create(name='Meal', kind='earning', basis='fixed', amount=Decimal('50'))
+
+    def test_list(self):
+        self.assertQueryBudget(3, lambda _: self.client.get('/api/payroll-rules/'))
+
+    def test_create(self):
+        self.assertQueryBudget(2, lambda _: self.client.post('/api/payroll-rules/', {
+            'name': 'Transport', 'kind': 'earning', 'basis': 'fixed', 'amount': '25',
+        }, format='json'))
+
+    def test_partial_update(self):
+        self.assertQueryBudget(3, lambda rule: self.client.patch(
+            f'/api/payroll-rules/{rule.id}/', {'is_active': False}, format='json'
+        ), prepare=self.make_rule)
+
+    def test_destroy(self):
+        self.assertQueryBudget(3, lambda rule: self.client.delete(f'/api/payroll-rules/{rule.id}/'),
+                               prepare=self.make_rule)
+
+
+class ShiftQueryBudgetTests(QueryBudgetTestCase):
+
+    def make_shift(self):
+        return Shift.objects.create(name=f'Night {next(self.sequence)}', start_time=time(22), standard_hours=Decimal('7.5'))
+
+    def test_list(self):
+        self.make_shift()
+        self.assertQueryBudget(4, lambda _: self.client.get('/api/shifts/'))
+
+    def test_assign(self):
+        def prepare():
+            return self.make_shift(), list(Employee.objects.values_list('id', flat=True)[:50])
+        self.assertQueryBudget(21, lambda target: self.client.post(f'/api/shifts/{target[0].id}/assign/', {
+            'departments': ['Sales', 'HR'], 'employees': target[1],
+        }, format='json'), prepare=prepare)
+
+
+class AuthQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_register(self):
+        def request(number):
+            return self.client.post('/api/auth/register/', {
+                'username': f'newuser{number}', 'email': f'newuser{number}@example.com',
+                'password': 'password123', 'password_confirm': 'password123',
+                'first_name': 'New', 'last_name': 'User',
+            }, format='json')
+        self.assertQueryBudget(12, request, prepare=lambda: next(self.sequence))
+
+    def test_login(self):
+        self.assertQueryBudget(3, lambda user: self.client.post('/api/auth/login/', {
+            'username': user.username, 'password': 'password123',
+        }, format='json'), prepare=lambda: self.make_user()[0])
+
+    def test_logout(self):
+        def request(token):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+            return client.post('/api/auth/logout/')
+        self.assertQueryBudget(2, request, prepare=lambda: self.make_user()[1])
+
+    def test_current_user(self):
+        self.assertQueryBudget(1, lambda _: self.client.get('/api/auth/user/'))
+
+    def test_change_password(self):
+        def request(token):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+            return client.post('/api/auth/change-password/', {
+                'old_password': 'password123', 'new_password': 'password456',
+                'new_password_confirm': 'password456',
+            }, format='json')
+        self.assertQueryBudget(2, request, prepare=lambda: self.make_user()[1])
+
+
+class AdminChangelistQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin.is_staff = self.admin.is_superuser = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+
+    def test_attendance(self):
+        self.assertQueryBudget(4, lambda _: self.client.get('/admin/employees/attendance/?status__exact=Present'))
+
+    def test_leave(self):
+        self.assertQueryBudget(5, lambda _: self.client.get('/admin/employees/leave/'))
+
+    def test_payroll(self):
+        self.assertQueryBudget(6, lambda _: self.client.get('/admin/employees/payroll/'))
+
+
+class BehaviorTestCase(APITestCase):
+    """Outcomes of payroll, attendance and archive logic, not query counts"""
+
+    def setUp(self):
+        invalidate_shifts()
+        self.sequence = count(1)
+        self.admin = User.objects.create_user('admin', password='password123', role='admin')
+        self.client.force_authenticate(self.admin)
+
+    def make_employee(self, **fields):
+        number = next(self.sequence)
+        values = dict(
+            first_name='Target', last_name=str(number), email=f'target{number}@example.com',
+            department='Engineering', position='Staff', salary=Decimal('22000'),
+            join_date=date(2020, 1, 1), status='Active',
+        )
+        values.update(fields)
+        return Employee.objects.create(**values)
+
+    def make_payroll(self, employee, month, year, status='Processed', **amounts):
+        values = dict(basic_salary=Decimal('22000'), net_salary=Decimal('22000'))
+        values.update(amounts)
+        return Payroll.objects.create(employee=employee, month=month, year=year, status=status, **values)
+
+    def attend(self, employee, days, status='Present', clock_in=None, clock_out=None):
+        Attendance.objects.bulk_create([
+            Attendance(employee=employee, date=day, status=status, clock_in=clock_in, clock_out=clock_out)
+            for day in days
+        ])
+
+
+class PayrollPlanTests(SimpleTestCase):
+
+    def plan(self, *rules, working_days=20):
+        return PayrollPlan([
+            PayrollRule(name=f'Rule {index}', kind=kind, basis=basis, amount=Decimal(str(amount)), **scope)
+            for index, (kind, basis, amount, scope) in enumerate(rules)
+        ], working_days=working_days)
+
+    def test_each_rule_kind_and_basis(self):
+        # salary 20000, 18 of 20 days present, 10 overtime hours
+        cases = [
+            (('earning', 'fixed', 500), ('500.00', '0.00', '0.00')),
+            (('earning', 'percent_of_salary', 10), ('2000.00', '0.00', '0.00')),
+            (('earning', 'per_overtime_hour', 25), ('0.00', '250.00', '0.00')),
+            (('earning', 'per_absent_day', 0.5), ('0.00', '0.00', '-1000.00')),
+            (('deduction', 'fixed', 300), ('0.00', '0.00', '300.00')),
+            (('deduction', 'percent_of_salary', 5), ('0.00', '0.00', '1000.00')),
+            (('deduction', 'per_overtime_hour', 5), ('0.00', '-50.00', '0.00')),
+            (('deduction', 'per_absent_day', 1), ('0.00', '0.00', '2000.00')),
+        ]
+        for rule, expected in cases:
+            with self.subTest(rule=rule):
+                plan = self.plan((*rule, {}))
+                self.assertEqual(
+                    plan.evaluate(Decimal('20000'), 'Sales', 'Staff', 18, 10), tuple(map(Decimal, expected))
+                )
+
+    def test_rules_sum_within_scope(self):
+        plan = self.plan(
+            ('earning', 'fixed', 100, {}),
+            ('earning', 'fixed', 200, {'department': 'Sales'}),
+            ('earning', 'fixed', 400, {'position': 'Manager'}),
+            ('earning', 'fixed', 800, {'department': 'Sales', 'position': 'Manager'}),
+            ('earning', 'fixed', 1600, {'department': 'Engineering', 'position': 'Staff'}),
+        )
+        allowances = {
+            (department, position): plan.evaluate(Decimal('20000'), department, position, 20, 0)[0]
+            for department in ('Sales', 'Engineering', 'Design') for position in ('Manager', 'Staff')
+        }
+        self.assertEqual(allowances, {
+            ('Sales', 'Manager'): Decimal('1500.00'),
+            ('Sales', 'Staff'): Decimal('300.00'),
+            ('Engineering', 'Manager'): Decimal('500.00'),
+            ('Engineering', 'Staff'): Decimal('1700.00'),
+            ('Design', 'Manager'): Decimal('500.00'),
+            ('Design', 'Staff'): Decimal('100.00'),
+        })
+
+    def test_absence_is_never_negative(self):
+        plan = self.plan(('deduction', 'per_absent_day', 1, {}))
+        self.assertEqual(plan.evaluate(Decimal('20000'), 'Sales', 'Staff', 23, 0)[2], Decimal('0.00'))
+        self.assertEqual(plan.evaluate(Decimal('20000'), 'Sales', 'Staff', 0, 0)[2], Decimal('20000.00'))
+
+    def test_no_rules(self):
+        self.assertEqual(
+            self.plan().evaluate(Decimal('20000'), 'Sales', 'Staff', 10, 5), (Decimal('0.00'),) * 3
+        )
+
+
+class ArchiveTests(BehaviorTestCase):
+
+    def test_attendance_stays_hot_with_recomputable_payroll(self):
+        year = horizon().year - 1
+        PayrollRule.objects.create(name='Absence', kind='deduction', basis='per_absent_day', amount=1)
+        paid, processed = self.make_employee(), self.make_employee()
+        for employee, status in ((paid, 'Paid'), (processed, 'Processed')):
+            self.make_payroll(employee, 1, year, status=status)
+            self.attend(employee, [date(year, 1, day) for day in range(1, 23)])
+
+        result = archive_history()
+
+        self.assertEqual((result['payroll'], result['attendance']), (1, 22))
+        self.assertFalse(Attendance.objects.filter(employee=paid).exists())
+        self.assertEqual(AttendanceArchive.objects.filter(employee=paid).count(), 22)
+        self.assertEqual(Attendance.objects.filter(employee=processed).count(), 22)
+
+        # Recomputing the hot row still sees a full month of attendance
+        mark_payroll_dirty({(processed.id, 1, year)})
+        recompute_dirty_payroll()
+        self.assertEqual(Payroll.objects.get(employee=processed).deductions, 0)
+
+
+    def test_rebuilt_summaries_keep_archived_months(self):
+        year = horizon().year - 1
+        paid, processed = self.make_employee(), self.make_employee()
+        for employee, status in ((paid, 'Paid'), (processed, 'Processed')):
+            self.make_payroll(employee, 1, year, status=status)
+            self.attend(employee, [date(year, 1, day) for day in range(1, 21)])
+        self.attend(paid, [date(year + 1, 1, day) for day in range(1, 6)])
+        archive_history()
+        self.assertTrue(AttendanceArchive.objects.exists())
+
+        rebuild_monthly_summaries()
+
+        self.assertEqual(
+            set(AttendanceMonthlySummary.objects.values_list('employee_id', 'period', 'present_days', 'department')),
+            {(paid.id, date(year, 1, 1), 20, 'Engineering'), (processed.id, date(year, 1, 1), 20, 'Engineering'),
+             (paid.id, date(year + 1, 1, 1), 5, 'Engineering')},
+        )
+
+class PaidLeaveTests(BehaviorTestCase):
+    """Paid leave counts as present on scheduled work days only"""
+    START, END = date(2021, 3, 1), date(2021, 3, 31)
+
+    def setUp(self):
+        super().setUp()
+        self.employee = self.make_employee()
+
+    def leave(self, start, end, leave_type='Vacation', status='Approved'):
+        return Leave.objects.create(employee=self.employee, leave_type=leave_type,
+                                    start_date=start, end_date=end, status=status)
+
+    def leave_days(self):
+        return paid_leave_days([self.employee.id], self.START, self.END)[self.employee.id]
+
+    def test_weekend_days_are_not_counted(self):
+        # Friday to Monday
+        self.leave(date(2021, 3, 5), date(2021, 3, 8))
+        self.assertEqual(self.leave_days(), 2)
+
+    def test_leave_is_clipped_to_the_range(self):
+        self.leave(date(2021, 2, 25), date(2021, 3, 2))
+        self.assertEqual(self.leave_days(), 2)
+
+    def test_days_present_and_overlaps_count_once(self):
+        self.leave(date(2021, 3, 5), date(2021, 3, 8))
+        self.leave(date(2021, 3, 8), date(2021, 3, 9))
+        self.attend(self.employee, [date(2021, 3, 8)])
+        self.assertEqual(self.leave_days(), 2)
+
+    def test_unpaid_and_pending_leave_are_ignored(self):
+        self.leave(date(2021, 3, 1), date(2021, 3, 5), leave_type='Unpaid')
+        self.leave(date(2021, 3, 8), date(2021, 3, 12), status='Pending')
+        self.assertEqual(self.leave_days(), 0)
+
+    def test_work_schedule_overrides_work_week(self):
+        period = PayrollPeriod.objects.create(period_type='first_half', start_date=date(2021, 3, 1),
+                                              end_date=date(2021, 3, 15), month=3, year=2021)
+        WorkSchedule.objects.create(employee=self.employee, payroll_period=period,
+                                    work_days=['2021-03-06', '2021-03-16'])
+        # Saturday 6th is scheduled; Friday 5th and Monday 8th are not, while
+        # Tuesday 16th is outside the schedule's period and follows the week
+        self.leave(date(2021, 3, 5), date(2021, 3, 8))
+        self.leave(date(2021, 3, 16), date(2021, 3, 16))
+        self.assertEqual(self.leave_days(), 2)
+
+    def test_simulation_baseline_matches_processing(self):
+        other = self.make_employee()
+        designer = self.make_employee(department='Design', position='Lead')
+        PayrollRule.objects.create(name='On call', kind='earning', basis='fixed', amount=Decimal('300'),
+                                   department='Engineering')
+        PayrollRule.objects.create(name='Pension', kind='deduction', basis='percent_of_salary',
+                                   amount=Decimal('5'), department='Design', position='Lead')
+        self.attend(self.employee, [date(2021, 3, day) for day in range(1, 11)],
+                    clock_in=time(8), clock_out=time(18))
+        self.attend(other, [date(2021, 3, day) for day in range(1, 21)], status='Late')
+        self.attend(designer, [date(2021, 3, day) for day in range(1, 16)],
+                    clock_in=time(8), clock_out=time(19))
+        self.leave(date(2021, 3, 11), date(2021, 3, 19))
+        rebuild_monthly_summaries()
+
+        result = simulation.simulate(simulation.load_dataset(3, 2021), simulation.PayrollParameters())
+        processed = process_payroll(3, 2021)
+        for name in ('allowances', 'overtime', 'deductions', 'net_salary'):
+            self.assertEqual(result['baseline'][name], float(sum(getattr(row, name) for row in processed)), name)
+        by_department = {row['department']: row['baseline_net'] for row in result['by_department']}
+        self.assertEqual(by_department['Design'], float(Payroll.objects.get(employee=designer).net_salary))
+
+
+class RecomputeTests(BehaviorTestCase):
+    """Attendance corrections after processing reach payroll through the queue"""
+
+    def setUp(self):
+        super().setUp()
+        self.employee = self.make_employee()
+        self.attend(self.employee, [date(2021, 3, day) for day in range(1, 23)])
+        [self.payroll] = process_payroll(3, 2021)
+        # 10% allowance, no absence
+        self.assertEqual((self.payroll.allowances, self.payroll.deductions), (Decimal('2200'), 0))
+
+    def remove_days(self, *days):
+        for day in days:
+            Attendance.objects.get(employee=self.employee, date=date(2021, 3, day)).delete()
+
+    def test_unpaid_row_is_updated_in_place(self):
+        self.remove_days(1, 2)
+        self.assertTrue(PayrollRecompute.objects.filter(employee=self.employee, month=3, year=2021).exists())
+
+        result = recompute_dirty_payroll()
+
+        self.assertEqual((result['recomputed'], result['adjusted'], result['remaining']), (1, 0, 0))
+        self.payroll.refresh_from_db()
+        # Two absent days at 22000 / 22 a day
+        self.assertEqual(self.payroll.deductions, Decimal('2000'))
+        self.assertEqual(self.payroll.net_salary, Decimal('22200'))
+        self.assertFalse(PayrollAdjustment.objects.exists())
+
+    def test_paid_row_gets_adjustments(self):
+        Payroll.objects.filter(pk=self.payroll.pk).update(status='Paid')
+        self.remove_days(1, 2)
+        self.assertEqual(recompute_dirty_payroll()['adjusted'], 1)
+
+        paid = Payroll.objects.get(pk=self.payroll.pk)
+        self.assertEqual((paid.deductions, paid.net_salary), (0, Decimal('24200')))
+        adjustment = PayrollAdjustment.objects.get(payroll=paid)
+        self.assertEqual((adjustment.deductions, adjustment.net_amount), (Decimal('2000'), Decimal('-2000')))
+
+        # A later correction only carries what earlier adjustments did not
+        self.remove_days(3)
+        self.assertEqual(recompute_dirty_payroll()['adjusted'], 1)
+        latest = PayrollAdjustment.objects.filter(payroll=paid).exclude(pk=adjustment.pk).get()
+        self.assertEqual((latest.deductions, latest.net_amount), (Decimal('1000'), Decimal('-1000')))
+
+        # Nothing changed since: no new adjustment
+        mark_payroll_dirty({(self.employee.id, 3, 2021)})
+        self.assertEqual(recompute_dirty_payroll()['unchanged'], 1)
+        self.assertEqual(PayrollAdjustment.objects.filter(payroll=paid).count(), 2)
+
+
+class EarningsYTDTests(BehaviorTestCase):
+
+    def ytd(self, employee, year, month=None):
+        row = earnings_ytd(employee.id, year, month)
+        return row and (row.month, row.payslips, row.net_salary)
+
+    def test_payroll_changes_refresh_the_totals(self):
+        employee = self.make_employee()
+        january = self.make_payroll(employee, 1, 2024, basic_salary=Decimal('1000'))
+        self.make_payroll(employee, 2, 2024, basic_salary=Decimal('2000'))
+        self.assertEqual(self.ytd(employee, 2024, 1), (1, 1, Decimal('1000')))
+        self.assertEqual(self.ytd(employee, 2024), (2, 2, Decimal('3000')))
+
+        january.basic_salary = Decimal('1500')
+        january.save()
+        self.assertEqual(self.ytd(employee, 2024), (2, 2, Decimal('3500')))
+
+        with mock.patch('employees.signals.refresh_earnings_ytd') as refresh:
+            january.status = 'Paid'
+            january.save()
+        refresh.assert_not_called()
+
+        january.delete()
+        self.assertIsNone(self.ytd(employee, 2024, 1))
+        self.assertEqual(self.ytd(employee, 2024), (2, 1, Decimal('2000')))
+
+    def test_processing_and_recompute_refresh_the_totals(self):
+        employee = self.make_employee()
+        self.make_payroll(employee, 2, 2021, basic_salary=Decimal('1000'))
+        self.attend(employee, [date(2021, 3, day) for day in range(1, 23)])
+
+        [payroll] = process_payroll(3, 2021)
+        self.assertEqual(self.ytd(employee, 2021), (3, 2, Decimal('1000') + payroll.net_salary))
+
+        Attendance.objects.get(employee=employee, date=date(2021, 3, 1)).delete()
+        recompute_dirty_payroll()
+        payroll.refresh_from_db()
+        # One absent day at 22000 / 22 a day
+        self.assertEqual(payroll.net_salary, Decimal('23200'))
+        self.assertEqual(self.ytd(employee, 2021), (3, 2, Decimal('24200')))
+
+    def test_rebuild_matches_payroll(self):
+        employees = [self.make_employee() for _ in range(3)]
+        for index, employee in enumerate(employees):
+            for year, month in ((2023, 11), (2024, 1), (2024, 2), (2024, 4)):
+                self.make_payroll(employee, month, year, basic_salary=Decimal(1000 * month + index),
+                                  deductions=Decimal(index))
+        EarningsYTD.objects.all().delete()
+
+        self.assertEqual(rebuild_earnings_ytd(year=2024, batch_size=2), 9)
+        self.assertFalse(EarningsYTD.objects.filter(year=2023).exists())
+        self.assertEqual(rebuild_earnings_ytd(batch_size=2), 12)
+
+        for row in EarningsYTD.objects.all():
+            totals = Payroll.objects.filter(
+                employee_id=row.employee_id, year=row.year, month__lte=row.month
+            ).aggregate(payslips=Count('id'), net_salary=Sum('net_salary'), deductions=Sum('deductions'))
+            self.assertEqual(
+                {'payslips': row.payslips, 'net_salary': row.net_salary, 'deductions': row.deductions}, totals
+            )
+
+
+class ShiftTests(BehaviorTestCase):
+
+    def test_status_wraps_past_midnight(self):
+        cases = [
+            (time(9), 0, time(8, 59), 'Present'),
+            (time(9), 0, time(9), 'Late'),
+            (time(9), 15, time(9, 14), 'Present'),
+            (time(9), 15, time(17), 'Late'),
+            (time(23, 50), 15, time(23, 50), 'Present'),
+            (time(23, 50), 15, time(0, 4), 'Present'),
+            (time(23, 50), 15, time(0, 5), 'Late'),
+            (time(22), 0, time(21, 45), 'Present'),
+            (time(22), 0, time(0, 30), 'Late'),
+        ]
+        for start, grace, clock_in, status in cases:
+            with self.subTest(start=start, grace=grace, clock_in=clock_in):
+                self.assertEqual(ShiftRule(start, grace, 8).status(clock_in), status)
+
+    def overtime_setup(self):
+        """Employees doing 10-hour days this month, with unpaid and paid payroll"""
+        month = date.today().replace(day=1)
+        unpaid, paid = self.make_employee(department='Sales'), self.make_employee(department='Sales')
+        for employee in (unpaid, paid):
+            self.attend(employee, [month, month + timedelta(days=1)], clock_in=time(8), clock_out=time(18))
+        rebuild_monthly_summaries()
+        self.make_payroll(unpaid, 1, 2021)
+        self.make_payroll(paid, 2, 2021, status='Paid')
+        return month, unpaid, paid
+
+    def overtime(self, employee, month):
+        return AttendanceMonthlySummary.objects.get(employee=employee, period=month).overtime_hours
+
+    def queued(self):
+        return set(PayrollRecompute.objects.values_list('employee_id', 'month', 'year'))
+
+    def test_standard_hours_change_reworks_overtime(self):
+        month, unpaid, paid = self.overtime_setup()
+        shift = Shift.objects.create(name='Long', start_time=time(8), standard_hours=8)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/shifts/{shift.id}/assign/', {'departments': ['Sales']}, format='json')
+        # Same standard hours as the default: nothing to redo
+        self.assertEqual(self.queued(), set())
+        self.assertEqual(self.overtime(unpaid, month), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/shifts/{shift.id}/', {'standard_hours': '9.5'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.overtime(unpaid, month), 1)
+        self.assertEqual(self.overtime(paid, month), 1)
+        # Paid payroll keeps the rules it was paid with
+        self.assertEqual(self.queued(), {(unpaid.id, 1, 2021)})
+
+    def test_assignment_changes_rework_overtime(self):
+        month, unpaid, paid = self.overtime_setup()
+        short = Shift.objects.create(name='Short', start_time=time(8), standard_hours=6)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/shifts/{short.id}/assign/', {'departments': ['Sales']}, format='json')
+        self.assertEqual(self.overtime(unpaid, month), 8)
+        self.assertEqual(self.queued(), {(unpaid.id, 1, 2021)})
+
+        PayrollRecompute.objects.all().delete()
+        long = Shift.objects.create(name='Long', start_time=time(8), standard_hours=9)
+        with self.captureOnCommitCallbacks(execute=True):
+            unpaid.shift = long
+            unpaid.save()
+        self.assertEqual(self.overtime(unpaid, month), 2)
+        self.assertEqual(self.overtime(paid, month), 8)
+        self.assertEqual(self.queued(), {(unpaid.id, 1, 2021)})
+
+        # Back to the default 8 hours for the rest of the department
+        with self.captureOnCommitCallbacks(execute=True):
+            DepartmentShift.objects.get(department='Sales').delete()
+        self.assertEqual(self.overtime(paid, month), 4)
+        self.assertEqual(self.overtime(unpaid, month), 2)
+
+    def test_only_admins_change_shifts(self):
+        shift = Shift.objects.create(name='Night', start_time=time(22))
+        user = User.objects.create_user('staff', password='password123', role='employee')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get('/api/shifts/').status_code, 200)
+        self.assertEqual(self.client.post('/api/shifts/', {'name': 'Early', 'start_time': '06:00'}).status_code, 403)
+        self.assertEqual(self.client.patch(f'/api/shifts/{shift.id}/', {'standard_hours': 4}).status_code, 403)
+        self.assertEqual(self.client.delete(f'/api/shifts/{shift.id}/').status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.post('/api/shifts/', {'name': 'Early', 'start_time': '06:00'}).status_code, 201)
+
+
+class PayrollRuleTests(BehaviorTestCase):
+
+    def test_only_admins_change_rules(self):
+        rule = PayrollRule.objects.create(name='Meal', kind='earning', basis='fixed', amount=Decimal('50'))
+        data = {'name': 'Transport', 'kind': 'earning', 'basis': 'fixed', 'amount': '25'}
+        user = User.objects.create_user('staff', password='password123', role='employee')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get('/api/payroll-rules/').status_code, 200)
+        self.assertEqual(self.client.post('/api/payroll-rules/', data).status_code, 403)
+        self.assertEqual(self.client.patch(f'/api/payroll-rules/{rule.id}/', {'amount': '500'}).status_code, 403)
+        self.assertEqual(self.client.delete(f'/api/payroll-rules/{rule.id}/').status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.post('/api/payroll-rules/', data).status_code, 201)
+
+
+class SalaryHistoryTests(BehaviorTestCase):
+
+    def history(self, employee):
+        return list(SalaryHistory.objects.filter(employee=employee).order_by('effective_from').values_list(
+            'effective_from', 'effective_to', 'salary'
+        ))
+
+    def test_salaries_as_of_picks_the_range_in_force(self):
+        employee = self.make_employee()
+        record_salaries({employee.id: Decimal('25000')}, date(2021, 1, 1))
+        record_salaries({employee.id: Decimal('27000')}, date(2022, 6, 1))
+        for day, salary in [
+            (date(2020, 1, 1), Decimal('22000')),
+            (date(2020, 12, 31), Decimal('22000')),
+            (date(2021, 1, 1), Decimal('25000')),
+            (date(2022, 5, 31), Decimal('25000')),
+            (date(2022, 6, 1), Decimal('27000')),
+            (date.today(), Decimal('27000')),
+        ]:
+            with self.subTest(day=day):
+                self.assertEqual(salaries_as_of(day, [employee.id]), {employee.id: salary})
+        # Before joining there is no salary
+        self.assertEqual(salaries_as_of(date(2019, 12, 31), [employee.id]), {})
+        self.assertEqual(month_salaries(5, 2022, [employee.id]), {employee.id: Decimal('25000')})
+
+    def test_ranges_stay_contiguous(self):
+        employee = self.make_employee()
+        # Recorded out of order, then one day replaced
+        record_salaries({employee.id: Decimal('27000')}, date(2022, 6, 1))
+        record_salaries({employee.id: Decimal('25000')}, date(2021, 1, 1))
+        record_salaries({employee.id: Decimal('26000')}, date(2021, 1, 1))
+        self.assertEqual(self.history(employee), [
+            (date(2020, 1, 1), date(2021, 1, 1), Decimal('22000')),
+            (date(2021, 1, 1), date(2022, 6, 1), Decimal('26000')),
+            (date(2022, 6, 1), None, Decimal('27000')),
+        ])
+        employee.refresh_from_db()
+        self.assertEqual(employee.salary, Decimal('27000'))
+
+        # Stale ranges are repaired
+        SalaryHistory.objects.filter(employee=employee).update(effective_to=None)
+        _restitch([employee.id])
+        self.assertEqual([row[1] for row in self.history(employee)], [date(2021, 1, 1), date(2022, 6, 1), None])
+
+    def test_back_dated_salary_reaches_payroll(self):
+        unpaid, paid = self.make_employee(), self.make_employee()
+        for employee in (unpaid, paid):
+            self.attend(employee, [date(2021, 3, day) for day in range(1, 23)])
+        process_payroll(3, 2021)
+        Payroll.objects.filter(employee=paid).update(status='Paid')
+
+        record_salaries({unpaid.id: Decimal('33000'), paid.id: Decimal('33000')}, date(2021, 2, 1), 'Raise')
+        result = recompute_dirty_payroll()
+        self.assertEqual((result['recomputed'], result['adjusted']), (1, 1))
+
+        row = Payroll.objects.get(employee=unpaid)
+        self.assertEqual((row.basic_salary, row.allowances, row.net_salary),
+                         (Decimal('33000'), Decimal('3300'), Decimal('36300')))
+
+        row = Payroll.objects.get(employee=paid)
+        self.assertEqual(row.basic_salary, Decimal('22000'))
+        adjustment = PayrollAdjustment.objects.get(payroll=row)
+        self.assertEqual(
+            (adjustment.basic_salary, adjustment.allowances, adjustment.deductions, adjustment.net_amount),
+            (Decimal('11000'), Decimal('1100'), 0, Decimal('12100')),
+        )
+
+    def test_back_dated_salary_reaches_cached_simulation(self):
+        employee = self.make_employee()
+        self.attend(employee, [date(2021, 3, day) for day in range(1, 23)])
+        before = simulation.get_dataset(3, 2021)
+        self.assertEqual(list(before.salary), [22000])
+
+        record_salaries({employee.id: Decimal('33000')}, date(2021, 2, 1), 'Raise')
+        self.assertEqual(list(simulation.get_dataset(3, 2021).salary), [33000])
+        # The live salary isn't the one of an earlier month
+        self.assertEqual(list(simulation.load_dataset(1, 2021).salary), [22000])
+
+
+class ReconcileTests(BehaviorTestCase):
+    # A Monday
+    DAY = date(2024, 3, 4)
+
+    def reconcile(self, *args):
+        call_command('reconcile_attendance', f'--date={self.DAY}', *args, stdout=StringIO())
+
+    def status_of(self, employee):
+        return Attendance.objects.get(employee=employee, date=self.DAY).status
+
+    def test_missing_rows_are_absent_or_on_leave(self):
+        absent, on_leave, pending, present = (self.make_employee() for _ in range(4))
+        newcomer = self.make_employee(join_date=self.DAY + timedelta(days=1))
+        inactive = self.make_employee(status='Inactive')
+        for employee, status in ((on_leave, 'Approved'), (pending, 'Pending')):
+            Leave.objects.create(employee=employee, leave_type='Vacation', status=status,
+                                 start_date=self.DAY, end_date=self.DAY + timedelta(days=2))
+        self.attend(present, [self.DAY])
+
+        result = reconcile_day(self.DAY)
+
+        self.assertEqual((result['absent'], result['on_leave']), (2, 1))
+        self.assertEqual(self.status_of(absent), 'Absent')
+        self.assertEqual(self.status_of(on_leave), 'On Leave')
+        self.assertEqual(self.status_of(pending), 'Absent')
+        self.assertEqual(self.status_of(present), 'Present')
+        self.assertFalse(Attendance.objects.filter(employee__in=[newcomer, inactive]).exists())
+
+    def test_work_schedule_overrides_workweek(self):
+        saturday = self.DAY + timedelta(days=5)
+        period = PayrollPeriod.objects.create(period_type='first_half', start_date=date(2024, 3, 1),
+                                              end_date=date(2024, 3, 15), month=3, year=2024)
+        weekend_worker, weekday_off, default = (self.make_employee() for _ in range(3))
+        WorkSchedule.objects.create(employee=weekend_worker, payroll_period=period,
+                                    work_days=[saturday.isoformat()])
+        WorkSchedule.objects.create(employee=weekday_off, payroll_period=period,
+                                    work_days=[(self.DAY + timedelta(days=1)).isoformat()])
+
+        reconcile_day(saturday)
+        reconcile_day(self.DAY)
+
+        self.assertEqual(
+            set(Attendance.objects.values_list('employee_id', 'date')),
+            {(weekend_worker.id, saturday), (default.id, self.DAY)},
+        )
+
+    def test_open_punches_are_closed_or_flagged(self):
+        early, late = self.make_employee(), self.make_employee()
+        self.attend(early, [self.DAY], clock_in=time(9))
+        self.attend(late, [self.DAY], clock_in=time(19))
+
+        self.reconcile('--close-at=18:00')
+
+        closed = Attendance.objects.get(employee=early)
+        self.assertEqual((closed.clock_out, closed.notes), (time(18), AUTO_CLOCK_OUT))
+        # Clocked in after the closing time: left open for a manager
+        flagged = Attendance.objects.get(employee=late)
+        self.assertEqual((flagged.clock_out, flagged.notes), (None, MISSING_CLOCK_OUT))
+
+    def test_without_close_at_punches_are_flagged(self):
+        employee = self.make_employee()
+        self.attend(employee, [self.DAY], clock_in=time(9))
+
+        self.reconcile()
+
+        punch = Attendance.objects.get(employee=employee)
+        self.assertEqual((punch.clock_out, punch.notes), (None, MISSING_CLOCK_OUT))
+
+    def test_running_again_changes_nothing(self):
+        self.make_employee()
+        self.attend(self.make_employee(), [self.DAY], clock_in=time(9))
+        reconcile_day(self.DAY)
+        before = list(Attendance.objects.order_by('id').values('status', 'clock_out', 'notes', 'updated_at'))
+
+        result = reconcile_day(self.DAY)
+
+        self.assertEqual(result, {'date': self.DAY, 'absent': 0, 'on_leave': 0, 'closed': 0, 'flagged': 0})
+        self.assertEqual(
+            list(Attendance.objects.order_by('id').values('status', 'clock_out', 'notes', 'updated_at')), before
+        )
+
+    def test_processed_payroll_is_queued(self):
+        absent, closed, unprocessed = (self.make_employee() for _ in range(3))
+        self.attend(closed, [self.DAY], clock_in=time(9))
+        for employee in (absent, closed):
+            self.make_payroll(employee, 3, 2024)
+
+        reconcile_day(self.DAY, close_at=time(18))
+
+        self.assertEqual(
+            set(PayrollRecompute.objects.values_list('employee_id', 'month', 'year')),
+            {(absent.id, 3, 2024), (closed.id, 3, 2024)},
+        )
+
+
+class AttendanceReportTests(BehaviorTestCase):
+
+    def test_empty_group_by_gives_overall_totals(self):
+        for department in ('Sales', 'Design'):
+            employee = self.make_employee(department=department)
+            self.attend(employee, [date(2024, 3, 4), date(2024, 4, 1)])
+            self.attend(employee, [date(2024, 3, 5)], status='Late')
+        rebuild_monthly_summaries()
+
+        data = self.client.get('/api/reports/attendance/', {'group_by': ''}).data
+        self.assertEqual(data['group_by'], [])
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(
+            {key: data['results'][0][key] for key in ('employees', 'present_days', 'late_days', 'lateness_rate')},
+            {'employees': 2, 'present_days': 4, 'late_days': 2, 'lateness_rate': 33.33},
+        )
+        self.assertEqual(len(self.client.get('/api/reports/attendance/').data['results']), 4)
+
+        empty = self.client.get('/api/reports/attendance/', {'group_by': ' , ', 'start': '2030-01'}).data
+        self.assertEqual([row['present_days'] for row in empty['results']], [0])
+
+
+class GenerateDataTests(BehaviorTestCase):
+
+    def generate(self, **options):
+        call_command('generate_data', employees=4, years=0.05, payroll_months=1, stdout=StringIO(), **options)
+
+    def test_clear_empties_every_employee_table(self):
+        self.generate()
+        employee = Employee.objects.first()
+        AttendanceArchive.objects.create(id=10 ** 9, employee_id=employee.id, date=date(2001, 1, 1),
+                                         status='Present', created_at=timezone.now(), updated_at=timezone.now())
+        Attendance.objects.filter(employee=employee).first().delete()
+        self.assertTrue(Tombstone.objects.exists())
+
+        self.generate(clear=True)
+
+        self.assertEqual(Employee.objects.count(), 4)
+        self.assertFalse(AttendanceArchive.objects.exists())
+        self.assertFalse(Tombstone.objects.exists())
+        self.assertFalse(Attendance.objects.exclude(employee__in=Employee.objects.all()).exists())
+        self.assertFalse(SalaryHistory.objects.exclude(employee__in=Employee.objects.all()).exists())
+
+
+class PayslipTests(BehaviorTestCase):
+
+    def test_half_month_period_gives_the_whole_month(self):
+        first, second = (self.make_employee() for _ in range(2))
+        paid = self.make_payroll(first, 3, 2024, status='Paid')
+        self.make_payroll(second, 3, 2024)
+        self.make_payroll(second, 4, 2024)
+        period = PayrollPeriod.objects.create(period_type='second_half', start_date=date(2024, 3, 16),
+                                              end_date=date(2024, 3, 31), month=3, year=2024)
+
+        response = self.client.get('/api/payroll/payslips/', {'period': period.pk})
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertIn('payslips-2024-03', response['Content-Disposition'])
+        self.assertEqual([line['employee']['email'] for line in lines], [first.email, second.email])
+        # Only the paid row is cached, in the payslips cache
+        self.assertIsNotNone(caches['payslips'].get(_cache_key(paid)))
+        self.assertEqual(
+            caches['payslips'].get_many([_cache_key(row) for row in Payroll.objects.exclude(pk=paid.pk)]), {}
+        )
+
+
+    def test_archived_month_includes_rows_left_hot(self):
+        year = horizon().year - 1
+        paid, unpaid, adjusted = (self.make_employee() for _ in range(3))
+        self.make_payroll(paid, 3, year, status='Paid')
+        self.make_payroll(unpaid, 3, year)
+        adjusted_row = self.make_payroll(adjusted, 3, year, status='Paid')
+        PayrollAdjustment.objects.create(payroll=adjusted_row, deductions=Decimal('100'),
+                                         net_amount=Decimal('-100'), reason='Late correction')
+        archive_history()
+        self.assertEqual(list(PayrollArchive.objects.values_list('employee_id', flat=True)), [paid.id])
+
+        response = self.client.get('/api/payroll/payslips/', {'month': 3, 'year': year})
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual([line['employee']['email'] for line in lines], [paid.email, unpaid.email, adjusted.email])
+        self.assertEqual([len(line['adjustments']) for line in lines], [0, 0, 1])
+
+    def test_cached_payslip_follows_employee_and_adjustments(self):
+        employee = self.make_employee(department='Sales')
+        payroll = self.make_payroll(employee, 3, 2024, status='Paid')
+        self.assertEqual(self.client.get(f'/api/payroll/{payroll.id}/payslip/').data['employee']['department'],
+                         'Sales')
+
+        employee.department = 'Design'
+        employee.save()
+        PayrollAdjustment.objects.create(payroll=payroll, deductions=Decimal('100'),
+                                         net_amount=Decimal('-100'), reason='Late correction')
+
+        data = self.client.get(f'/api/payroll/{payroll.id}/payslip/').data
+        self.assertEqual(data['employee']['department'], 'Design')
+        self.assertEqual([(row['net_amount'], row['reason']) for row in data['adjustments']],
+                         [(-100.0, 'Late correction')])
+
+
+class ImportTests(BehaviorTestCase):
+
+    def upload(self, text, encoding='utf-8'):
+        return SimpleUploadedFile('upload.csv', text.encode(encoding), content_type='text/csv')
+
+    def test_attendance_import_rejects_non_utf8_lines(self):
+        employee = self.make_employee(email='ana@example.com')
+        text = 'email,date,notes\nana@example.com,2024-03-04,ok\nana@example.com,2024-03-05,caf\u00e9\n'
+        response = self.client.post(
+            '/api/attendance/import/', {'file': self.upload(text, 'latin-1')}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['failed'], 1)
+        self.assertEqual(response.data['errors'][0]['line'], 3)
+        self.assertEqual(
+            list(Attendance.objects.filter(employee=employee).values_list('date', flat=True)),
+            [date(2024, 3, 4)],
+        )
+
+        response = self.client.post(
+            '/api/attendance/import/', {'file': self.upload('\u00e9mail,date\n', 'latin-1')},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], [{'line': 1, 'error': 'not UTF-8 text'}])
+
+    def test_bulk_create_rejects_non_utf8_csv(self):
+        text = (
+            'first_name,last_name,email,department,position,salary,join_date\n'
+            'Jos\u00e9,Ruiz,jose@example.com,Design,Designer,30000,2024-01-01\n'
+        )
+        response = self.client.post(
+            '/api/employees/bulk/', {'file': self.upload(text, 'latin-1')}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Employee.objects.exists())
+
+        response = self.client.post(
+            '/api/employees/bulk/', {'file': self.upload('\ufeff' + text)}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Employee.objects.get().first_name, 'Jos\u00e9')
+
+    def test_bulk_create_streams_csv_up_to_non_utf8_bytes(self):
+        header = 'first_name,last_name,email,department,position,salary,join_date\n'
+        good = 'Ana,Ruiz,ana@example.com,Design,Designer,30000,2024-01-01\n'.encode()
+        bad = 'Jos\u00e9,Ruiz,jose@example.com,Design,Designer,30000,2024-01-01\n'.encode('latin-1')
+        upload = SimpleUploadedFile('upload.csv', header.encode() + good + bad + good, content_type='text/csv')
+        response = self.client.post('/api/employees/bulk/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 1))
+        self.assertEqual(response.data['results'][1]['row'], 2)
+        self.assertIn('file', response.data['results'][1]['errors'])
+        self.assertEqual(list(Employee.objects.values_list('email', flat=True)), ['ana@example.com'])
+
+
+class SyncTests(BehaviorTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.employee = self.make_employee(user=self.admin)
+        self.attend(self.employee, [date(2024, 3, 4), date(2024, 3, 5)])
+        self.kept, deleted = Attendance.objects.filter(employee=self.employee).order_by('date')
+        self.deleted_id = deleted.pk
+        deleted.delete()
+
+    def sync(self, since):
+        # A naive cursor is read as UTC
+        return self.client.get('/api/sync/', {'since': since.strftime('%Y-%m-%dT%H:%M:%S')}).data
+
+    def test_deletions_within_retention(self):
+        data = self.sync(timezone.now() - timedelta(hours=1))
+        self.assertFalse(data['full'])
+        self.assertEqual(data['attendance']['deleted'], [self.deleted_id])
+
+    def test_old_cursor_gets_a_full_sync_after_pruning(self):
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=91))
+        self.assertEqual(prune_tombstones(), 1)
+        self.assertFalse(Tombstone.objects.exists())
+
+        data = self.sync(timezone.now() - timedelta(days=92))
+        self.assertTrue(data['full'])
+        self.assertEqual([row['id'] for row in data['attendance']['changed']], [self.kept.pk])
+
+        # Recent cursors still get deltas
+        self.assertFalse(self.sync(timezone.now() - timedelta(days=89))['full'])
+
+
+class MetricsTests(BehaviorTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def test_request_is_recorded_without_patching_serializers(self):
+        self.make_employee()
+        self.assertEqual(self.client.get('/api/employees/').status_code, 200)
+
+        text = registry.render()
+        labels = 'view="EmployeeViewSet.list",method="GET"'
+        self.assertIn(f'http_requests_total{{{labels},status="200"}} 1', text)
+        self.assertIn(f'http_request_serializer_seconds_count{{{labels}}} 1', text)
+        # DRF's own classes are left alone, only the app's serializers are timed
+        self.assertEqual(serializers.Serializer.data.fget.__module__, 'rest_framework.serializers')
+        self.assertEqual(serializers.ListSerializer.data.fget.__module__, 'rest_framework.serializers')
+
+    def test_serializer_data_is_timed(self):
+        employees = [self.make_employee() for _ in range(3)]
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        try:
+            with mock.patch('employees.metrics.time.perf_counter', side_effect=[1.0, 1.25, 2.0, 2.5]):
+                self.assertEqual(len(EmployeeSerializer(employees, many=True).data), 3)
+                self.assertEqual(EmployeeSerializer(employees[0]).data['id'], employees[0].id)
+        finally:
+            current_request.reset(token)
+        self.assertEqual(metrics.serializer_seconds, 0.75)
+
+
+class PercentileTests(SimpleTestCase):
+
+    def test_nearest_rank(self):
+        samples = list(range(10, 0, -1))
+        self.assertEqual(
+            [percentile(samples, fraction) for fraction in (0, 0.1, 0.5, 0.9, 0.95, 1)], [1, 1, 5, 9, 10, 10]
+        )
+        self.assertEqual(percentile([7], 0.99), 7)
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    """hr_nexus.sqlite_wal against a database file of its own"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'backend.sqlite3')
+
+    def handler(self, aliases=('default',), **options):
+        handler = ConnectionHandler({
+            alias: {'ENGINE': 'hr_nexus.sqlite_wal', 'NAME': self.path, 'OPTIONS': {'timeout': 5, **options}}
+            for alias in aliases
+        })
+        self.addCleanup(handler.close_all)
+        # transaction.atomic(using=...) looks the alias up in this handler
+        patcher = mock.patch('django.db.transaction.connections', handler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with handler['default'].cursor() as cursor:
+            cursor.execute('CREATE TABLE IF NOT EXISTS counter (id INTEGER PRIMARY KEY, value INTEGER)')
+            cursor.execute('INSERT OR IGNORE INTO counter VALUES (1, 0)')
+        return handler
+
+    def journal_mode(self):
+        with open(self.path, 'rb') as handle:
+            # Header bytes 18-19 are 2 for WAL, 1 for the rollback journal
+            return handle.read(20)[18:20]
+
+    def test_wal_is_opt_in(self):
+        self.handler().close_all()
+        self.assertEqual(self.journal_mode(), b'\x01\x01')
+        self.handler(wal=True).close_all()
+        self.assertEqual(self.journal_mode(), b'\x02\x02')
+
+    def test_concurrent_writers(self):
+        handler = self.handler(wal=True)
+        threads, increments = 8, 25
+        errors = []
+        barrier = threading.Barrier(threads)
+
+        def work():
+            try:
+                barrier.wait()
+                for _ in range(increments):
+                    # Read then write: deadlocks on a deferred BEGIN
+                    with transaction.atomic(using='default'), handler['default'].cursor() as cursor:
+                        cursor.execute('SELECT value FROM counter WHERE id = 1')
+                        value = cursor.fetchone()[0]
+                        cursor.execute('UPDATE counter SET value = %s WHERE id = 1', [value + 1])
+            except DatabaseError as error:
+                errors.append(error)
+            finally:
+                handler.close_all()
+
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+        with handler['default'].cursor() as cursor:
+            cursor.execute('SELECT value FROM counter WHERE id = 1')
+            self.assertEqual(cursor.fetchone()[0], threads * increments)
+
+    def test_nested_aliases_of_one_file(self):
+        for options in ({}, {'wal': True}):
+            with self.subTest(**options):
+                handler = self.handler(aliases=('default', 'archive'), **options)
+                started = time_module.perf_counter()
+                with transaction.atomic(using='default'), handler['default'].cursor() as cursor:
+                    cursor.execute('WITH one AS (SELECT 1) UPDATE counter SET value = value + 1')
+                    with transaction.atomic(using='default'):
+                        cursor.execute('UPDATE counter SET value = value + 1')
+                    # A read through the other alias doesn't wait for the write
+                    with handler['archive'].cursor() as other:
+                        other.execute('WITH current AS (SELECT value FROM counter) SELECT value FROM current')
+                        other.fetchone()
+                self.assertLess(time_module.perf_counter() - started, 1)
+                handler.close_all()
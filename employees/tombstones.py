@@ -0,0 +1,27 @@
+"""
+Retention of deletion tombstones.
+
+Deleting attendance, leave or payroll leaves a Tombstone so delta sync
+clients can drop the row. Tombstones are only kept for
+SYNC_TOMBSTONE_DAYS: `manage.py prune_tombstones` deletes older ones, and
+the sync endpoint answers a cursor older than that with a full sync, since
+deletions before it may no longer be on record.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Tombstone
+
+
+def tombstone_horizon(now=None):
+    """Oldest moment whose deletions are still on record"""
+    now = now or timezone.now()
+    return now - timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 90))
+
+
+def prune_tombstones(now=None):
+    """Delete the tombstones past retention, returns how many"""
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=tombstone_horizon(now)).delete()
+    return deleted
@@ -1,10 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import EmployeeViewSet, AttendanceViewSet, LeaveViewSet, PayrollViewSet
+from .views import (
+    EmployeeViewSet, AttendanceViewSet, LeaveViewSet,
+    PayrollViewSet, PayrollRuleViewSet, ShiftViewSet
+)
 from .views_auth import (
     RegisterView, login_view, logout_view, 
     current_user_view, change_password_view
 )
+from .views_metrics import metrics_view
+from .views_reports import attendance_report
+from .views_sync import sync_view
 
 # Create a router and register our viewsets
 router = DefaultRouter()
@@ -12,6 +18,8 @@ router.register(r'employees', EmployeeViewSet, basename='employee')
 router.register(r'attendance', AttendanceViewSet, basename='attendance')
 router.register(r'leaves', LeaveViewSet, basename='leave')
 router.register(r'payroll', PayrollViewSet, basename='payroll')
+router.register(r'payroll-rules', PayrollRuleViewSet, basename='payroll-rule')
+router.register(r'shifts', ShiftViewSet, basename='shift')
 
 # The API URLs are determined automatically by the router
 urlpatterns = [
@@ -22,6 +30,15 @@ urlpatterns = [
     path('auth/user/', current_user_view, name='current-user'),
     path('auth/change-password/', change_password_view, name='change-password'),
     
+    # Delta sync for employee dashboards and offline clients
+    path('sync/', sync_view, name='sync'),
+    
+    # Reporting
+    path('reports/attendance/', attendance_report, name='attendance-report'),
+    
+    # Request metrics for Prometheus (admin only)
+    path('metrics/', metrics_view, name='metrics'),
+    
     # API endpoints
     path('', include(router.urls)),
 ]
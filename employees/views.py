@@ -1,16 +1,64 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.permissions import SAFE_METHODS
+from django.http import Http404, StreamingHttpResponse
 from django.utils import timezone
+from django.db import IntegrityError, transaction
 from django.db.models import Q, Count, Sum
-from datetime import datetime, date, timedelta
-from .models import Employee, Attendance, Leave, Payroll
+from datetime import date
+import codecs
+import queue
+from .archive import Tiered, archived, horizon, payroll_is_archived, reaches_archive
+from .broadcast import attendance_hub, format_sse
+from .imports import import_attendance
+from .kiosk import sync_punches
+from .models import (
+    Employee, Attendance, AttendanceArchive, DepartmentShift, Leave, Payroll, PayrollArchive, PayrollPeriod,
+    PayrollRule, Shift
+)
+from .payslips import payslip, payslip_lines
+from .renderers import EventStreamRenderer, NDJSONRenderer
+from .payroll import TRANSITIONS, process_payroll, recompute_dirty_payroll, transition_payroll
+from .permissions import IsAdminRole, IsAdminRoleOrReadOnly
+from .roster import create_employees, csv_rows, update_employees
+from .routing import reads_from_replica
+from .salaries import record_salaries
+from .shifts import invalidate_shifts, reapply_shifts, shift_rule, shift_table
+from .simulation import PayrollParameters, get_dataset, simulate
+from .versioning import bump_versions, etag_versioned
 from .serializers import (
     EmployeeSerializer, AttendanceSerializer,
-    LeaveSerializer, PayrollSerializer, ClockInOutSerializer
+    LeaveSerializer, PayrollSerializer, PayrollRuleSerializer,
+    ClockInOutSerializer, PunchBatchSerializer, EmployeeBulkUpdateSerializer,
+    PayrollTransitionSerializer, SalaryHistorySerializer, ShiftSerializer, ShiftAssignmentSerializer
 )
 
 
+class ArchivedLookupMixin:
+    """Read-only lookups by id fall back to the archive of `archive_model`"""
+    archive_model = None
+    
+    def include_archived(self):
+        return self.request.query_params.get('include_archived') in ('1', 'true')
+    
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if self.request.method not in SAFE_METHODS:
+                raise
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            obj = archived(self.archive_model).get(pk=int(lookup))
+        except (ValueError, self.archive_model.DoesNotExist):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
 class EmployeeViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Employee CRUD operations
@@ -43,7 +91,13 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    @etag_versioned(Employee)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
     @action(detail=False, methods=['get'])
+    @reads_from_replica
+    @etag_versioned(Employee)
     def stats(self, request):
         """Get employee statistics"""
         total = Employee.objects.count()
@@ -61,12 +115,68 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=False, methods=['get'])
+    @etag_versioned(Employee)
     def pending(self, request):
         """Get all pending employees awaiting admin setup"""
         pending_employees = Employee.objects.filter(status='Pending')
         serializer = self.get_serializer(pending_employees, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['post'], url_path='bulk',
+            parser_classes=[JSONParser, MultiPartParser], permission_classes=[IsAdminRole])
+    def bulk_create(self, request):
+        """
+        Create employees from a JSON list or a CSV sent as the multipart field
+        `file`, with the columns of the create endpoint. Valid rows are
+        created even if others fail, each row is reported. The CSV is
+        decoded line by line as it is read.
+        """
+        upload = request.FILES.get('file')
+        if upload is not None:
+            rows = csv_rows(codecs.iterdecode(upload, 'utf-8-sig'))
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            return Response(
+                {'error': 'Send a JSON list of employees or a CSV file in the "file" field'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        result = create_employees(rows)
+        return Response(
+            result.as_dict(),
+            status=status.HTTP_201_CREATED if result.created else status.HTTP_400_BAD_REQUEST
+        )
+    
+    @action(detail=False, methods=['post'], url_path='bulk-update', permission_classes=[IsAdminRole])
+    def bulk_update(self, request):
+        """Set-based update, e.g. {"where": {"department": "Sales"}, "set": {"raise_percent": 4}}"""
+        serializer = EmployeeBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(
+            update_employees(serializer.validated_data['where'], serializer.validated_data['set']),
+            status=status.HTTP_200_OK
+        )
+    
+    @action(detail=True, methods=['get', 'post'], url_path='salary-history', permission_classes=[IsAdminRole])
+    def salary_history(self, request, pk=None):
+        """
+        List the salary history, or record a salary in force from a day, e.g.
+        {"salary": "25000", "effective_from": "2025-03-01", "reason": "Promotion"}.
+        Back-dated salaries queue the payroll of the months since for recomputation.
+        """
+        employee = self.get_object()
+        if request.method == 'GET':
+            return Response(SalaryHistorySerializer(employee.salary_history.all(), many=True).data)
+        serializer = SalaryHistorySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        record_salaries({employee.pk: data['salary']}, data['effective_from'], reason=data.get('reason', ''))
+        bump_versions(Employee)
+        return Response(
+            SalaryHistorySerializer(employee.salary_history.all(), many=True).data,
+            status=status.HTTP_201_CREATED
+        )
+    
     @action(detail=True, methods=['patch'])
     def activate(self, request, pk=None):
         """Activate an employee after admin completes setup"""
@@ -79,17 +189,28 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         )
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(ArchivedLookupMixin, viewsets.ModelViewSet):
     """
     ViewSet for Attendance CRUD operations
     """
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
+    archive_model = AttendanceArchive
+    stream_keepalive = 15  # seconds between keepalive comments on idle streams
     
     def get_queryset(self):
-        """Filter attendance by date or employee"""
-        queryset = Attendance.objects.select_related('employee').all()
-        
+        """Filter attendance by date or employee, lists include archived years they reach"""
+        queryset = self.filter_records(Attendance.objects.select_related('employee').all())
+        params = self.request.query_params
+        if self.action == 'list' and (
+            self.include_archived()
+            or reaches_archive(params.get('date'), params.get('start_date') if params.get('end_date') else None)
+        ):
+            return Tiered(queryset, self.filter_records(archived(AttendanceArchive)))
+        return queryset
+    
+    def filter_records(self, queryset):
+        """Query string filters, applied to both tiers"""
         # Filter by date
         date_param = self.request.query_params.get('date', None)
         if date_param:
@@ -121,28 +242,35 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         today = date.today()
         now = timezone.now().time()
         
+        # Late after the start of the employee's shift, from the in-process shift table
+        clock_in_status = shift_rule(employee.id, employee.department).status(now)
+        
         # Get or create attendance record for today
         attendance, created = Attendance.objects.get_or_create(
             employee=employee,
             date=today,
             defaults={
-                'status': 'Present',
+                'status': clock_in_status if clock_type == 'in' else 'Present',
                 'clock_in': now if clock_type == 'in' else None
             }
         )
+        attendance.employee = employee
         
         if clock_type == 'in':
-            if not created and attendance.clock_in:
+            if created:
+                # Already saved with the clock in time, a second save would
+                # repeat every post-save side effect
+                return Response(
+                    AttendanceSerializer(attendance).data,
+                    status=status.HTTP_200_OK
+                )
+            if attendance.clock_in:
                 return Response(
                     {'error': 'Already clocked in today'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             attendance.clock_in = now
-            # Determine if late (after 9 AM)
-            if now.hour >= 9:
-                attendance.status = 'Late'
-            else:
-                attendance.status = 'Present'
+            attendance.status = clock_in_status
         else:  # clock out
             if not attendance.clock_in:
                 return Response(
@@ -158,7 +286,53 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
     
+    @action(detail=False, methods=['post'])
+    def punches(self, request):
+        """
+        Batch sync of kiosk punches with idempotency keys, see employees.kiosk.
+        Always 200 once valid, each punch has its own outcome.
+        """
+        serializer = PunchBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            result = sync_punches(
+                serializer.validated_data['punches'],
+                device=serializer.validated_data['device'],
+            )
+        except IntegrityError:
+            # Another request wrote the same punches or days meanwhile,
+            # nothing was applied and a retry replays cleanly
+            return Response(
+                {'error': 'Conflicting punches were synced concurrently, retry the batch'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(result, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['post'], url_path='import',
+            parser_classes=[MultiPartParser], permission_classes=[IsAdminRole])
+    def import_file(self, request):
+        """
+        Upsert attendance from a time-clock CSV export sent as the multipart
+        field `file`, see employees.imports for the columns
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'A CSV file is required in the "file" field'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        result = import_attendance(codecs.iterdecode(upload, 'utf-8-sig'))
+        return Response(
+            result.as_dict(),
+            status=status.HTTP_200_OK if result.rows else status.HTTP_400_BAD_REQUEST
+        )
+    
+    @etag_versioned(Attendance, Employee)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
     @action(detail=False, methods=['get'])
+    @etag_versioned(Attendance, Employee)
     def today(self, request):
         """Get today's attendance"""
         today = date.today()
@@ -166,7 +340,47 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(attendance, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def stream(self, request):
+        """Stream incremental attendance changes as server-sent events"""
+        last_event_id = request.META.get('HTTP_LAST_EVENT_ID') or request.query_params.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
+        
+        subscriber, backlog = attendance_hub.subscribe(last_event_id)
+        
+        def events():
+            try:
+                yield 'retry: 5000\n\n'
+                if backlog is None:
+                    # Too far behind, the client refetches today's attendance
+                    yield format_sse(0, 'resync', '{}')
+                else:
+                    for item in backlog:
+                        yield format_sse(*item)
+                
+                while True:
+                    try:
+                        item = subscriber.get(timeout=self.stream_keepalive)
+                    except queue.Empty:
+                        yield ': keepalive\n\n'
+                        continue
+                    yield format_sse(*item)
+                    if item[1] == 'resync':
+                        return
+            finally:
+                attendance_hub.unsubscribe(subscriber)
+        
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
     @action(detail=False, methods=['get'])
+    @reads_from_replica
+    @etag_versioned(Attendance, Employee)
     def stats(self, request):
         """Get attendance statistics"""
         today = date.today()
@@ -212,6 +426,10 @@ class LeaveViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    @etag_versioned(Leave, Employee)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
     @action(detail=True, methods=['patch'])
     def approve(self, request, pk=None):
         """Approve a leave request"""
@@ -235,6 +453,7 @@ class LeaveViewSet(viewsets.ModelViewSet):
         )
     
     @action(detail=False, methods=['get'])
+    @etag_versioned(Leave, Employee)
     def pending(self, request):
         """Get all pending leave requests"""
         pending_leaves = Leave.objects.filter(status='Pending').select_related('employee')
@@ -242,6 +461,8 @@ class LeaveViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @reads_from_replica
+    @etag_versioned(Leave)
     def stats(self, request):
         """Get leave statistics"""
         total = Leave.objects.count()
@@ -257,17 +478,27 @@ class LeaveViewSet(viewsets.ModelViewSet):
         })
 
 
-class PayrollViewSet(viewsets.ModelViewSet):
+class PayrollViewSet(ArchivedLookupMixin, viewsets.ModelViewSet):
     """
     ViewSet for Payroll CRUD operations
     """
     queryset = Payroll.objects.all()
     serializer_class = PayrollSerializer
+    archive_model = PayrollArchive
     
     def get_queryset(self):
-        """Filter payroll by month/year or employee"""
-        queryset = Payroll.objects.select_related('employee').all()
-        
+        """Filter payroll by month/year or employee, lists include archived years they reach"""
+        queryset = self.filter_records(Payroll.objects.select_related('employee').all())
+        params = self.request.query_params
+        if self.action == 'list' and (
+            self.include_archived()
+            or (params.get('month') and params.get('year', '').isdigit() and int(params['year']) < horizon().year)
+        ):
+            return Tiered(queryset, self.filter_records(archived(PayrollArchive)))
+        return queryset
+    
+    def filter_records(self, queryset):
+        """Query string filters, applied to both tiers"""
         # Filter by month and year
         month = self.request.query_params.get('month', None)
         year = self.request.query_params.get('year', None)
@@ -281,6 +512,10 @@ class PayrollViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    @etag_versioned(Payroll, Employee)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
     @action(detail=False, methods=['post'])
     def process(self, request):
         """Process payroll for a specific month/year"""
@@ -293,66 +528,19 @@ class PayrollViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        employees = Employee.objects.filter(status='Active')
-        payroll_records = []
-        
-        for employee in employees:
-            # Check if payroll already exists
-            existing = Payroll.objects.filter(
-                employee=employee,
-                month=month,
-                year=year
-            ).first()
-            
-            if existing:
-                continue
-            
-            # Calculate attendance for the month
-            start_date = date(int(year), int(month), 1)
-            if int(month) == 12:
-                end_date = date(int(year) + 1, 1, 1) - timedelta(days=1)
-            else:
-                end_date = date(int(year), int(month) + 1, 1) - timedelta(days=1)
-            
-            attendance_records = Attendance.objects.filter(
-                employee=employee,
-                date__range=[start_date, end_date]
-            )
-            
-            # Calculate working days (assuming 22 working days per month)
-            working_days = 22
-            present_days = attendance_records.filter(
-                Q(status='Present') | Q(status='Late')
-            ).count()
-            
-            # Calculate deductions for absent days
-            daily_rate = float(employee.salary) / working_days
-            absent_days = working_days - present_days
-            deductions = daily_rate * absent_days
-            
-            # Calculate overtime
-            overtime_hours = 0
-            for record in attendance_records:
-                if record.working_hours > 8:
-                    overtime_hours += (record.working_hours - 8)
-            
-            overtime_pay = overtime_hours * 25  # $25 per hour
-            
-            # Calculate allowances (10% of basic salary)
-            allowances = float(employee.salary) * 0.1
-            
-            # Create payroll record
-            payroll = Payroll.objects.create(
-                employee=employee,
-                month=month,
-                year=year,
-                basic_salary=employee.salary,
-                allowances=allowances,
-                overtime=overtime_pay,
-                deductions=deductions,
-                status='Processed'
+        try:
+            month, year = int(month), int(year)
+            date(year, month, 1)
+        except (TypeError, ValueError) as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if payroll_is_archived(month, year):
+            return Response(
+                {'error': f'Payroll for {month}/{year} is archived'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            payroll_records.append(payroll)
+        
+        payroll_records = process_payroll(month, year)
         
         serializer = self.get_serializer(payroll_records, many=True)
         return Response(
@@ -363,39 +551,114 @@ class PayrollViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
     
+    @action(detail=False, methods=['post'])
+    def recompute(self, request):
+        """Recompute payroll rows queued by attendance or leave changes"""
+        return Response(recompute_dirty_payroll())
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminRole])
+    def transition(self, request):
+        """
+        Move payroll rows to Processed or Paid in one statement, e.g.
+        {"status": "Paid", "month": 9, "year": 2025} or {"status": "Processed", "ids": [...]}.
+        Rows not in the preceding status are skipped and counted.
+        """
+        serializer = PayrollTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        queryset = Payroll.objects.all()
+        if 'ids' in data:
+            queryset = queryset.filter(id__in=data['ids'])
+        if 'month' in data and 'year' in data:
+            queryset = queryset.filter(month=data['month'], year=data['year'])
+        moved, skipped = transition_payroll(queryset, data['status'])
+        return Response({
+            'status': data['status'],
+            'from_status': TRANSITIONS[data['status']],
+            'updated': moved,
+            'skipped': skipped,
+        })
+    
+    @action(detail=False, methods=['post'])
+    @reads_from_replica
+    def simulate(self, request):
+        """
+        Simulate a payroll run with different parameters without writing
+        anything. Returns baseline vs. scenario totals and per-department deltas.
+        """
+        month = request.data.get('month')
+        year = request.data.get('year')
+        
+        if not month or not year:
+            return Response(
+                {'error': 'Month and year are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            month, year = int(month), int(year)
+            date(year, month, 1)
+            baseline = PayrollParameters.from_data(request.data.get('baseline') or {})
+            scenario = PayrollParameters.from_data(request.data.get('scenario') or {}, base=baseline)
+        except (TypeError, ValueError) as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        dataset = get_dataset(month, year)
+        result = simulate(dataset, scenario, baseline)
+        result.update({'month': month, 'year': year})
+        return Response(result)
+    
     @action(detail=True, methods=['get'])
     def payslip(self, request, pk=None):
         """Generate payslip data for a specific payroll record"""
-        payroll = self.get_object()
-        
-        payslip_data = {
-            'employee': {
-                'name': payroll.employee.full_name,
-                'email': payroll.employee.email,
-                'department': payroll.employee.department,
-                'position': payroll.employee.position,
-                'employee_id': f"EMP-{str(payroll.employee.id).zfill(4)}"
-            },
-            'period': {
-                'month': payroll.month,
-                'year': payroll.year,
-                'pay_date': payroll.processed_date or timezone.now()
-            },
-            'earnings': {
-                'basic_salary': float(payroll.basic_salary),
-                'allowances': float(payroll.allowances),
-                'overtime': float(payroll.overtime),
-                'gross_salary': float(payroll.gross_salary)
-            },
-            'deductions': {
-                'total': float(payroll.deductions)
-            },
-            'net_salary': float(payroll.net_salary)
-        }
+        return Response(payslip(self.get_object()))
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminRole],
+            renderer_classes=[JSONRenderer, NDJSONRenderer])
+    def payslips(self, request):
+        """
+        Payslips of a whole pay run as NDJSON, one per line: `month` and
+        `year`, or a PayrollPeriod id as `period`, optionally `department`.
+        Payroll is monthly, so a half-month period gives the payslips of
+        its whole month, as do both halves.
+        """
+        params = request.query_params
+        try:
+            if params.get('period'):
+                period = PayrollPeriod.objects.get(pk=int(params['period']))
+                month, year = period.month, period.year
+            else:
+                month, year = int(params['month']), int(params['year'])
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {'error': 'month and year, or period, are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except PayrollPeriod.DoesNotExist:
+            raise Http404('No such payroll period')
         
-        return Response(payslip_data)
+        department = params.get('department')
+        hot = Payroll.objects.select_related('employee')
+        if department:
+            hot = hot.filter(employee__department=department)
+        querysets = [hot.filter(month=month, year=year).order_by('employee_id')]
+        # Unpaid and adjusted rows of an archived month stay hot, read both
+        if payroll_is_archived(month, year):
+            archive = archived(PayrollArchive)
+            if department:
+                # The archive may be another database, no join
+                archive = archive.filter(employee_id__in=list(
+                    Employee.objects.filter(department=department).values_list('id', flat=True)
+                ))
+            querysets.append(archive.filter(month=month, year=year).order_by('employee_id'))
+        
+        response = StreamingHttpResponse(payslip_lines(*querysets), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'inline; filename="payslips-{year}-{month:02}.ndjson"'
+        return response
     
     @action(detail=False, methods=['get'])
+    @reads_from_replica
+    @etag_versioned(Payroll)
     def stats(self, request):
         """Get payroll statistics"""
         month = request.query_params.get('month', date.today().month)
@@ -413,3 +676,83 @@ class PayrollViewSet(viewsets.ModelViewSet):
             'processed_count': monthly_payroll.filter(status='Processed').count(),
             'pending_count': monthly_payroll.filter(status='Pending').count()
         })
+
+
+class PayrollRuleViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for PayrollRule CRUD operations
+    """
+    queryset = PayrollRule.objects.all()
+    serializer_class = PayrollRuleSerializer
+    # Rules change everyone's pay the next time payroll is processed
+    permission_classes = [IsAdminRoleOrReadOnly]
+    
+    def get_queryset(self):
+        """Filter rules by department or active flag"""
+        queryset = PayrollRule.objects.all()
+        
+        department = self.request.query_params.get('department', None)
+        if department:
+            queryset = queryset.filter(department=department)
+        
+        active = self.request.query_params.get('active', None)
+        if active is not None:
+            queryset = queryset.filter(is_active=active.lower() in ('1', 'true', 'yes'))
+        
+        return queryset
+
+
+class ShiftViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for Shift CRUD operations
+    """
+    queryset = Shift.objects.prefetch_related('departments')
+    serializer_class = ShiftSerializer
+    # Shifts decide Late status and overtime for everyone on them
+    permission_classes = [IsAdminRoleOrReadOnly]
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAdminRole])
+    def assign(self, request, pk=None):
+        """
+        Put departments and/or employees on this shift, e.g.
+        {"departments": ["Sales"], "employees": [12, 15]}. An employee's own
+        shift wins over their department's.
+        """
+        shift = self.get_object()
+        serializer = ShiftAssignmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        departments = serializer.validated_data.get('departments', [])
+        employee_ids = serializer.validated_data.get('employees', [])
+        # Rules as they were, to find whose standard hours change
+        table = shift_table()
+        hours = float(shift.standard_hours)
+        with transaction.atomic():
+            found = dict(Employee.objects.filter(id__in=employee_ids).values_list('id', 'department'))
+            DepartmentShift.objects.bulk_create(
+                [DepartmentShift(department=department, shift=shift) for department in set(departments)],
+                update_conflicts=True,
+                unique_fields=['department'],
+                update_fields=['shift'],
+            )
+            if found:
+                Employee.objects.filter(id__in=found).update(shift=shift, updated_at=timezone.now())
+                transaction.on_commit(lambda: bump_versions(Employee))
+            transaction.on_commit(invalidate_shifts)
+            moved = [
+                employee_id for employee_id, department in found.items()
+                if table.rule(employee_id, department).standard_hours != hours
+            ]
+            moved_departments = [
+                department for department in set(departments)
+                if table.resolve(None, department).standard_hours != hours
+            ]
+            if moved or moved_departments:
+                reapply_shifts(Employee.objects.filter(
+                    Q(id__in=moved) | Q(department__in=moved_departments, shift__isnull=True)
+                ))
+        return Response({
+            'shift': shift.pk,
+            'departments': sorted(set(departments)),
+            'employees': sorted(found),
+            'missing': sorted(set(employee_ids) - set(found)),
+        })
@@ -0,0 +1,14 @@
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.response import Response
+
+from .metrics import registry
+from .permissions import IsAdminRole
+from .renderers import PrometheusRenderer
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminRole])
+@renderer_classes([PrometheusRenderer])
+def metrics_view(request):
+    """Per-view request metrics of this process in Prometheus text format"""
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,90 @@
+from datetime import date
+
+from django.db.models import Count, Sum
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from .models import AttendanceMonthlySummary
+from .routing import reads_from_replica
+
+
+REPORT_DIMENSIONS = {
+    'department': ['department'],
+    'month': ['period'],
+    'employee': ['employee', 'employee__first_name', 'employee__last_name'],
+}
+
+REPORT_TOTALS = [
+    'present_days', 'late_days', 'absent_days', 'half_days', 'leave_days',
+    'total_hours', 'overtime_hours',
+]
+
+
+def _parse_month(value):
+    """Parse a YYYY-MM query parameter into the first day of that month"""
+    year, month = value.split('-')
+    return date(int(year), int(month), 1)
+
+
+@api_view(['GET'])
+@reads_from_replica
+def attendance_report(request):
+    """
+    Attendance trends sliced from the monthly rollup.
+    
+    Query params: `start` / `end` (YYYY-MM, inclusive), `department`,
+    `employee` and `group_by`, a comma separated list of
+    department, month and employee (default: department,month). An empty
+    `group_by` returns a single row of overall totals.
+    """
+    params = request.query_params
+    summaries = AttendanceMonthlySummary.objects.all()
+    
+    try:
+        if params.get('start'):
+            summaries = summaries.filter(period__gte=_parse_month(params['start']))
+        if params.get('end'):
+            summaries = summaries.filter(period__lte=_parse_month(params['end']))
+    except ValueError:
+        return Response(
+            {'error': 'start and end must be formatted as YYYY-MM'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if params.get('department'):
+        summaries = summaries.filter(department=params['department'])
+    if params.get('employee'):
+        summaries = summaries.filter(employee_id=params['employee'])
+    
+    group_by = [name.strip() for name in params.get('group_by', 'department,month').split(',') if name.strip()]
+    unknown = [name for name in group_by if name not in REPORT_DIMENSIONS]
+    if unknown:
+        return Response(
+            {'error': f"Unknown group_by dimension(s): {', '.join(unknown)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    columns = [column for name in group_by for column in REPORT_DIMENSIONS[name]]
+    totals = {'employees': Count('employee', distinct=True), **{field: Sum(field) for field in REPORT_TOTALS}}
+    if group_by:
+        rows = summaries.values(*columns).annotate(**totals).order_by(*columns)
+    else:
+        # values() without columns would group by every field, one row per summary
+        rows = [{name: value or 0 for name, value in summaries.aggregate(**totals).items()}]
+    
+    results = []
+    for row in rows:
+        worked_days = row['present_days'] + row['late_days'] + row['half_days']
+        attended_days = row['present_days'] + row['late_days']
+        if 'period' in row:
+            row['month'] = row.pop('period').strftime('%Y-%m')
+        if 'employee' in row:
+            row['employee_name'] = f"{row.pop('employee__first_name')} {row.pop('employee__last_name')}"
+        row['total_hours'] = float(row['total_hours'])
+        row['overtime_hours'] = float(row['overtime_hours'])
+        row['average_hours'] = round(row['total_hours'] / worked_days, 2) if worked_days else 0
+        row['lateness_rate'] = round(row['late_days'] / attended_days * 100, 2) if attended_days else 0
+        results.append(row)
+    
+    return Response({'group_by': group_by, 'results': results})
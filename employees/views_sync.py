@@ -0,0 +1,90 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .earnings import earnings_ytd, ytd_data
+from .models import Employee, Attendance, Leave, Payroll, Tombstone
+from .serializers import AttendanceSerializer, LeaveSerializer, PayrollSerializer
+from .tombstones import tombstone_horizon
+
+
+# Rows committed shortly before a cursor was issued may carry an earlier
+# updated_at, so every sync re-reads this window. Clients upsert by id.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+SYNCED_MODELS = [
+    ('attendance', Attendance, AttendanceSerializer),
+    ('leaves', Leave, LeaveSerializer),
+    ('payroll', Payroll, PayrollSerializer),
+]
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_view(request):
+    """
+    Return the calling employee's attendance, leave and payroll rows that
+    changed or were deleted since `since`. Without a cursor, or with one
+    older than tombstone retention, every row is returned and `full` is
+    set: the client replaces its copy. The response cursor is passed back
+    on the next call.
+    `year_to_date` always carries the current year's running totals.
+    """
+    try:
+        employee = request.user.employee_profile
+    except Employee.DoesNotExist:
+        employee = None
+    if employee is None:
+        return Response(
+            {'error': 'No employee profile linked to this user'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    since = request.query_params.get('since')
+    if since:
+        since = parse_datetime(since)
+        if since is None:
+            return Response(
+                {'error': 'Invalid sync cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since, dt_timezone.utc)
+        since -= SYNC_OVERLAP
+    
+    # Taken before reading so concurrent changes show up in the next sync
+    cursor = timezone.now()
+    # Deletions before the horizon may be pruned, resend everything
+    if since and since < tombstone_horizon(cursor):
+        since = None
+    
+    deleted = {}
+    if since:
+        tombstones = Tombstone.objects.filter(
+            employee_id=employee.id,
+            deleted_at__gte=since
+        ).values_list('model', 'object_id')
+        for model_name, object_id in tombstones:
+            deleted.setdefault(model_name, []).append(object_id)
+    
+    data = {'cursor': cursor.strftime('%Y-%m-%dT%H:%M:%S.%fZ'), 'full': since is None}
+    for key, model, serializer_class in SYNCED_MODELS:
+        changed = model.objects.filter(employee=employee)
+        if since:
+            changed = changed.filter(updated_at__gte=since)
+        # Every row belongs to the same employee, attach it instead of joining
+        rows = list(changed)
+        for row in rows:
+            row.employee = employee
+        data[key] = {
+            'changed': serializer_class(rows, many=True).data,
+            'deleted': deleted.get(model._meta.model_name, []),
+        }
+    data['year_to_date'] = ytd_data(earnings_ytd(employee.id, cursor.year))
+    
+    return Response(data)
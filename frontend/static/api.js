@@ -122,7 +122,17 @@ const attendanceAPI = {
         clock_type: clockType
     }),
     getToday: () => api.get('/attendance/today/'),
-    getStats: () => api.get('/attendance/stats/')
+    getStats: () => api.get('/attendance/stats/'),
+    // Live attendance changes pushed by the server (Server-Sent Events).
+    // onChange receives one changed record, onRemove a removed one and
+    // onResync is called when the client fell behind and must refetch.
+    subscribe: ({ onChange, onRemove, onResync } = {}) => {
+        const source = new EventSource(`${API_BASE_URL}/attendance/stream/`);
+        source.addEventListener('attendance', (e) => onChange && onChange(JSON.parse(e.data)));
+        source.addEventListener('attendance-removed', (e) => onRemove && onRemove(JSON.parse(e.data)));
+        source.addEventListener('resync', () => onResync && onResync());
+        return source;
+    }
 };
 
 // Leave API
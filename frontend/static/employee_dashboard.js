@@ -80,6 +80,18 @@ async function loadEmployeeProfile() {
 }
 
 // Load My Data
+// The first call downloads everything; later calls only transfer the rows
+// that changed or were deleted since the last sync cursor.
+let syncCursor = null;
+
+function mergeSynced(list, delta, mapRow) {
+    const deleted = new Set(delta.deleted);
+    const changed = new Map(delta.changed.map(row => [row.id, mapRow(row)]));
+    const merged = list
+        .filter(item => !deleted.has(item.id) && !changed.has(item.id));
+    return merged.concat([...changed.values()]);
+}
+
 async function loadMyData() {
     if (!currentEmployee) return;
     
@@ -89,46 +101,39 @@ async function loadMyData() {
     };
 
     try {
-        // Load my attendance
-        const attResponse = await fetch(API_BASE_URL + '/attendance/?employee=' + currentEmployee.id, { headers });
-        if (attResponse.ok) {
-            const attData = await attResponse.json();
-            myAttendance = (attData.results || attData).map(att => ({
-                id: att.id,
-                employeeId: att.employee,
-                date: att.date,
-                status: att.status,
-                clockIn: att.clock_in,
-                clockOut: att.clock_out,
-                notes: att.notes || ''
-            }));
-            console.log('Loaded my attendance:', myAttendance.length);
-        }
-
-        // Load my leaves
-        const leaveResponse = await fetch(API_BASE_URL + '/leaves/?employee=' + currentEmployee.id, { headers });
-        if (leaveResponse.ok) {
-            const leaveData = await leaveResponse.json();
-            myLeaves = (leaveData.results || leaveData).map(leave => ({
-                id: leave.id,
-                employeeId: leave.employee,
-                type: leave.leave_type,
-                startDate: leave.start_date,
-                endDate: leave.end_date,
-                days: leave.days,
-                status: leave.status,
-                reason: leave.reason || ''
-            }));
-            console.log('Loaded my leaves:', myLeaves.length);
-        }
-
-        // Load my payroll
-        const payrollResponse = await fetch(API_BASE_URL + '/payroll/?employee=' + currentEmployee.id, { headers });
-        if (payrollResponse.ok) {
-            const payrollData = await payrollResponse.json();
-            myPayroll = payrollData.results || payrollData;
-            console.log('Loaded my payroll:', myPayroll.length);
+        const query = syncCursor ? '?since=' + encodeURIComponent(syncCursor) : '';
+        const response = await fetch(API_BASE_URL + '/sync/' + query, { headers });
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+        const data = await response.json();
+        
+        if (data.full) {
+            myAttendance = [];
+            myLeaves = [];
+            myPayroll = [];
         }
+        
+        myAttendance = mergeSynced(myAttendance, data.attendance, att => ({
+            id: att.id,
+            employeeId: att.employee,
+            date: att.date,
+            status: att.status,
+            clockIn: att.clock_in,
+            clockOut: att.clock_out,
+            notes: att.notes || ''
+        }));
+        myLeaves = mergeSynced(myLeaves, data.leaves, leave => ({
+            id: leave.id,
+            employeeId: leave.employee,
+            type: leave.leave_type,
+            startDate: leave.start_date,
+            endDate: leave.end_date,
+            days: leave.days,
+            status: leave.status,
+            reason: leave.reason || ''
+        }));
+        myPayroll = mergeSynced(myPayroll, data.payroll, payroll => payroll);
+        syncCursor = data.cursor;
+        console.log('Synced my data:', myAttendance.length, myLeaves.length, myPayroll.length);
 
         // Refresh dashboard after loading data
         refreshDashboard();
@@ -572,6 +577,23 @@ function displayPayslip(data) {
             </tbody>
         </table>
         
+        ${data.year_to_date ? `
+        <div class="grid grid-cols-3 gap-4 mb-6 text-sm">
+            <div class="p-3 bg-gray-50 rounded-lg">
+                <p class="text-gray-500">Gross YTD</p>
+                <p class="font-semibold text-gray-900">₱${data.year_to_date.gross_salary.toLocaleString()}</p>
+            </div>
+            <div class="p-3 bg-gray-50 rounded-lg">
+                <p class="text-gray-500">Deductions YTD</p>
+                <p class="font-semibold text-red-600">-₱${data.year_to_date.deductions.toLocaleString()}</p>
+            </div>
+            <div class="p-3 bg-indigo-50 rounded-lg">
+                <p class="text-gray-500">Net YTD</p>
+                <p class="font-semibold text-indigo-900">₱${data.year_to_date.net_salary.toLocaleString()}</p>
+            </div>
+        </div>
+        ` : ''}
+        
         <div class="border-t-2 border-gray-100 pt-4 text-center text-sm text-gray-500">
             <p>This is a computer-generated payslip and does not require signature.</p>
             <p class="mt-1">For queries, contact HR at hr@company.com</p>
@@ -51,6 +51,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the recorded wall time covers the rest of the stack
+    "employees.middleware.PerformanceMetricsMiddleware",
+    "employees.middleware.ReplicaPinMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # CORS middleware
@@ -86,11 +89,70 @@ WSGI_APPLICATION = "hr_nexus.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# hr_nexus.sqlite_wal is the stock SQLite backend with tuned pragmas and
+# BEGIN IMMEDIATE transactions, see hr_nexus/sqlite_wal/base.py. Connections
+# are kept open between requests.
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "hr_nexus.sqlite_wal",
         "NAME": BASE_DIR / "db_auth.sqlite3",
-    }
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # Seconds a write waits for the lock before "database is locked"
+            "timeout": 20,
+            # WAL journaling converts the file for good; enable it on a
+            # deployed copy, not on the database kept in the repository
+            # "wal": True,
+        },
+    },
+    # Optional read replica for stats, reports and simulations, e.g. a
+    # SQLite snapshot refreshed by `manage.py snapshot_replica`:
+    # "replica": {
+    #     "ENGINE": "hr_nexus.sqlite_wal",
+    #     "NAME": BASE_DIR / "db_replica.sqlite3",
+    #     "TEST": {"MIRROR": "default"},
+    # },
+    # Optional separate database for archived attendance and payroll,
+    # otherwise the archive tables sit next to the hot ones:
+    # "archive": {
+    #     "ENGINE": "hr_nexus.sqlite_wal",
+    #     "NAME": BASE_DIR / "db_archive.sqlite3",
+    # },
+}
+
+DATABASE_ROUTERS = ["employees.routing.ArchiveRouter", "employees.routing.ReplicaRouter"]
+
+# Years of attendance and payroll kept in the hot tables, counting the
+# current one; older years can be moved out with `manage.py archive_history`
+ARCHIVE_HOT_YEARS = 2
+
+# Weekdays (Monday is 0) on which employees without a WorkSchedule are
+# expected at work, used by `manage.py reconcile_attendance` and to count
+# paid leave days in payroll
+ATTENDANCE_WORKWEEK = [0, 1, 2, 3, 4]
+
+# Days deletion tombstones are kept for delta sync; prune older ones with
+# `manage.py prune_tombstones`. Clients with an older cursor get a full sync.
+SYNC_TOMBSTONE_DAYS = 90
+
+# After a request writes, its user reads reports from the primary for this
+# many seconds. Needs a cache shared by all workers to hold across processes.
+REPLICA_PIN_SECONDS = 10
+
+# Local memory caches are per worker process; in production point both at
+# a shared cache, e.g. "BACKEND": "django.core.cache.backends.redis.RedisCache"
+# with "LOCATION": "redis://127.0.0.1:6379". Payslips of paid payroll rows
+# are kept without a timeout in `payslips`, until evicted past MAX_ENTRIES.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "payslips": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "payslips",
+        "OPTIONS": {"MAX_ENTRIES": 50000},
+    },
 }
 
 
@@ -190,5 +252,10 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 
+# Statements slower than this (milliseconds) are stored with their query
+# plan in the SlowQuery admin. None disables the slow query log.
+SLOW_QUERY_THRESHOLD_MS = None
+
+
 # Custom User Model
 AUTH_USER_MODEL = 'employees.User'
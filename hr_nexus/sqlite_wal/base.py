@@ -0,0 +1,58 @@
+"""
+SQLite backend tuned for many concurrent writers in one database file.
+
+Every connection relaxes fsync to synchronous=NORMAL and sets mmap, page
+cache and busy timeout pragmas. Transactions start with BEGIN IMMEDIATE so a
+transaction that reads and then writes can't deadlock against another one
+upgrading its lock, which fails at once with "database is locked" whatever
+the busy timeout. Writers wait for each other in SQLite's busy handler, up
+to the timeout.
+
+WAL journaling (readers never block the writer) is opt-in with
+OPTIONS['wal']: it is a persistent property of the database file, so leave
+it off for files kept in version control.
+"""
+from django.db.backends.sqlite3 import base
+
+
+DEFAULT_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative sizes are KiB
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Options (in DATABASES[...]['OPTIONS']):
+      timeout  seconds a write waits for the lock, the busy timeout
+      wal      switch the file to WAL journaling (default False)
+      pragmas  overrides of DEFAULT_PRAGMAS
+    """
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        kwargs.pop('wal', None)
+        return kwargs
+
+    @property
+    def lock_timeout(self):
+        return self.settings_dict['OPTIONS'].get('timeout', 5)
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        options = self.settings_dict['OPTIONS']
+        pragmas = dict(DEFAULT_PRAGMAS)
+        if options.get('wal'):
+            pragmas['journal_mode'] = 'WAL'
+        pragmas.update(options.get('pragmas', {}))
+        pragmas['busy_timeout'] = int(self.lock_timeout * 1000)
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')